@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+import traceback
+
+import dados
+import markowitz
+
+# Parâmetros padrão da barra lateral do app (main.py)
+PARAMETROS_PADRAO = {
+    "quantidade_ativos": 10,
+    "peso_maximo": 0.20,
+    "taxa_livre_risco": 0.105,
+    "retorno_alvo": 0.15,
+}
+
+# O que pré-calcular ao iniciar: "completo" (bases, covariância e carteira de
+# Markowitz padrão), "dados" (só bases e covariância) ou "desligado"
+MODOS_AQUECIMENTO = ("completo", "dados", "desligado")
+_modo_aquecimento = os.environ.get("TCC_AQUECIMENTO", "completo")
+
+_thread_aquecimento = None
+_lock_aquecimento = threading.Lock()
+
+
+def aquecer(carteira_padrao: bool = True):
+    """
+    Carrega e limpa as bases, calcula os retornos e a covariância com os
+    parâmetros padrão e, opcionalmente, a carteira de Markowitz padrão. Tudo
+    fica nos caches de `dados`, então o primeiro clique já encontra o
+    resultado pronto.
+    """
+    inicio = time.perf_counter()
+    try:
+        # --- 1. Bases limpas e retornos (cota ajustada e de mercado) ---
+        dados.preparar_bases()
+        dados.preparar_retornos()
+        # Retornos da base inteira, usados no backtest
+        dados.carregar_retornos(dados.BASE_COTA_AJUSTADA)
+
+        # --- 2. Média e covariância de Ledoit-Wolf ---
+        markowitz.calcular_inputs()
+
+        # --- 3. Carteira de Markowitz com os parâmetros padrão ---
+        if carteira_padrao:
+            markowitz.Otimizacao_Markowitz(**PARAMETROS_PADRAO)
+        print(f"> Aquecimento concluído em {time.perf_counter() - inicio:.1f} s")
+    except Exception as e:
+        # O aquecimento é só uma otimização: falhas não derrubam o app
+        print(f"[Aquecimento] falhou: {e}")
+        traceback.print_exc()
+
+
+def iniciar_aquecimento(modo: str = None) -> threading.Thread:
+    """
+    Dispara `aquecer` em uma thread em segundo plano, uma única vez por
+    processo (chamadas seguintes devolvem a mesma thread). Devolve None se o
+    aquecimento estiver desligado.
+    """
+    global _thread_aquecimento
+    modo = modo or _modo_aquecimento
+    if modo not in MODOS_AQUECIMENTO:
+        raise ValueError(f"Modo desconhecido: {modo}. Opções: {MODOS_AQUECIMENTO}")
+    if modo == "desligado":
+        return None
+
+    with _lock_aquecimento:
+        if _thread_aquecimento is None:
+            _thread_aquecimento = threading.Thread(
+                target=aquecer,
+                kwargs={"carteira_padrao": modo == "completo"},
+                name="aquecimento",
+                daemon=True,
+            )
+            _thread_aquecimento.start()
+    return _thread_aquecimento
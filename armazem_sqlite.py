@@ -0,0 +1,167 @@
+import json
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class ArmazemSQLite:
+    """
+    Bases de cotas guardadas em um banco SQLite local, no formato longo
+    (base, ticker, dt_pregao) -> valor.
+
+    Filtros de período e de tickers são resolvidos no próprio banco (pela
+    chave primária e pelo índice de datas), então uma consulta de 250 dias de
+    20 tickers lê apenas essas linhas, sem materializar a tabela larga inteira.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        # Conexões SQLite não devem ser compartilhadas entre threads
+        self._local = threading.local()
+        with self._conexao() as con:
+            con.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS fontes (
+                    base TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    tamanho INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS tickers (
+                    base TEXT NOT NULL,
+                    posicao INTEGER NOT NULL,
+                    ticker TEXT NOT NULL,
+                    PRIMARY KEY (base, ticker)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS pregoes (
+                    base TEXT NOT NULL,
+                    dt_pregao TEXT NOT NULL,
+                    PRIMARY KEY (base, dt_pregao)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS cotas (
+                    base TEXT NOT NULL,
+                    ticker TEXT NOT NULL,
+                    dt_pregao TEXT NOT NULL,
+                    valor REAL NOT NULL,
+                    PRIMARY KEY (base, ticker, dt_pregao)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_cotas_data
+                    ON cotas (base, dt_pregao, ticker);
+                """
+            )
+
+    def _conexao(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.caminho)
+            con.execute("PRAGMA journal_mode=WAL")
+            self._local.con = con
+        return con
+
+    def assinatura(self, base: str):
+        """(mtime_ns, tamanho) do CSV de origem na última gravação, ou None."""
+        linha = (
+            self._conexao()
+            .execute("SELECT mtime_ns, tamanho FROM fontes WHERE base = ?", (base,))
+            .fetchone()
+        )
+        return None if linha is None else tuple(linha)
+
+    def gravar_base(self, base: str, df: pd.DataFrame, mtime_ns: int, tamanho: int):
+        """
+        Substitui todo o conteúdo da base pelo DataFrame (dt_pregao x tickers)
+        em uma única transação: quem lê nunca vê a base pela metade.
+        """
+        with self._conexao() as con:
+            for tabela in ("cotas", "pregoes", "tickers"):
+                con.execute(f"DELETE FROM {tabela} WHERE base = ?", (base,))
+            con.executemany(
+                "INSERT INTO tickers (base, posicao, ticker) VALUES (?, ?, ?)",
+                [(base, i, t) for i, t in enumerate(df.columns)],
+            )
+            self._inserir(con, base, df, mtime_ns, tamanho)
+
+    def anexar_base(self, base: str, df: pd.DataFrame, mtime_ns: int, tamanho: int):
+        """Acrescenta pregões à base (NaNs não são gravados)."""
+        with self._conexao() as con:
+            self._inserir(con, base, df, mtime_ns, tamanho)
+
+    @staticmethod
+    def _inserir(con, base: str, df: pd.DataFrame, mtime_ns: int, tamanho: int):
+        """Grava pregões, cotas e a assinatura da fonte na transação de `con`."""
+        datas = df.index.strftime("%Y-%m-%d")
+        valores = df.to_numpy(dtype=np.float64)
+        linhas, colunas = np.nonzero(~np.isnan(valores))
+        tickers = np.asarray(df.columns, dtype=object)
+        con.executemany(
+            "INSERT INTO pregoes (base, dt_pregao) VALUES (?, ?)",
+            [(base, d) for d in datas],
+        )
+        con.executemany(
+            "INSERT INTO cotas (base, ticker, dt_pregao, valor) VALUES (?, ?, ?, ?)",
+            zip(
+                [base] * len(linhas),
+                tickers[colunas].tolist(),
+                datas[linhas].tolist(),
+                valores[linhas, colunas].tolist(),
+            ),
+        )
+        con.execute(
+            "INSERT OR REPLACE INTO fontes (base, mtime_ns, tamanho) VALUES (?, ?, ?)",
+            (base, mtime_ns, tamanho),
+        )
+
+    def tickers(self, base: str) -> list:
+        linhas = self._conexao().execute(
+            "SELECT ticker FROM tickers WHERE base = ? ORDER BY posicao", (base,)
+        )
+        return [t for (t,) in linhas]
+
+    def datas(self, base: str, inicio=None, fim=None) -> pd.DatetimeIndex:
+        filtro, parametros = self._filtro_periodo(inicio, fim)
+        linhas = self._conexao().execute(
+            f"SELECT dt_pregao FROM pregoes WHERE base = ?{filtro} ORDER BY dt_pregao",
+            (base, *parametros),
+        )
+        return pd.DatetimeIndex(
+            pd.to_datetime([d for (d,) in linhas], format="%Y-%m-%d"), name="dt_pregao"
+        )
+
+    @staticmethod
+    def _filtro_periodo(inicio, fim) -> tuple:
+        filtro, parametros = "", []
+        if inicio is not None:
+            filtro += " AND dt_pregao >= ?"
+            parametros.append(pd.Timestamp(inicio).strftime("%Y-%m-%d"))
+        if fim is not None:
+            filtro += " AND dt_pregao <= ?"
+            parametros.append(pd.Timestamp(fim).strftime("%Y-%m-%d"))
+        return filtro, parametros
+
+    def para_dataframe(self, base: str, inicio=None, fim=None, tickers=None) -> pd.DataFrame:
+        """
+        Tabela larga (dt_pregao x tickers) apenas do período e dos tickers
+        pedidos, com NaN onde não há cota. Tickers ausentes na base são
+        ignorados; as colunas seguem a ordem original da base.
+        """
+        colunas = self.tickers(base)
+        if tickers is not None:
+            pedidos = set(tickers)
+            colunas = [t for t in colunas if t in pedidos]
+        datas = self.datas(base, inicio, fim)
+
+        filtro, parametros = self._filtro_periodo(inicio, fim)
+        consulta = f"SELECT dt_pregao, ticker, valor FROM cotas WHERE base = ?{filtro}"
+        if tickers is not None:
+            consulta += " AND ticker IN (SELECT value FROM json_each(?))"
+            parametros.append(json.dumps(colunas))
+        linhas = self._conexao().execute(consulta, (base, *parametros)).fetchall()
+
+        valores = np.full((len(datas), len(colunas)), np.nan)
+        if linhas:
+            dt, ticker, valor = zip(*linhas)
+            i = datas.get_indexer(pd.to_datetime(list(dt), format="%Y-%m-%d"))
+            j = pd.Index(colunas).get_indexer(list(ticker))
+            valores[i, j] = valor
+        return pd.DataFrame(valores, index=datas, columns=pd.Index(colunas))
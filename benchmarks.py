@@ -0,0 +1,330 @@
+"""
+Benchmarks das rotinas de dados e otimização.
+
+Uso:
+    python benchmarks.py csv [caminhos...] [--repeticoes N]
+    python benchmarks.py escala [--ativos N ...] [--dias N ...] [--destino DIR]
+    python benchmarks.py ledoit_wolf [--ativos N ...] [--dias N] [--repeticoes N]
+    python benchmarks.py janela_movel [--ativos N ...] [--anos N] [--janela N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import dados
+import estimadores
+import gerador_sintetico
+
+
+def _melhor_tempo(funcao, repeticoes: int) -> tuple:
+    """Executa `funcao` algumas vezes e devolve (menor tempo, último resultado)."""
+    melhor, resultado = float("inf"), None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def benchmark_csv(caminhos=None, repeticoes: int = 5) -> list:
+    """
+    Compara o parse das bases pelo `pd.read_csv` original e pelo motor
+    multi-thread do pyarrow, conferindo que os DataFrames são iguais.
+    """
+    caminhos = caminhos or [dados.BASE_COTA_AJUSTADA, dados.BASE_COTA_MERCADO]
+    linhas = []
+    for caminho in caminhos:
+        t_pandas, df_pandas = _melhor_tempo(
+            lambda: dados._ler_csv(caminho, motor="pandas"), repeticoes
+        )
+        t_arrow, df_arrow = _melhor_tempo(
+            lambda: dados._ler_csv(caminho, motor="pyarrow"), repeticoes
+        )
+        iguais = (
+            df_pandas.index.equals(df_arrow.index)
+            and df_pandas.columns.equals(df_arrow.columns)
+        )
+        diferenca = float(
+            np.nanmax(np.abs(df_pandas.to_numpy() - df_arrow.to_numpy()), initial=0.0)
+        )
+        linhas.append(
+            {
+                "arquivo": caminho,
+                "formato": df_pandas.shape,
+                "pandas_s": t_pandas,
+                "pyarrow_s": t_arrow,
+                "aceleracao": t_pandas / t_arrow,
+                "indices_iguais": iguais,
+                "max_dif_abs": diferenca,
+            }
+        )
+        print(
+            f"{caminho}: {df_pandas.shape[0]}x{df_pandas.shape[1]} | "
+            f"pandas {t_pandas * 1e3:.1f} ms | pyarrow {t_arrow * 1e3:.1f} ms | "
+            f"{t_pandas / t_arrow:.1f}x | índices iguais={iguais} | "
+            f"máx. diferença={diferenca:.2e}"
+        )
+    return linhas
+
+
+def benchmark_ledoit_wolf(
+    tamanhos_ativos=(80, 500, 2000),
+    n_dias: int = 5 * 252,
+    repeticoes: int = 3,
+    taxa_nan: float = 0.02,
+) -> list:
+    """
+    Compara `risk_models.CovarianceShrinkage(...).ledoit_wolf()` com o kernel
+    NumPy `estimadores.ledoit_wolf` em float64 e float32, sobre retornos
+    sintéticos correlacionados, conferindo a diferença relativa máxima.
+    """
+    from pypfopt import risk_models
+
+    linhas = []
+    rng = np.random.default_rng(0)
+    for n_ativos in tamanhos_ativos:
+        # Um fator comum (correlação ~0.3) e NaNs espalhados, como nas bases
+        fator = rng.standard_normal((n_dias, 1))
+        ruido = rng.standard_normal((n_dias, n_ativos))
+        retornos = 0.01 * (np.sqrt(0.3) * fator + np.sqrt(0.7) * ruido)
+        retornos[rng.random(retornos.shape) < taxa_nan] = np.nan
+        df = pd.DataFrame(retornos)
+
+        t_pypfopt, ref = _melhor_tempo(
+            lambda: risk_models.CovarianceShrinkage(df, returns_data=True).ledoit_wolf(),
+            repeticoes,
+        )
+        ref = ref.to_numpy()
+        escala = np.abs(ref).max()
+        linha = {"ativos": n_ativos, "dias": n_dias, "pypfopt_s": t_pypfopt}
+        for nome, dtype in (("float64", np.float64), ("float32", np.float32)):
+            tempo, (cov, _) = _melhor_tempo(
+                lambda: estimadores.ledoit_wolf(retornos, dtype=dtype), repeticoes
+            )
+            linha[f"{nome}_s"] = tempo
+            linha[f"{nome}_dif_rel"] = float(np.abs(cov - ref).max() / escala)
+        linhas.append(linha)
+        print(
+            f"{n_ativos} ativos x {n_dias} dias: pypfopt {t_pypfopt * 1e3:.1f} ms | "
+            f"NumPy float64 {linha['float64_s'] * 1e3:.1f} ms "
+            f"({t_pypfopt / linha['float64_s']:.1f}x, dif. {linha['float64_dif_rel']:.1e}) | "
+            f"float32 {linha['float32_s'] * 1e3:.1f} ms "
+            f"({t_pypfopt / linha['float32_s']:.1f}x, dif. {linha['float32_dif_rel']:.1e})"
+        )
+    return linhas
+
+
+def benchmark_janela_movel(
+    tamanhos_ativos=(50, 200),
+    anos: int = 5,
+    janela: int = 252,
+    amostras: int = 20,
+    taxa_nan: float = 0.02,
+) -> list:
+    """
+    Walk-forward diário de `anos` anos com janela de `janela` dias: média e
+    Ledoit-Wolf de cada janela pela atualização incremental
+    (`estimadores.janela_movel`) x `CovarianceShrinkage` refeito do zero.
+    O tempo do pypfopt é medido em `amostras` janelas e extrapolado para o
+    walk-forward inteiro; nessas janelas confere-se também a diferença.
+    """
+    from pypfopt import risk_models
+
+    linhas = []
+    rng = np.random.default_rng(0)
+    n_janelas = anos * 252
+    for n_ativos in tamanhos_ativos:
+        n_dias = n_janelas + janela - 1
+        fator = rng.standard_normal((n_dias, 1))
+        ruido = rng.standard_normal((n_dias, n_ativos))
+        retornos = 0.01 * (np.sqrt(0.3) * fator + np.sqrt(0.7) * ruido)
+        retornos[rng.random(retornos.shape) < taxa_nan] = np.nan
+        df = pd.DataFrame(retornos, index=pd.bdate_range("2000-01-03", periods=n_dias))
+
+        conferir = set(np.linspace(0, n_janelas - 1, amostras).astype(int))
+        # Primeira chamada fora da medição (importações e caches do pypfopt)
+        risk_models.CovarianceShrinkage(df.iloc[:janela], returns_data=True).ledoit_wolf()
+        t_pypfopt, dif_cov, dif_encolhimento = 0.0, 0.0, 0.0
+        inicio = time.perf_counter()
+        for i, (_, momentos) in enumerate(estimadores.janela_movel(df, janela)):
+            cov = momentos.ledoit_wolf(corrigir=False)
+            momentos.media_historica()
+            if i in conferir:
+                pausa = time.perf_counter()
+                shrink = risk_models.CovarianceShrinkage(
+                    df.iloc[i : i + janela], returns_data=True
+                )
+                ref = shrink.ledoit_wolf()
+                t_pypfopt += time.perf_counter() - pausa
+                escala = np.abs(ref.to_numpy()).max()
+                dif_cov = max(dif_cov, np.abs(cov.to_numpy() - ref.to_numpy()).max() / escala)
+                _, encolhimento = momentos.encolhimento_ledoit_wolf()
+                dif_encolhimento = max(dif_encolhimento, abs(encolhimento - shrink.delta))
+                inicio += time.perf_counter() - pausa
+        t_incremental = time.perf_counter() - inicio
+        t_pypfopt *= n_janelas / len(conferir)
+
+        linhas.append(
+            {
+                "ativos": n_ativos,
+                "janelas": n_janelas,
+                "incremental_s": t_incremental,
+                "pypfopt_s_estimado": t_pypfopt,
+                "aceleracao": t_pypfopt / t_incremental,
+                "cov_dif_rel": float(dif_cov),
+                "encolhimento_dif": float(dif_encolhimento),
+            }
+        )
+        print(
+            f"{n_ativos} ativos, {n_janelas} janelas de {janela} dias: incremental "
+            f"{t_incremental:.2f} s | pypfopt ~{t_pypfopt:.1f} s "
+            f"({t_pypfopt / t_incremental:.0f}x) | dif. cov {dif_cov:.1e} | "
+            f"dif. encolhimento {dif_encolhimento:.1e}"
+        )
+    return linhas
+
+
+def _tempo(funcao) -> tuple:
+    """Executa `funcao` uma vez e devolve (tempo, resultado)."""
+    return _melhor_tempo(funcao, 1)
+
+
+def benchmark_escala(
+    tamanhos_ativos=(100, 1000),
+    tamanhos_dias=(5 * 252, 20 * 252),
+    destino: str = None,
+    limite_ffill: int = 5,
+    passos_env: int = 1000,
+    **opcoes_gerador,
+) -> list:
+    """
+    Mede como carga e limpeza, `Otimizacao_Markowitz`, um episódio do
+    `PortfolioEnv` e `run_backtest_and_plot` escalam com o número de ativos e
+    de pregões, sobre bases sintéticas (`gerador_sintetico.gerar_bases`).
+
+    Com NaNs espalhados em muitos tickers quase todo pregão tem alguma lacuna,
+    então a limpeza usa `limite_ffill` em vez do descarte de datas com NaN.
+    """
+    import comparacao
+    import deepRF
+    import markowitz
+
+    destino = destino or tempfile.mkdtemp(prefix="tcc_sintetico_")
+    originais = (
+        dados.BASE_COTA_AJUSTADA,
+        dados.BASE_COTA_MERCADO,
+        dados.DATA_INICIO,
+        dados.DATA_FIM,
+    )
+    linhas = []
+    try:
+        for n_ativos in tamanhos_ativos:
+            for n_dias in tamanhos_dias:
+                # --- 1. Bases sintéticas e período padrão cobrindo todas as datas ---
+                diretorio = os.path.join(destino, f"{n_ativos}x{n_dias}")
+                t_gerar, (ajustada, mercado) = _tempo(
+                    lambda: gerador_sintetico.gerar_bases(
+                        diretorio, n_ativos, n_dias, **opcoes_gerador
+                    )
+                )
+                datas = dados._ler_csv(ajustada, tickers=[]).index
+                dados.definir_bases(
+                    ajustada, mercado, str(datas[0].date()), str(datas[-1].date())
+                )
+
+                # --- 2. Carga, limpeza e otimizações ---
+                t_limpeza, (df_ret, _) = _tempo(
+                    lambda: dados.preparar_bases(limite_ffill=limite_ffill)
+                )
+                t_markowitz, carteira = _tempo(
+                    lambda: markowitz.Otimizacao_Markowitz(
+                        10, 0.2, 0.105, limite_ffill=limite_ffill
+                    )
+                )
+
+                def episodio():
+                    env = deepRF.PortfolioEnv(df_ret, max_weight=0.2)
+                    env.reset(seed=0)
+                    rng = np.random.default_rng(0)
+                    for _ in range(min(passos_env, len(df_ret) - env.window_size)):
+                        acao = rng.uniform(-1, 1, env.num_assets).astype(np.float32)
+                        if env.step(acao)[2]:
+                            break
+
+                t_env, _ = _tempo(episodio)
+                t_backtest, _ = _tempo(
+                    lambda: comparacao.run_backtest_and_plot(
+                        carteira, carteira, 0.105, fill_limit=limite_ffill
+                    )
+                )
+                linhas.append(
+                    {
+                        "ativos": n_ativos,
+                        "dias": n_dias,
+                        "painel": df_ret.shape,
+                        "gerar_s": t_gerar,
+                        "limpeza_s": t_limpeza,
+                        "markowitz_s": t_markowitz,
+                        "env_s": t_env,
+                        "backtest_s": t_backtest,
+                    }
+                )
+                print(
+                    f"{n_ativos} ativos x {n_dias} dias (painel {df_ret.shape[0]}x"
+                    f"{df_ret.shape[1]}): limpeza {t_limpeza:.2f} s | Markowitz "
+                    f"{t_markowitz:.2f} s | env {passos_env} passos {t_env:.2f} s | "
+                    f"backtest {t_backtest:.2f} s"
+                )
+    finally:
+        dados.definir_bases(*originais)
+    return linhas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    p_csv = sub.add_parser("csv", help="pd.read_csv x leitor pyarrow")
+    p_csv.add_argument("caminhos", nargs="*")
+    p_csv.add_argument("--repeticoes", type=int, default=5)
+
+    p_escala = sub.add_parser("escala", help="modelos sobre bases sintéticas")
+    p_escala.add_argument("--ativos", type=int, nargs="+", default=[100, 1000])
+    p_escala.add_argument("--dias", type=int, nargs="+", default=[5 * 252, 20 * 252])
+    p_escala.add_argument("--destino", default=None)
+    p_escala.add_argument("--limite-ffill", type=int, default=5)
+    p_escala.add_argument("--passos-env", type=int, default=1000)
+    p_escala.add_argument("--taxa-nan", type=float, default=0.02)
+    p_escala.add_argument("--correlacao", type=float, default=0.3)
+
+    p_lw = sub.add_parser("ledoit_wolf", help="pypfopt x kernel NumPy (float64/32)")
+    p_lw.add_argument("--ativos", type=int, nargs="+", default=[80, 500, 2000])
+    p_lw.add_argument("--dias", type=int, default=5 * 252)
+    p_lw.add_argument("--repeticoes", type=int, default=3)
+
+    p_jm = sub.add_parser("janela_movel", help="walk-forward incremental x pypfopt")
+    p_jm.add_argument("--ativos", type=int, nargs="+", default=[50, 200])
+    p_jm.add_argument("--anos", type=int, default=5)
+    p_jm.add_argument("--janela", type=int, default=252)
+
+    args = parser.parse_args()
+    if args.benchmark == "csv":
+        benchmark_csv(args.caminhos, args.repeticoes)
+    elif args.benchmark == "escala":
+        benchmark_escala(
+            args.ativos,
+            args.dias,
+            args.destino,
+            args.limite_ffill,
+            args.passos_env,
+            taxa_nan=args.taxa_nan,
+            correlacao=args.correlacao,
+        )
+    elif args.benchmark == "ledoit_wolf":
+        benchmark_ledoit_wolf(args.ativos, args.dias, args.repeticoes)
+    elif args.benchmark == "janela_movel":
+        benchmark_janela_movel(args.ativos, args.anos, args.janela)
@@ -0,0 +1,366 @@
+"""
+Markowitz com número exato de ativos (restrição de cardinalidade):
+
+    soma(w) = 1,   exatamente `quantidade_ativos` ativos com
+    peso_minimo <= w <= peso_maximo e os demais com peso zero
+
+por branch-and-bound. Cada nó fixa ativos dentro (peso >= peso_minimo) ou
+fora (peso 0) e resolve a relaxação contínua com `conjunto_ativo`: o máximo
+Sharpe (ou a mínima variância com retorno alvo) sem a cardinalidade limita
+o melhor resultado possível no nó. Os nós abertos são avaliados em lotes
+(opcionalmente em paralelo entre processos) até provar a otimalidade ou
+acabar o tempo.
+"""
+import heapq
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+from pypfopt import EfficientFrontier
+from pypfopt.exceptions import OptimizationError
+
+import conjunto_ativo
+
+# Peso mínimo de um ativo escolhido: sem ele, a carteira poderia "conter"
+# o ativo com peso zero e ficar com menos ativos do que o pedido
+PESO_MINIMO = 0.01
+# Gap relativo entre a incumbente e o limite a partir do qual ela é ótima
+TOL_GAP = 1e-6
+TOL_SUPORTE = 1e-9
+
+# Dados do problema em cada processo (ver `_iniciar_processo`)
+_problema = None
+
+
+def _iniciar_processo(problema: dict):
+    """Inicializador do pool: recebe mu, S e os parâmetros uma única vez."""
+    global _problema
+    _problema = problema
+
+
+def _resolver(problema: dict, candidatos: np.ndarray, incluidos: np.ndarray) -> tuple:
+    """
+    Resolve o problema contínuo só nos `candidatos`, com peso mínimo nos
+    `incluidos`. Devolve (custo, pesos em todos os ativos) ou None se
+    inviável. O custo é -Sharpe (máximo Sharpe) ou a variância (retorno alvo).
+
+    Se o conjunto ativo não converge, o nó é resolvido pelo cvxpy; se este
+    também falha, devolve (-inf, None): sem limite conhecido, o nó não pode
+    ser descartado.
+    """
+    mu, S = problema["mu"], problema["S"]
+    idx = np.flatnonzero(candidatos)
+    mu_c, S_c = mu[idx], S[np.ix_(idx, idx)]
+    minimo = np.where(incluidos[idx], problema["peso_minimo"], 0.0)
+    taxa, alvo = problema["taxa_livre_risco"], problema["retorno_alvo"]
+    try:
+        if alvo is None:
+            w = conjunto_ativo.maximo_sharpe(
+                mu_c, S_c, problema["peso_maximo"], taxa, peso_minimo=minimo
+            )
+            custo = -(mu_c @ w - taxa) / np.sqrt(w @ S_c @ w)
+        else:
+            w, _ = conjunto_ativo.minima_variancia(
+                S_c, problema["peso_maximo"], mu_c, alvo, peso_minimo=minimo
+            )
+            custo = w @ S_c @ w
+    except ValueError:
+        return None
+    except RuntimeError:
+        try:
+            w, custo = _resolver_cvxpy(mu_c, S_c, minimo, problema["peso_maximo"], taxa, alvo)
+        except (OptimizationError, ValueError):
+            return -np.inf, None
+    pesos = np.zeros(len(mu))
+    pesos[idx] = w
+    return float(custo), pesos
+
+
+def _resolver_cvxpy(mu_c, S_c, minimo, peso_maximo, taxa, alvo) -> tuple:
+    """O mesmo problema contínuo pelo EfficientFrontier; devolve (pesos, custo)."""
+    ef = EfficientFrontier(mu_c, S_c, weight_bounds=[(m, peso_maximo) for m in minimo])
+    if alvo is None:
+        w = np.asarray(list(ef.max_sharpe(risk_free_rate=taxa).values()))
+        return w, -(mu_c @ w - taxa) / np.sqrt(w @ S_c @ w)
+    w = np.asarray(list(ef.efficient_return(alvo).values()))
+    return w, w @ S_c @ w
+
+
+def _corte(custo: float) -> float:
+    """Nós só valem a pena se o limite bate a incumbente por mais que TOL_GAP."""
+    if not np.isfinite(custo):
+        return custo
+    return custo - TOL_GAP * max(abs(custo), 1e-12)
+
+
+def _avaliar_no(no: tuple, problema: dict = None) -> tuple:
+    """
+    Avalia um nó (incluidos, excluidos): relaxação e carteira heurística com
+    exatamente `quantidade_ativos` ativos (os incluídos mais os de maior peso
+    na relaxação). Devolve (relaxação, heurística), cada uma no formato de
+    `_resolver`.
+    """
+    problema = problema or _problema
+    incluidos, excluidos = no
+    n, k = len(problema["mu"]), problema["quantidade_ativos"]
+    dentro = np.zeros(n, dtype=bool)
+    dentro[list(incluidos)] = True
+    candidatos = np.ones(n, dtype=bool)
+    candidatos[list(excluidos)] = False
+
+    relaxacao = _resolver(problema, candidatos, dentro)
+    if relaxacao is None:
+        return None, None
+    pesos = relaxacao[1]
+    if pesos is None:
+        # Relaxação sem solução: a heurística e o ramo seguem o Sharpe individual
+        pesos = np.zeros(n)
+    elif _viavel(pesos, problema):
+        return relaxacao, relaxacao
+
+    # Completa os incluídos com os candidatos de maior peso (e, empatados em
+    # zero, de maior Sharpe individual) até a quantidade pedida
+    prioridade = np.where(candidatos & ~dentro, pesos + problema["sharpe"] * 1e-9, -np.inf)
+    faltam = k - len(incluidos)
+    escolhidos = dentro.copy()
+    escolhidos[np.argsort(-prioridade, kind="stable")[:faltam]] = True
+    heuristica = _resolver(problema, escolhidos, escolhidos)
+    if heuristica is not None and heuristica[1] is None:
+        heuristica = None
+    return relaxacao, heuristica
+
+
+def _avaliar_lote(lote: list, problema: dict, pool, prazo: float) -> list:
+    """
+    `_avaliar_no` em cada (limite, contador, nó) do lote, no pool ou no
+    próprio processo, até o `prazo` (perf_counter). Nós não avaliados a
+    tempo ficam como None.
+    """
+    if pool is None:
+        avaliados = [None] * len(lote)
+        for i, (_, _, no) in enumerate(lote):
+            if time.perf_counter() >= prazo:
+                break
+            avaliados[i] = _avaliar_no(no, problema)
+        return avaliados
+    futuros = [pool.submit(_avaliar_no, no) for _, _, no in lote]
+    _, pendentes = wait(futuros, timeout=max(prazo - time.perf_counter(), 0.0))
+    for futuro in pendentes:
+        futuro.cancel()
+    return [f.result() if f.done() and not f.cancelled() else None for f in futuros]
+
+
+def _viavel(pesos: np.ndarray, problema: dict) -> bool:
+    """Exatamente `quantidade_ativos` pesos positivos, todos >= peso mínimo."""
+    positivos = pesos > TOL_SUPORTE
+    return positivos.sum() == problema["quantidade_ativos"] and bool(
+        np.all(pesos[positivos] >= problema["peso_minimo"] - TOL_SUPORTE)
+    )
+
+
+def _ramificar(no: tuple, pesos: np.ndarray, problema: dict) -> list:
+    """
+    Filhos do nó: escolhe um ativo livre e cria o ramo com ele dentro e o
+    ramo com ele fora. Ativos livres com peso positivo na relaxação vêm
+    antes (o de maior peso: tirá-lo é o que mais mexe no limite); sem eles,
+    o de maior Sharpe individual ainda fora da carteira. Ramos que já
+    decidem todos os ativos (k dentro, ou só k candidatos) são fechados aqui.
+    """
+    incluidos, excluidos = no
+    n, k = len(pesos), problema["quantidade_ativos"]
+    livres = np.ones(n, dtype=bool)
+    livres[list(incluidos) + list(excluidos)] = False
+    if not livres.any():
+        return []
+    positivos = livres & (pesos > TOL_SUPORTE)
+    if positivos.any():
+        i = int(np.flatnonzero(positivos)[np.argmax(pesos[positivos])])
+    else:
+        i = int(np.flatnonzero(livres)[np.argmax(problema["sharpe"][livres])])
+
+    filhos = []
+    dentro = incluidos + (i,)
+    if len(dentro) == k:
+        # Todos os demais ficam fora
+        filhos.append((dentro, tuple(j for j in range(n) if j not in dentro)))
+    elif len(dentro) < k:
+        filhos.append((dentro, excluidos))
+    fora = excluidos + (i,)
+    if n - len(fora) == k:
+        # Todos os candidatos restantes ficam dentro
+        filhos.append((tuple(j for j in range(n) if j not in fora), fora))
+    elif n - len(fora) > k:
+        filhos.append((incluidos, fora))
+    return filhos
+
+
+def retorno_maximo(
+    mu, quantidade_ativos: int, peso_maximo: float, peso_minimo=PESO_MINIMO
+) -> float:
+    """
+    Maior retorno possível com exatamente `quantidade_ativos` ativos entre
+    `peso_minimo` e `peso_maximo`: os de maior retorno esperado, preenchidos
+    em ordem a partir do peso mínimo (trocar um ativo por outro de retorno
+    maior, com o mesmo peso, nunca piora a carteira).
+    """
+    mu = np.asarray(mu, dtype=np.float64)
+    maiores = np.sort(mu)[::-1][:quantidade_ativos]
+    limites = conjunto_ativo._limites(quantidade_ativos, peso_minimo, peso_maximo)
+    return float(maiores @ conjunto_ativo.carteira_extrema(maiores, limites))
+
+
+def carteira_cardinalidade(
+    mu,
+    S,
+    quantidade_ativos: int,
+    peso_maximo: float,
+    taxa_livre_risco: float = 0.02,
+    retorno_alvo: float = None,
+    peso_minimo: float = PESO_MINIMO,
+    tempo_limite: float = 10.0,
+    n_processos: int = 1,
+    ao_melhorar=None,
+) -> dict:
+    """
+    Carteira de maior Sharpe (ou, com `retorno_alvo`, de mínima variância com
+    mu'w >= retorno_alvo) com exatamente `quantidade_ativos` ativos, cada um
+    entre `peso_minimo` e `peso_maximo`.
+
+    Para ao provar a otimalidade (gap <= TOL_GAP) ou ao passar de
+    `tempo_limite` segundos, devolvendo a melhor carteira encontrada até ali.
+    Cada nova incumbente é impressa e, se dado, passada a
+    `ao_melhorar(resultado)`. Por padrão os nós são avaliados no próprio
+    processo; `n_processos` > 1 (None: núcleos da máquina) os avalia em
+    paralelo em um pool de processos novos ("spawn") criado na chamada.
+    Nós ainda em avaliação quando o tempo acaba voltam para a fila e contam
+    no limite.
+
+    Devolve um dict com "pesos" ({ticker: peso}), "objetivo" (Sharpe ou
+    variância da carteira), "limite" (melhor valor possível ainda não
+    descartado), "gap", "otimo", "nos" e "segundos".
+    """
+    inicio = time.perf_counter()
+    tickers = list(getattr(mu, "index", range(len(mu))))
+    mu = np.asarray(mu, dtype=np.float64)
+    S = np.asarray(S, dtype=np.float64)
+    n, k = len(mu), quantidade_ativos
+    if not 1 <= k <= n:
+        raise ValueError(f"Quantidade de ativos {k} fora de [1, {n}].")
+    if k * peso_maximo < 1 - conjunto_ativo.TOL_PESO or k * peso_minimo > 1:
+        raise ValueError(
+            f"Inviável: {k} ativos com pesos entre {peso_minimo} e {peso_maximo} não somam 1."
+        )
+    if retorno_alvo is not None:
+        maximo = retorno_maximo(mu, k, peso_maximo, peso_minimo)
+        if retorno_alvo > maximo + conjunto_ativo.TOL_PESO:
+            raise ValueError(
+                f"Retorno alvo {retorno_alvo:.4f} acima do máximo com {k} ativos ({maximo:.4f})."
+            )
+
+    problema = {
+        "mu": mu,
+        "S": S,
+        "quantidade_ativos": k,
+        "peso_maximo": peso_maximo,
+        "peso_minimo": peso_minimo,
+        "taxa_livre_risco": taxa_livre_risco,
+        "retorno_alvo": retorno_alvo,
+        "sharpe": (mu - taxa_livre_risco) / np.sqrt(np.diag(S)),
+    }
+    sinal = 1.0 if retorno_alvo is not None else -1.0
+    if n_processos is None:
+        n_processos = os.cpu_count() or 1
+
+    # --- 1. Nó raiz (com k == n, todos os ativos já estão dentro) ---
+    raiz = (tuple(range(n)), ()) if k == n else ((), ())
+    abertos = [(-np.inf, 0, raiz)]
+    contador, nos = 1, 0
+    melhor_custo, melhor_pesos = np.inf, None
+
+    def resultado(limite: float) -> dict:
+        gap = (melhor_custo - limite) / max(abs(melhor_custo), 1e-12)
+        return {
+            "pesos": dict(zip(tickers, melhor_pesos.tolist())),
+            "objetivo": sinal * melhor_custo,
+            "limite": sinal * limite,
+            "gap": max(gap, 0.0),
+            "otimo": gap <= TOL_GAP,
+            "nos": nos,
+            "segundos": time.perf_counter() - inicio,
+        }
+
+    # --- 2. Best-first em lotes de nós avaliados em paralelo ---
+    pool = None
+    if n_processos > 1:
+        # "spawn": o app roda em threads, e fork de um processo com threads
+        # pode herdar locks presos
+        pool = ProcessPoolExecutor(
+            n_processos,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_iniciar_processo,
+            initargs=(problema,),
+        )
+    try:
+        while abertos and time.perf_counter() - inicio < tempo_limite:
+            corte = _corte(melhor_custo)
+            lote = []
+            while abertos and len(lote) < n_processos:
+                aberto = heapq.heappop(abertos)
+                if aberto[0] < corte:
+                    lote.append(aberto)
+            if not lote:
+                break
+            avaliados = _avaliar_lote(lote, problema, pool, inicio + tempo_limite)
+            # Os não avaliados a tempo voltam para a fila com o limite que tinham
+            for aberto, avaliado in zip(lote, avaliados):
+                if avaliado is None:
+                    heapq.heappush(abertos, aberto)
+            nos += sum(avaliado is not None for avaliado in avaliados)
+
+            for (limite_pai, _, no), avaliado in zip(lote, avaliados):
+                if avaliado is None:
+                    continue
+                relaxacao, heuristica = avaliado
+                if heuristica is not None and heuristica[0] < melhor_custo:
+                    melhor_custo, melhor_pesos = heuristica
+                    limite = min([max(relaxacao[0], limite_pai)] + [a[0] for a in abertos])
+                    parcial = resultado(limite)
+                    print(
+                        f"> Incumbente: objetivo {parcial['objetivo']:.6f}, "
+                        f"gap {parcial['gap']:.2%}, {nos} nós, {parcial['segundos']:.2f} s"
+                    )
+                    if ao_melhorar is not None:
+                        ao_melhorar(parcial)
+                if relaxacao is None:
+                    continue
+                custo, pesos = relaxacao
+                if pesos is None:
+                    # Sem relaxação: os filhos herdam o limite do pai e o
+                    # ramo segue o Sharpe individual
+                    custo, pesos = limite_pai, np.zeros(len(mu))
+                elif _viavel(pesos, problema):
+                    continue
+                custo = max(custo, limite_pai)
+                if custo < _corte(melhor_custo):
+                    for filho in _ramificar(no, pesos, problema):
+                        heapq.heappush(abertos, (custo, contador, filho))
+                        contador += 1
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    if melhor_pesos is None:
+        raise ValueError(
+            f"Nenhuma carteira viável com {k} ativos"
+            + (f" e retorno alvo {retorno_alvo:.4f}." if retorno_alvo is not None else ".")
+        )
+    # --- 3. Limite global: o menor entre os nós ainda abertos ---
+    limite = min([melhor_custo] + [a[0] for a in abertos])
+    final = resultado(limite)
+    print(
+        f"> Branch-and-bound: {final['nos']} nós em {final['segundos']:.2f} s, "
+        f"gap {final['gap']:.2%}" + (" (ótimo)" if final["otimo"] else " (tempo esgotado)")
+    )
+    return final
@@ -3,9 +3,18 @@ import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+import dados
 
-def calculate_performance_metrics(daily_returns, risk_free_rate=0.105):
-    """Calcula as principais métricas de desempenho de uma série de retornos diários."""
+
+# Início do período de backtest ("fora da amostra" de 2020–2021)
+INICIO_BACKTEST = "2022-01-01"
+
+
+def calculate_performance_metrics(daily_returns, risk_free_rate=0.105, periods_per_year=252):
+    """
+    Calcula as principais métricas de desempenho de uma série de retornos
+    diários (ou de outra frequência, com `periods_per_year` períodos por ano).
+    """
     if daily_returns.empty:
         return {
             "Retorno Anualizado": 0,
@@ -15,7 +24,7 @@ def calculate_performance_metrics(daily_returns, risk_free_rate=0.105):
         }
 
     # Constante para anualização
-    trading_days = 252
+    trading_days = periods_per_year
 
     # Retorno Anualizado
     mean_daily_return = daily_returns.mean()
@@ -43,126 +52,276 @@ def calculate_performance_metrics(daily_returns, risk_free_rate=0.105):
     }
 
 
-def run_backtest_and_plot(
-    carteira_markowitz: dict, carteira_drl: dict, taxa_livre_risco: float
-):
+def _available_portfolios(portfolios: dict, columns) -> dict:
+    """Mantém apenas as carteiras com dados de retorno para todos os ativos."""
+    available = {}
+    for name, weights_dict in portfolios.items():
+        if not all(ticker in columns for ticker in weights_dict):
+            print(
+                f"Aviso: Nem todos os ativos da carteira '{name}' estão disponíveis no período de backtest."
+            )
+            continue
+        available[name] = weights_dict
+    return available
+
+
+def portfolio_returns_in_chunks(
+    portfolios: dict, start_date: str = INICIO_BACKTEST, chunk_size: int = 250
+) -> pd.DataFrame:
     """
-    Executa o backtest para duas carteiras e gera gráficos comparativos.
+    Retornos diários de cada carteira calculados em uma única passada sobre a
+    base ajustada, bloco a bloco (dados.iterar_blocos), sem carregar a tabela
+    inteira. Usa as mesmas regras do backtest em memória: retornos entre
+    pregões consecutivos, descartando os dias com NaN em qualquer ativo.
     """
-    try:
-        # --- 1. Carregamento e Preparação dos Dados ---
-        # Usamos a cota ajustada para o backtest, pois reflete o retorno total
-        df_returns = pd.read_csv(
-            "Base Cota Ajustada.csv", parse_dates=["dt_pregao"], index_col="dt_pregao"
+    previous = None
+    chunks = []
+    for block in dados.iterar_blocos(dados.BASE_COTA_AJUSTADA, chunk_size):
+        if previous is None:
+            portfolios = _available_portfolios(portfolios, block.columns)
+            positions = {
+                name: (block.columns.get_indexer(list(w)), np.array(list(w.values())))
+                for name, w in portfolios.items()
+            }
+            prices, dates = block.to_numpy(), block.index[1:]
+        else:
+            prices, dates = np.vstack([previous, block.to_numpy()]), block.index
+        previous = block.to_numpy()[-1:]
+
+        returns = prices[1:] / prices[:-1] - 1
+        keep = ~np.isnan(returns).any(axis=1) & (dates >= pd.Timestamp(start_date))
+        chunks.append(
+            pd.DataFrame(
+                {name: returns[keep][:, cols] @ w for name, (cols, w) in positions.items()},
+                index=dates[keep],
+            )
         )
-        df_returns = df_returns.pct_change().dropna()  # Calcula os retornos diários
+    return pd.concat(chunks) if chunks else pd.DataFrame()
+
+
+def _backtest_and_plot(
+    carteira_markowitz: dict,
+    carteira_drl: dict,
+    taxa_livre_risco: float,
+    chunk_size: int = None,
+    fill_limit: int = None,
+    frequency: str = "diaria",
+):
+    portfolios = {"Markowitz": carteira_markowitz, "DRL": carteira_drl}
 
-        # Define o período do backtest (e.g., a partir de 2022 para testar "fora da amostra")
-        df_backtest = df_returns.loc["2022-01-01":]
+    # --- 1. Carregamento e Preparação dos Dados ---
+    if chunk_size and frequency != "diaria":
+        raise ValueError("O backtest em blocos só está disponível na frequência diária.")
+    if chunk_size:
+        # Uma passada sobre a base em blocos de datas, sem carregá-la inteira
+        df_portfolio_returns = portfolio_returns_in_chunks(
+            portfolios, INICIO_BACKTEST, chunk_size
+        )
+    else:
+        # Usamos a cota ajustada para o backtest, pois reflete o retorno total
+        if fill_limit is None:
+            # Retornos diários pré-calculados no armazém da base (ou entre
+            # períodos da base reamostrada, rebalanceando a cada período)
+            df_returns = dados.carregar_retornos(
+                dados.BASE_COTA_AJUSTADA, frequencia=frequency
+            ).dropna()
 
-        portfolios = {"Markowitz": carteira_markowitz, "DRL": carteira_drl}
-        df_cumulative_returns = pd.DataFrame(index=df_backtest.index)
-        all_metrics = {}
+            # Define o período do backtest (e.g., a partir de 2022 para testar "fora da amostra")
+            df_backtest = df_returns.loc[INICIO_BACKTEST:]
+        else:
+            # Só os tickers das carteiras, com lacunas curtas preenchidas:
+            # um dia sem cota de um FII fora das carteiras não é descartado
+            tickers = sorted({t for p in portfolios.values() if p for t in p})
+            df_backtest = dados.retornos_alinhados(
+                dados.BASE_COTA_AJUSTADA, tickers, INICIO_BACKTEST, fill_limit, frequency
+            )
 
-        # --- 2. Cálculo do Desempenho de Cada Carteira ---
-        for name, weights_dict in portfolios.items():
-            tickers = list(weights_dict.keys())
+        df_portfolio_returns = pd.DataFrame(index=df_backtest.index)
+        for name, weights_dict in _available_portfolios(
+            portfolios, df_backtest.columns
+        ).items():
             weights = np.array(list(weights_dict.values()))
+            df_portfolio_returns[name] = df_backtest[list(weights_dict)].dot(weights)
 
-            # Garante que temos os dados de retorno para todos os ativos da carteira
-            if not all(ticker in df_backtest.columns for ticker in tickers):
-                print(
-                    f"Aviso: Nem todos os ativos da carteira '{name}' estão disponíveis no período de backtest."
-                )
-                continue
+    df_cumulative_returns = pd.DataFrame(index=df_portfolio_returns.index)
+    all_metrics = {}
+    periods_per_year = (
+        dados.periodos_por_ano(frequency, df_portfolio_returns.index)
+        if len(df_portfolio_returns)
+        else 252
+    )
 
-            portfolio_returns = df_backtest[tickers].dot(weights)
-            df_cumulative_returns[name] = (1 + portfolio_returns).cumprod() * 100
+    # --- 2. Cálculo do Desempenho de Cada Carteira ---
+    for name in df_portfolio_returns.columns:
+        portfolio_returns = df_portfolio_returns[name]
+        df_cumulative_returns[name] = (1 + portfolio_returns).cumprod() * 100
 
-            # Calcula as métricas de desempenho
-            all_metrics[name] = calculate_performance_metrics(
-                portfolio_returns, taxa_livre_risco
-            )
+        # Calcula as métricas de desempenho
+        all_metrics[name] = calculate_performance_metrics(
+            portfolio_returns, taxa_livre_risco, periods_per_year
+        )
 
-        # --- 3. Geração dos Gráficos Comparativos ---
-        # Gráfico 1: Rentabilidade Acumulada
-        fig_cumulative = go.Figure()
-        for col in df_cumulative_returns.columns:
-            fig_cumulative.add_trace(
-                go.Scatter(
-                    x=df_cumulative_returns.index,
-                    y=df_cumulative_returns[col],
-                    mode="lines",
-                    name=col,
-                )
+    # --- 3. Geração dos Gráficos Comparativos ---
+    # Gráfico 1: Rentabilidade Acumulada
+    fig_cumulative = go.Figure()
+    for col in df_cumulative_returns.columns:
+        fig_cumulative.add_trace(
+            go.Scatter(
+                x=df_cumulative_returns.index,
+                y=df_cumulative_returns[col],
+                mode="lines",
+                name=col,
             )
-        fig_cumulative.update_layout(
-            title="<b>Rentabilidade Acumulada (R$ 100 Iniciais)</b>",
-            xaxis_title="Data",
-            yaxis_title="Valor da Carteira (R$)",
-            legend_title="Carteira",
-            template="plotly_white",
         )
+    fig_cumulative.update_layout(
+        title="<b>Rentabilidade Acumulada (R$ 100 Iniciais)</b>",
+        xaxis_title="Data",
+        yaxis_title="Valor da Carteira (R$)",
+        legend_title="Carteira",
+        template="plotly_white",
+    )
+
+    # Gráfico 2: Alocação de Ativos (Pizza)
+    fig_pies = make_subplots(
+        rows=1,
+        cols=2,
+        specs=[[{"type": "domain"}, {"type": "domain"}]],
+        subplot_titles=("<b>Alocação Markowitz</b>", "<b>Alocação DRL</b>"),
+    )
+    # Tenta extrair as carteiras, tratando o caso de uma delas não existir
+    mkw_labels = list(carteira_markowitz.keys())
+    mkw_values = list(carteira_markowitz.values())
+    drl_labels = list(carteira_drl.keys())
+    drl_values = list(carteira_drl.values())
 
-        # Gráfico 2: Alocação de Ativos (Pizza)
-        fig_pies = make_subplots(
-            rows=1,
-            cols=2,
-            specs=[[{"type": "domain"}, {"type": "domain"}]],
-            subplot_titles=("<b>Alocação Markowitz</b>", "<b>Alocação DRL</b>"),
+    fig_pies.add_trace(
+        go.Pie(labels=mkw_labels, values=mkw_values, name="Markowitz"), 1, 1
+    )
+    fig_pies.add_trace(
+        go.Pie(labels=drl_labels, values=drl_values, name="DRL"), 1, 2
+    )
+    fig_pies.update_traces(hole=0.4, hoverinfo="label+percent+name")
+    fig_pies.update_layout(title_text="<b>Composição das Carteiras Otimizadas</b>")
+
+    # Gráfico 3: Comparação de Métricas (Barras)
+    df_metrics = pd.DataFrame(all_metrics).T
+    fig_metrics = go.Figure()
+    colors = {
+        "Retorno Anualizado": "green",
+        "Volatilidade Anualizada": "red",
+        "Índice de Sharpe": "blue",
+        "Máximo Drawdown": "orange",
+    }
+
+    for metric in df_metrics.columns:
+        # Formatação especial para percentuais
+        if "Retorno" in metric or "Volatilidade" in metric or "Drawdown" in metric:
+            text_template = "%{y:.2%}"
+        else:  # Formatação para números decimais (Sharpe)
+            text_template = "%{y:.2f}"
+
+        fig_metrics.add_trace(
+            go.Bar(
+                name=metric,
+                x=df_metrics.index,
+                y=df_metrics[metric],
+                text=df_metrics[metric],
+                textposition="auto",
+                texttemplate=text_template,
+            )
         )
-        # Tenta extrair as carteiras, tratando o caso de uma delas não existir
-        mkw_labels = list(carteira_markowitz.keys())
-        mkw_values = list(carteira_markowitz.values())
-        drl_labels = list(carteira_drl.keys())
-        drl_values = list(carteira_drl.values())
-
-        fig_pies.add_trace(
-            go.Pie(labels=mkw_labels, values=mkw_values, name="Markowitz"), 1, 1
+
+    fig_metrics.update_layout(
+        barmode="group",
+        title_text="<b>Métricas de Desempenho Comparativas</b>",
+        yaxis_title="Valor",
+        xaxis_title="Modelo",
+        template="plotly_white",
+    )
+
+    return fig_cumulative, fig_pies, fig_metrics, all_metrics
+
+
+def plot_efficient_frontier(volatilities, returns, portfolio=None):
+    """
+    Gráfico da fronteira eficiente (volatilidade x retorno anualizados), com a
+    carteira escolhida destacada quando `portfolio` = (retorno, volatilidade).
+    """
+    valid = ~(np.isnan(volatilities) | np.isnan(returns))
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scatter(
+            x=np.asarray(volatilities)[valid],
+            y=np.asarray(returns)[valid],
+            mode="lines+markers",
+            name="Fronteira eficiente",
         )
-        fig_pies.add_trace(
-            go.Pie(labels=drl_labels, values=drl_values, name="DRL"), 1, 2
+    )
+    if portfolio is not None:
+        fig.add_trace(
+            go.Scatter(
+                x=[portfolio[1]],
+                y=[portfolio[0]],
+                mode="markers",
+                marker=dict(size=14, symbol="star"),
+                name="Carteira Markowitz",
+            )
         )
-        fig_pies.update_traces(hole=0.4, hoverinfo="label+percent+name")
-        fig_pies.update_layout(title_text="<b>Composição das Carteiras Otimizadas</b>")
-
-        # Gráfico 3: Comparação de Métricas (Barras)
-        df_metrics = pd.DataFrame(all_metrics).T
-        fig_metrics = go.Figure()
-        colors = {
-            "Retorno Anualizado": "green",
-            "Volatilidade Anualizada": "red",
-            "Índice de Sharpe": "blue",
-            "Máximo Drawdown": "orange",
-        }
+    fig.update_layout(
+        title="Fronteira Eficiente (Markowitz)",
+        xaxis_title="Volatilidade Anualizada",
+        yaxis_title="Retorno Esperado Anualizado",
+        xaxis_tickformat=".1%",
+        yaxis_tickformat=".1%",
+        template="plotly_white",
+    )
+    return fig
 
-        for metric in df_metrics.columns:
-            # Formatação especial para percentuais
-            if "Retorno" in metric or "Volatilidade" in metric or "Drawdown" in metric:
-                text_template = "%{y:.2%}"
-            else:  # Formatação para números decimais (Sharpe)
-                text_template = "%{y:.2f}"
-
-            fig_metrics.add_trace(
-                go.Bar(
-                    name=metric,
-                    x=df_metrics.index,
-                    y=df_metrics[metric],
-                    text=df_metrics[metric],
-                    textposition="auto",
-                    texttemplate=text_template,
-                )
-            )
 
-        fig_metrics.update_layout(
-            barmode="group",
-            title_text="<b>Métricas de Desempenho Comparativas</b>",
-            yaxis_title="Valor",
-            xaxis_title="Modelo",
-            template="plotly_white",
-        )
+def run_backtest_and_plot(
+    carteira_markowitz: dict,
+    carteira_drl: dict,
+    taxa_livre_risco: float,
+    chunk_size: int = None,
+    fill_limit: int = None,
+    frequency: str = "diaria",
+):
+    """
+    Executa o backtest para duas carteiras e gera gráficos comparativos.
+
+    Com `chunk_size`, a base é percorrida em blocos de datas (para históricos
+    que não cabem em memória) em vez de usar os retornos pré-calculados.
+    Com `fill_limit`, lacunas de até `fill_limit` pregões nos tickers das
+    carteiras são preenchidas com a última cota, em vez de descartar o dia.
+    `frequency` ("diaria", "semanal", "mensal", ...) reamostra a base, e as
+    carteiras são rebalanceadas a cada período.
 
-        return fig_cumulative, fig_pies, fig_metrics, all_metrics
+    O resultado fica em cache pela versão dos dados e pelas carteiras/taxa,
+    então repetir a comparação com as mesmas entradas não refaz o backtest.
+    """
+    try:
+        chave = (
+            "backtest",
+            INICIO_BACKTEST,
+            None,
+            tuple(carteira_markowitz.items()),
+            tuple(carteira_drl.items()),
+            taxa_livre_risco,
+            chunk_size,
+            fill_limit,
+            frequency,
+        )
+        return dados.memoizado(
+            chave,
+            lambda: _backtest_and_plot(
+                carteira_markowitz,
+                carteira_drl,
+                taxa_livre_risco,
+                chunk_size,
+                fill_limit,
+                frequency,
+            ),
+        )
 
     except Exception as e:
         print(f"Ocorreu um erro ao gerar a comparação: {e}")
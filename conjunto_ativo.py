@@ -0,0 +1,386 @@
+"""
+Solver de conjunto ativo para o Markowitz long-only com limites por ativo:
+
+    min w'Sw   s.a.   soma(w) = 1,   peso_minimo <= w <= peso_maximo,   [mu'w >= retorno_alvo]
+
+Com peso_minimo = 0 é exatamente a classe de problemas resolvida em
+`Otimizacao_Markowitz`; limites por ativo (arrays) servem às relaxações do
+branch-and-bound de cardinalidade (cardinalidade.py). Em vez
+de montar e canonicalizar um modelo genérico do cvxpy, cada iteração resolve
+um sistema KKT denso só nos ativos livres (fora dos limites), o que para as
+carteiras do app (dezenas de ativos) leva frações de milissegundo.
+"""
+import numpy as np
+
+# Tolerâncias de viabilidade (pesos) e de otimalidade (multiplicadores)
+TOL_PESO = 1e-12
+TOL_MULTIPLICADOR = 1e-12
+MAX_ITERACOES = 500
+
+
+def _resolver_kkt(S_ff, E_f, lado_direito) -> tuple:
+    """Resolve [S_ff E_f'; E_f 0] [x; lam] = lado_direito (mínimos quadrados se singular)."""
+    n, m = S_ff.shape[0], E_f.shape[0]
+    kkt = np.zeros((n + m, n + m))
+    kkt[:n, :n] = S_ff
+    kkt[:n, n:] = E_f.T
+    kkt[n:, :n] = E_f
+    try:
+        solucao = np.linalg.solve(kkt, lado_direito)
+    except np.linalg.LinAlgError:
+        solucao = np.linalg.lstsq(kkt, lado_direito, rcond=None)[0]
+    return solucao[:n], solucao[n:]
+
+
+def _limites(n: int, peso_minimo, peso_maximo) -> tuple:
+    """Limites inferior e superior por ativo (aceita escalares ou arrays)."""
+    inferior = np.broadcast_to(np.asarray(peso_minimo, dtype=np.float64), (n,)).copy()
+    superior = np.broadcast_to(np.asarray(peso_maximo, dtype=np.float64), (n,)).copy()
+    if inferior.sum() > 1 + TOL_PESO or superior.sum() < 1 - TOL_PESO:
+        raise ValueError(
+            f"Inviável: limites de peso somam [{inferior.sum():.4f}, {superior.sum():.4f}], "
+            "sem conter 1."
+        )
+    return inferior, superior
+
+
+def carteira_extrema(mu, limites: tuple, maior: bool = True) -> np.ndarray:
+    """
+    Carteira de maior (ou menor) retorno dentro dos limites com soma 1: parte
+    dos pesos mínimos e preenche o restante pelos ativos em ordem de retorno.
+    """
+    inferior, superior = limites
+    ordem = np.argsort(-mu if maior else mu, kind="stable")
+    capacidade = (superior - inferior)[ordem]
+    resto = 1 - inferior.sum()
+    w = inferior.copy()
+    w[ordem] += np.clip(resto - (np.cumsum(capacidade) - capacidade), 0, capacidade)
+    return w
+
+
+def _ponto_viavel(E, f, limites, mu=None) -> np.ndarray:
+    """
+    Pesos que satisfazem soma = 1, os limites e, com duas linhas em E,
+    mu'w = retorno_alvo: combinação convexa das carteiras de menor e de maior
+    retorno (ambas na caixa), que atinge qualquer retorno entre os dois.
+    """
+    if E.shape[0] == 1:
+        inferior, superior = limites
+        # Mesma fração da folga de cada ativo: soma 1 e dentro dos limites
+        folga = superior - inferior
+        return inferior + folga * (1 - inferior.sum()) / max(folga.sum(), TOL_PESO)
+    w_max = carteira_extrema(mu, limites, maior=True)
+    w_min = carteira_extrema(mu, limites, maior=False)
+    r_max, r_min, alvo = mu @ w_max, mu @ w_min, f[1]
+    if not r_min - TOL_PESO <= alvo <= r_max + TOL_PESO:
+        raise ValueError(
+            f"Retorno alvo {alvo:.4f} fora do intervalo viável [{r_min:.4f}, {r_max:.4f}]."
+        )
+    t = 1.0 if r_max == r_min else np.clip((alvo - r_min) / (r_max - r_min), 0, 1)
+    return t * w_max + (1 - t) * w_min
+
+
+def _partida(S, E, f, limites, mu, inicial) -> tuple:
+    """
+    Ponto viável e conjunto de trabalho iniciais. Com `inicial`, resolve o
+    KKT com os ativos presos da solução anterior: se a solução respeita os
+    limites, parte dela; senão, anda de um ponto viável em direção a ela até
+    o primeiro limite (todo o segmento satisfaz E w = f). Sem `inicial`,
+    parte de `_ponto_viavel`.
+    """
+    n = S.shape[0]
+    inferior, superior = limites
+    w = _ponto_viavel(E, f, limites, mu)
+    if inicial is not None:
+        presos = np.asarray(inicial).copy()
+        livres = presos == 0
+        tentativa = np.where(presos > 0, superior, inferior)
+        if livres.any():
+            lado = np.concatenate(
+                [
+                    -S[np.ix_(livres, ~livres)] @ tentativa[~livres],
+                    f - E[:, ~livres] @ tentativa[~livres],
+                ]
+            )
+            tentativa[livres], _ = _resolver_kkt(S[np.ix_(livres, livres)], E[:, livres], lado)
+        if np.allclose(E @ tentativa, f, atol=1e-10):
+            if np.all(tentativa >= inferior - TOL_PESO) and np.all(tentativa <= superior + TOL_PESO):
+                return np.clip(tentativa, inferior, superior), presos
+            direcao = tentativa - w
+            limite = np.where(direcao > 0, superior, inferior)
+            moveis = np.abs(direcao) > TOL_PESO
+            razoes = np.full(n, np.inf)
+            razoes[moveis] = (limite[moveis] - w[moveis]) / direcao[moveis]
+            w = np.clip(w + min(razoes.min(), 1.0) * direcao, inferior, superior)
+
+    presos = np.zeros(n, dtype=int)
+    presos[w <= inferior + TOL_PESO] = -1
+    presos[w >= superior - TOL_PESO] = 1
+    return w, presos
+
+
+def _conjunto_ativo(S, E, f, limites, mu=None, inicial=None) -> tuple:
+    """
+    Conjunto ativo primal (Nocedal & Wright, alg. 16.3) com restrições de
+    igualdade E w = f e limites inferior <= w <= superior. O conjunto de
+    trabalho é o de ativos presos em um limite: -1 (inferior), +1 (superior),
+    0 (livre).
+
+    `inicial` (conjunto de trabalho de uma resolução anterior) é usado como
+    ponto de partida quando leva a uma solução viável (warm start).
+    Devolve (pesos, conjunto de trabalho).
+    """
+    n = S.shape[0]
+    w, presos = _partida(S, E, f, limites, mu, inicial)
+
+    for _ in range(MAX_ITERACOES):
+        livres = presos == 0
+        gradiente = S @ w
+        passo = np.zeros(n)
+        if livres.any():
+            passo[livres], lam = _resolver_kkt(
+                S[np.ix_(livres, livres)],
+                E[:, livres],
+                np.concatenate([-gradiente[livres], np.zeros(len(f))]),
+            )
+
+        if not livres.any() or np.abs(passo).max() <= TOL_PESO:
+            # Ponto estacionário no conjunto de trabalho: confere os
+            # multiplicadores dos limites (E_f' lam = gradiente nos livres)
+            if livres.any():
+                lam = np.linalg.lstsq(E[:, livres].T, gradiente[livres], rcond=None)[0]
+            else:
+                lam = np.linalg.lstsq(E.T, gradiente, rcond=None)[0]
+            multiplicadores = (gradiente - E.T @ lam) * -presos
+            multiplicadores[livres] = np.inf
+            i = int(np.argmin(multiplicadores))
+            if multiplicadores[i] >= -TOL_MULTIPLICADOR:
+                return w, presos
+            presos[i] = 0
+            continue
+
+        # Maior passo que mantém os livres dentro dos limites
+        alfa, bloqueio = 1.0, None
+        moveis = livres & (np.abs(passo) > TOL_PESO)
+        if moveis.any():
+            limite = np.where(passo > 0, limites[1], limites[0])
+            razoes = np.full(n, np.inf)
+            razoes[moveis] = (limite[moveis] - w[moveis]) / passo[moveis]
+            i = int(np.argmin(razoes))
+            if razoes[i] < 1.0:
+                alfa, bloqueio = max(razoes[i], 0.0), i
+        w = w + alfa * passo
+        if bloqueio is not None:
+            presos[bloqueio] = 1 if passo[bloqueio] > 0 else -1
+            w[bloqueio] = limites[1][bloqueio] if presos[bloqueio] > 0 else limites[0][bloqueio]
+
+    raise RuntimeError("Conjunto ativo não convergiu.")
+
+
+def minima_variancia(
+    S, peso_maximo, mu=None, retorno_alvo: float = None, inicial=None, peso_minimo=0.0
+) -> tuple:
+    """
+    Carteira de mínima variância com soma 1 e peso_minimo <= w <= peso_maximo
+    (escalares ou um valor por ativo) e, com `retorno_alvo`,
+    mu'w >= retorno_alvo (como `EfficientFrontier.efficient_return`).
+    Devolve (pesos, conjunto de trabalho), que pode ser passado em `inicial`
+    na próxima resolução.
+    """
+    S = np.asarray(S, dtype=np.float64)
+    n = S.shape[0]
+    limites = _limites(n, peso_minimo, peso_maximo)
+
+    E, f = np.ones((1, n)), np.ones(1)
+    w, presos = _conjunto_ativo(S, E, f, limites, inicial=inicial)
+    if retorno_alvo is None:
+        return w, presos
+
+    mu = np.asarray(mu, dtype=np.float64)
+    if mu @ w >= retorno_alvo - TOL_PESO:
+        # A restrição de retorno não está ativa na mínima variância
+        return w, presos
+    E, f = np.vstack([np.ones(n), mu]), np.array([1.0, retorno_alvo])
+    return _conjunto_ativo(S, E, f, limites, mu, inicial=presos)
+
+
+def _retorno_linear(S, mu, limites, presos) -> tuple:
+    """
+    Com o conjunto de trabalho fixo, a solução de mínima variância com
+    mu'w = r é afim em r: devolve (w0, w1) com w(r) = w0 + r w1.
+    """
+    n = len(mu)
+    livres = presos == 0
+    fixos = np.where(presos > 0, limites[1], np.where(presos < 0, limites[0], 0.0))
+    E_f = np.vstack([np.ones(n), mu])[:, livres]
+    base = -S[np.ix_(livres, ~livres)] @ fixos[~livres]
+    soma_fixos, retorno_fixos = fixos.sum(), mu @ fixos
+    w0, w1 = fixos.copy(), np.zeros(n)
+    w0[livres], _ = _resolver_kkt(
+        S[np.ix_(livres, livres)], E_f, np.concatenate([base, [1 - soma_fixos, -retorno_fixos]])
+    )
+    w1[livres], _ = _resolver_kkt(
+        S[np.ix_(livres, livres)], E_f, np.concatenate([np.zeros(livres.sum()), [0.0, 1.0]])
+    )
+    return w0, w1
+
+
+def maximo_sharpe(
+    mu,
+    S,
+    peso_maximo,
+    taxa_livre_risco: float = 0.02,
+    tol: float = 1e-12,
+    peso_minimo=0.0,
+) -> np.ndarray:
+    """
+    Carteira de maior Sharpe com soma 1 e peso_minimo <= w <= peso_maximo
+    (como `EfficientFrontier.max_sharpe`).
+
+    Parte de um retorno alvo, resolve o problema com `minima_variancia` e,
+    mantendo os ativos presos dessa solução, maximiza o Sharpe em forma
+    fechada (nesse trecho da fronteira os pesos são afins no retorno alvo).
+    Repete a partir do novo retorno até o conjunto de trabalho não mudar.
+
+    O Sharpe é unimodal ao longo da fronteira, então cada resolução diz de
+    que lado do alvo está o ótimo e estreita um intervalo [inferior,
+    superior]. Quando o ótimo cai no canto entre dois trechos, o r* de um
+    aponta para o outro e vice-versa; se o novo alvo repete um já avaliado
+    (ou sai do intervalo), o passo vira bisseção, que converge para o canto.
+    """
+    mu = np.asarray(mu, dtype=np.float64)
+    S = np.asarray(S, dtype=np.float64)
+    if not (mu > taxa_livre_risco).any():
+        raise ValueError(
+            "at least one of the assets must have an expected return exceeding the risk-free rate"
+        )
+
+    limites = _limites(len(mu), peso_minimo, peso_maximo)
+    w_min, presos = minima_variancia(S, peso_maximo, peso_minimo=peso_minimo)
+    w_max = carteira_extrema(mu, limites)
+    r_min, r_max = mu @ w_min, mu @ w_max
+    if r_max - r_min <= tol:
+        return w_min
+
+    E = np.vstack([np.ones(len(mu)), mu])
+    inferior, superior = r_min, r_max
+    alvo = (r_min + r_max) / 2
+    avaliados, melhor, melhor_sharpe = [], None, -np.inf
+    for _ in range(MAX_ITERACOES):
+        # Retorno acima do da mínima variância: a restrição de retorno é ativa
+        w, presos = _conjunto_ativo(
+            S, E, np.array([1.0, alvo]), limites, mu, inicial=presos
+        )
+        avaliados.append(alvo)
+        sharpe = (mu @ w - taxa_livre_risco) / np.sqrt(max(w @ S @ w, 0.0))
+        if sharpe > melhor_sharpe:
+            melhor, melhor_sharpe = w, sharpe
+        if not (presos == 0).any():
+            novo = alvo
+        else:
+            # Sharpe(r) = (r - rf) / sqrt(A r² + 2B r + C) é máximo em
+            # r* = -(C + rf B) / (B + rf A)
+            w0, w1 = _retorno_linear(S, mu, limites, presos)
+            A, B, C = w1 @ S @ w1, w0 @ S @ w1, w0 @ S @ w0
+            denominador = B + taxa_livre_risco * A
+            novo = r_max if denominador >= 0 else -(C + taxa_livre_risco * B) / denominador
+            novo = float(np.clip(novo, r_min, r_max))
+        if abs(novo - alvo) <= tol:
+            return w
+
+        # O ótimo está do lado de r*: estreita o intervalo
+        if novo > alvo:
+            inferior = alvo
+        else:
+            superior = alvo
+        if superior - inferior <= tol:
+            return melhor
+        repetido = any(abs(novo - a) <= tol for a in avaliados)
+        if repetido or not inferior <= novo <= superior:
+            novo = (inferior + superior) / 2
+        alvo = novo
+    raise RuntimeError("Máximo Sharpe não convergiu.")
+
+
+def _multiplicadores_lineares(S, E, w0, w1, presos) -> tuple:
+    """
+    Multiplicadores dos limites, com sinal que deve ser >= 0 no ótimo, ao
+    longo do trecho w(r) = w0 + r w1: afins em r, devolve (m0, m1).
+    """
+    livres = presos == 0
+
+    def multiplicadores(w):
+        gradiente = S @ w
+        lam = np.linalg.lstsq(E[:, livres].T, gradiente[livres], rcond=None)[0]
+        return (gradiente - E.T @ lam) * -presos
+
+    m0 = multiplicadores(w0)
+    return m0, multiplicadores(w0 + w1) - m0
+
+
+def cantos_fronteira(mu, S, peso_maximo, peso_minimo=0.0, sonda: float = 1e-7) -> tuple:
+    """
+    Carteiras de canto da fronteira (soma 1, limites por ativo) por homotopia
+    no retorno alvo, da mínima variância ao retorno máximo. Em cada trecho o
+    conjunto de trabalho é fixo e os pesos e os multiplicadores dos limites
+    são afins no retorno; o trecho vale enquanto os pesos livres ficam nos
+    limites e nenhum multiplicador troca de sinal. O conjunto de cada trecho
+    vem de `_conjunto_ativo` um pouco acima do canto anterior (`sonda`,
+    relativa à largura da fronteira); se a sonda pula um trecho mais curto
+    que ela, o início do trecho seguinte entra como canto (um ponto exato da
+    fronteira), e o erro da interpolação fica na ordem da sonda.
+
+    Devolve (retornos, pesos): retornos crescentes e um canto por linha.
+    """
+    mu = np.asarray(mu, dtype=np.float64)
+    S = np.asarray(S, dtype=np.float64)
+    limites = _limites(len(mu), peso_minimo, peso_maximo)
+    inferior, superior = limites
+    w, presos = minima_variancia(S, peso_maximo, peso_minimo=peso_minimo)
+    r, r_max = mu @ w, mu @ carteira_extrema(mu, limites)
+    retornos, pesos = [r], [w]
+    passo_minimo = sonda * max(r_max - r, 1e-12)
+    E = np.vstack([np.ones(len(mu)), mu])
+
+    passo = passo_minimo
+    for _ in range(MAX_ITERACOES):
+        if r >= r_max - passo_minimo:
+            break
+        alvo = min(r + passo, r_max)
+        w, presos = _conjunto_ativo(S, E, np.array([1.0, alvo]), limites, mu, inicial=presos)
+        livres = presos == 0
+        if np.linalg.matrix_rank(E[:, livres]) < 2:
+            # Conjunto em que o retorno não varia (um vértice): sonda mais longe
+            passo *= 10
+            continue
+        passo = passo_minimo
+
+        # Intervalo do trecho: pesos livres dentro dos limites e
+        # multiplicadores dos ativos presos sem trocar de sinal
+        w0, w1 = _retorno_linear(S, mu, limites, presos)
+        m0, m1 = _multiplicadores_lineares(S, E, w0, w1, presos)
+        inicio, fim = r, r_max
+        with np.errstate(divide="ignore", invalid="ignore"):
+            teto = np.where(w1 > 0, superior - w0, inferior - w0) / w1
+            piso = np.where(w1 > 0, inferior - w0, superior - w0) / w1
+            zero = -m0 / m1
+        sobe, desce = livres & (w1 != 0), ~livres & (m1 > 0)
+        if sobe.any():
+            fim = min(fim, teto[sobe].min())
+            inicio = max(inicio, piso[sobe].max())
+        if (~livres & (m1 < 0)).any():
+            fim = min(fim, zero[~livres & (m1 < 0)].min())
+        if desce.any():
+            inicio = max(inicio, zero[desce].max())
+        inicio, fim = min(inicio, alvo), max(fim, alvo)
+
+        if inicio > r:
+            retornos.append(inicio)
+            pesos.append(np.clip(w0 + inicio * w1, inferior, superior))
+        retornos.append(fim)
+        pesos.append(np.clip(w0 + fim * w1, inferior, superior))
+        r = fim
+
+    if retornos[-1] < r_max - passo_minimo:
+        raise RuntimeError("Cantos da fronteira não convergiram.")
+    return np.array(retornos), np.array(pesos)
@@ -0,0 +1,1323 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from armazem_sqlite import ArmazemSQLite
+
+
+# --- Bases de cotas utilizadas pelos modelos ---
+BASE_COTA_AJUSTADA = "Base Cota Ajustada.csv"
+BASE_COTA_MERCADO = "Base Cota Mercado.csv"
+# Banco SQLite (backend "sqlite") criado no mesmo diretório das bases
+BANCO_SQLITE = "Base Cotas.sqlite"
+# Cadastro dos FIIs com liquidez diária média acima de R$ 1 milhão
+BASE_FIIS = "Base FIIs.xlsx"
+
+# Parâmetros padrão da limpeza usada pelos modelos
+DATA_INICIO = "2020-01-01"
+DATA_FIM = "2024-12-31"
+COBERTURA_MINIMA = 0.90
+
+# Frequências dos painéis: nome -> regra do pandas (None = pregões da base).
+# Outras regras do pandas (ex.: "30min") agregam bases com horário em barras
+FREQUENCIAS = {"diaria": None, "semanal": "W-FRI", "mensal": "ME"}
+PERIODOS_POR_ANO = {"diaria": 252, "semanal": 52, "mensal": 12}
+
+# Versão do layout do armazém binário gravado ao lado de cada CSV
+VERSAO_ARMAZEM = 4
+
+# Cache por processo: caminho absoluto -> (assinatura do arquivo, valor)
+# (bases carregadas só com parte dos tickers usam (caminho, tickers) como chave)
+_cache_bases = {}
+_cache_armazens = {}
+_cache_universo = {}
+_cache_sqlite = {}
+# Hash do conteúdo por assinatura (caminho, mtime, tamanho) do arquivo
+_cache_hashes = {}
+_lock_bases = threading.Lock()
+
+# Precisão das cotas no armazém: "float64" ou "float32" (metade da memória;
+# derivados como retornos continuam em float64)
+PRECISOES_ARMAZEM = ("float64", "float32")
+_precisao_armazem = os.environ.get("TCC_PRECISAO_ARMAZEM", "float64")
+
+# Leitor dos CSVs: "pandas" (pd.read_csv) ou "pyarrow" (multi-thread, opcional)
+MOTORES_CSV = ("pandas", "pyarrow")
+_motor_csv = os.environ.get("TCC_MOTOR_CSV", "pandas")
+
+# Backend de armazenamento das bases: "mmap" (ArmazemPrecos) ou "sqlite"
+BACKENDS = ("mmap", "sqlite")
+_backend = os.environ.get("TCC_BACKEND_DADOS", "mmap")
+
+# Resultados memoizados por versão dos dados: (etapa, inicio, fim, ...) ->
+# (versão, resultado). O fim do período fica sempre na posição 2 da chave.
+_cache_limpeza = OrderedDict()
+# Estimativas de retorno esperado e covariância (`estimadores.estimativa`):
+# pequenas e reaproveitadas entre otimizadores, então têm um LRU próprio
+_cache_estimativas = OrderedDict()
+# Caches memoizados (LRU) e a quantidade máxima de resultados em cada um
+_CACHES_MEMO = {"limpeza": _cache_limpeza, "estimativas": _cache_estimativas}
+_MAX_CACHES_MEMO = {"limpeza": 16, "estimativas": 128}
+
+
+def _assinatura_arquivo(caminho: str) -> tuple:
+    """Identifica a versão do arquivo em disco por caminho, mtime e tamanho."""
+    stat = os.stat(caminho)
+    return (os.path.abspath(caminho), stat.st_mtime_ns, stat.st_size)
+
+
+def _somente_leitura(df: pd.DataFrame) -> pd.DataFrame:
+    """Reconstrói o DataFrame sobre uma matriz marcada como não gravável."""
+    valores = df.to_numpy()
+    valores.flags.writeable = False
+    return pd.DataFrame(valores, index=df.index, columns=df.columns, copy=False)
+
+
+def _ler_cabecalho(caminho: str) -> list:
+    with open(caminho, "r") as arquivo:
+        return arquivo.readline().strip().split(",")
+
+
+def _ler_csv(caminho: str, tickers=None, motor: str = None) -> pd.DataFrame:
+    usecols = None
+    if tickers is not None:
+        # Só as colunas pedidas são convertidas, na ordem do próprio CSV
+        pedidos = set(tickers)
+        usecols = ["dt_pregao"] + [
+            t for t in _ler_cabecalho(caminho)[1:] if t in pedidos
+        ]
+    if (motor or _motor_csv) == "pyarrow":
+        return _ler_csv_pyarrow(caminho, usecols)
+    return pd.read_csv(
+        caminho, parse_dates=["dt_pregao"], index_col="dt_pregao", usecols=usecols
+    )
+
+
+def _ler_csv_pyarrow(caminho: str, usecols=None) -> pd.DataFrame:
+    """
+    Mesmo resultado de `pd.read_csv(..., parse_dates=["dt_pregao"],
+    index_col="dt_pregao")`, usando o leitor multi-thread do pyarrow com tipos
+    explícitos: float64 em todos os tickers e parser ISO para dt_pregao.
+    """
+    try:
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+    except ImportError as e:
+        raise ImportError("O motor 'pyarrow' requer o pacote pyarrow instalado.") from e
+
+    colunas = usecols or _ler_cabecalho(caminho)
+    tickers = [c for c in colunas if c != "dt_pregao"]
+    tabela = pa_csv.read_csv(
+        caminho,
+        read_options=pa_csv.ReadOptions(use_threads=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={
+                "dt_pregao": pa.timestamp("s"),
+                **{t: pa.float64() for t in tickers},
+            },
+            timestamp_parsers=[pa_csv.ISO8601],
+            include_columns=["dt_pregao"] + tickers,
+        ),
+    )
+
+    valores = np.empty((tabela.num_rows, len(tickers)), dtype=np.float64)
+    for j, ticker in enumerate(tickers):
+        valores[:, j] = tabela.column(ticker).to_numpy()
+    datas = pd.DatetimeIndex(tabela.column("dt_pregao").to_numpy(), name="dt_pregao")
+    # Mesma resolução que o pandas instalado usa ao converter datas em texto
+    datas = datas.as_unit(pd.DatetimeIndex(["2000-01-01"]).unit)
+    return pd.DataFrame(valores, index=datas, columns=pd.Index(tickers), copy=False)
+
+
+def _gravar_npy(caminho: str, array: np.ndarray):
+    # Grava em arquivo temporário e troca de uma vez: processos que já mapeiam
+    # a versão anterior continuam lendo o arquivo antigo até fecharem.
+    temporario = caminho + ".tmp"
+    with open(temporario, "wb") as arquivo:
+        np.save(arquivo, array, allow_pickle=False)
+    os.replace(temporario, caminho)
+
+
+def _anexar_npy(caminho: str, linhas: np.ndarray) -> bool:
+    """
+    Anexa linhas ao final de um .npy (ordem C) sem regravar o conteúdo atual.
+
+    O numpy reserva espaço no cabeçalho para o crescimento do primeiro eixo,
+    então basta escrever os novos bytes no fim e atualizar o shape. Retorna
+    False se o arquivo não permitir a atualização in-place.
+    """
+    with open(caminho, "r+b") as arquivo:
+        versao = np.lib.format.read_magic(arquivo)
+        if versao == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(arquivo)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(arquivo)
+        tamanho_cabecalho = arquivo.tell()
+        linhas = np.ascontiguousarray(linhas, dtype=dtype)
+        if fortran or linhas.shape[1:] != shape[1:]:
+            return False
+
+        cabecalho = io.BytesIO()
+        descricao = {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": (shape[0] + len(linhas),) + tuple(shape[1:]),
+        }
+        if versao == (1, 0):
+            np.lib.format.write_array_header_1_0(cabecalho, descricao)
+        else:
+            np.lib.format.write_array_header_2_0(cabecalho, descricao)
+        if cabecalho.tell() != tamanho_cabecalho:
+            return False
+
+        # Dados primeiro, shape depois: quem abrir no meio vê a versão anterior
+        arquivo.seek(0, os.SEEK_END)
+        arquivo.write(linhas.tobytes())
+        arquivo.seek(0)
+        arquivo.write(cabecalho.getvalue())
+    return True
+
+
+def _retornos_simples(valores, anterior, inicio: int) -> np.ndarray:
+    # Retorno do dia t depende só das cotas de t e t-1
+    base = valores[max(inicio - 1, 0) :]
+    retornos = base[1:] / base[:-1] - 1
+    if inicio == 0:
+        retornos = np.vstack([np.full((1, valores.shape[1]), np.nan), retornos])
+    return retornos
+
+
+def _retornos_log(valores, anterior, inicio: int) -> np.ndarray:
+    return np.log1p(_retornos_simples(valores, anterior, inicio))
+
+
+def _contagem_validos(valores, anterior, inicio: int) -> np.ndarray:
+    # Contagem acumulada de cotas não-NaN por ticker até cada data (inclusive)
+    contagem = np.cumsum(~np.isnan(valores[inicio:]), axis=0, dtype=np.int32)
+    if inicio > 0:
+        contagem += anterior[inicio - 1]
+    return contagem
+
+
+# Dados derivados das cotas gravados junto do armazém: nome -> função que
+# calcula as linhas [inicio:] a partir das cotas e do derivado já existente.
+DERIVADOS = {
+    "retornos": _retornos_simples,
+    "retornos_log": _retornos_log,
+    "contagem_validos": _contagem_validos,
+}
+
+
+class ArmazemPrecos:
+    """
+    Painel de preços (datas x tickers) persistido como uma matriz float64
+    contígua (valores.npy) mais os índices de datas e tickers em arquivos
+    separados, aberto via memory-map.
+
+    Vários processos (sessões do Streamlit, workers do SubprocVecEnv) que abrem
+    o mesmo diretório compartilham as páginas do arquivo em cache do sistema
+    operacional, em vez de cada um manter sua própria cópia do DataFrame.
+
+    Os dados derivados registrados em `DERIVADOS` ficam no mesmo diretório
+    (<nome>.npy, alinhados às datas) e são estendidos junto com as cotas em
+    `anexar`.
+    """
+
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+        meta = np.load(os.path.join(diretorio, "meta.npy"), allow_pickle=False)
+        self.versao, self.mtime_ns, self.tamanho = (int(v) for v in meta)
+        self.valores = np.load(
+            os.path.join(diretorio, "valores.npy"), mmap_mode="r", allow_pickle=False
+        )
+        self.datas = pd.DatetimeIndex(
+            np.load(os.path.join(diretorio, "datas.npy"), allow_pickle=False),
+            name="dt_pregao",
+        )
+        self.tickers = pd.Index(
+            np.load(os.path.join(diretorio, "tickers.npy"), allow_pickle=False).tolist()
+        )
+        if self.valores.shape != (len(self.datas), len(self.tickers)):
+            raise ValueError(f"Armazém inconsistente em {diretorio}")
+        self._derivados = {}
+
+    def derivado(self, nome: str) -> np.ndarray:
+        """Matriz derivada (ver `DERIVADOS`) alinhada a `datas` e `tickers`."""
+        if nome not in self._derivados:
+            array = np.load(
+                os.path.join(self.diretorio, f"{nome}.npy"),
+                mmap_mode="r",
+                allow_pickle=False,
+            )
+            self._derivados[nome] = array[: len(self.datas)]
+        return self._derivados[nome]
+
+    @classmethod
+    def gravar(
+        cls,
+        diretorio: str,
+        df: pd.DataFrame,
+        mtime_ns: int = 0,
+        tamanho: int = 0,
+        precisao: str = "float64",
+    ) -> "ArmazemPrecos":
+        """
+        Persiste o DataFrame no diretório e devolve o armazém já aberto.
+
+        Com precisao="float32" as cotas ocupam metade do espaço (em disco, no
+        cache de páginas e em cada fatia usada pelos modelos); os derivados são
+        calculados antes da conversão e continuam em float64.
+        """
+        os.makedirs(diretorio, exist_ok=True)
+        valores = np.ascontiguousarray(df.to_numpy(dtype=np.float64))
+        _gravar_npy(
+            os.path.join(diretorio, "valores.npy"), valores.astype(precisao, copy=False)
+        )
+        _gravar_npy(os.path.join(diretorio, "datas.npy"), df.index.to_numpy())
+        _gravar_npy(
+            os.path.join(diretorio, "tickers.npy"),
+            np.array(df.columns.tolist(), dtype=str),
+        )
+        for nome, calcular in DERIVADOS.items():
+            _gravar_npy(os.path.join(diretorio, f"{nome}.npy"), calcular(valores, None, 0))
+        # O meta é gravado por último: só vale quando os demais estão completos
+        _gravar_npy(
+            os.path.join(diretorio, "meta.npy"),
+            np.array([VERSAO_ARMAZEM, mtime_ns, tamanho], dtype=np.int64),
+        )
+        return cls(diretorio)
+
+    def anexar(
+        self, df_novos: pd.DataFrame, mtime_ns: int = 0, tamanho: int = 0
+    ) -> "ArmazemPrecos":
+        """
+        Acrescenta pregões posteriores ao último já armazenado, sem regravar o
+        histórico, e recalcula apenas as linhas novas dos derivados.
+
+        Devolve o armazém reaberto com o novo tamanho (este objeto continua
+        enxergando a versão anterior). Se os arquivos não permitirem o
+        acréscimo in-place, o armazém é regravado por inteiro.
+        """
+        if len(df_novos) and len(self.datas) and df_novos.index.min() <= self.datas[-1]:
+            raise ValueError("Os novos pregões devem ser posteriores ao último armazenado.")
+
+        novos = np.ascontiguousarray(
+            df_novos.reindex(columns=self.tickers).to_numpy(dtype=np.float64)
+        )
+        inicio = len(self.datas)
+        # Em float32 a linha anterior (usada no retorno do primeiro dia novo)
+        # vem arredondada; as linhas novas entram nos derivados em float64
+        valores = np.concatenate(
+            [np.asarray(self.valores[max(inicio - 1, 0) :], dtype=np.float64), novos]
+        )
+
+        anexos = {"valores.npy": novos, "datas.npy": df_novos.index.to_numpy()}
+        for nome, calcular in DERIVADOS.items():
+            # Os derivados só olham para trás até a linha anterior: recalcula
+            # sobre a cauda e mantém apenas as linhas novas
+            anterior = None if inicio == 0 else self.derivado(nome)[inicio - 1 :]
+            cauda = calcular(valores, anterior, min(inicio, 1))
+            anexos[f"{nome}.npy"] = cauda[-len(novos) :] if len(novos) else cauda[:0]
+
+        for arquivo, linhas in anexos.items():
+            if not _anexar_npy(os.path.join(self.diretorio, arquivo), linhas):
+                df_total = pd.concat(
+                    [self.para_dataframe(), df_novos.reindex(columns=self.tickers)]
+                )
+                return ArmazemPrecos.gravar(
+                    self.diretorio, df_total, mtime_ns, tamanho, self.valores.dtype.name
+                )
+
+        _gravar_npy(
+            os.path.join(self.diretorio, "meta.npy"),
+            np.array([VERSAO_ARMAZEM, mtime_ns, tamanho], dtype=np.int64),
+        )
+        return ArmazemPrecos(self.diretorio)
+
+    def intervalo(self, inicio=None, fim=None) -> slice:
+        """Converte um período (inclusivo, como em .loc) em fatia de linhas."""
+        i = 0 if inicio is None else self.datas.searchsorted(pd.Timestamp(inicio), "left")
+        j = (
+            len(self.datas)
+            if fim is None
+            else self.datas.searchsorted(pd.Timestamp(fim), "right")
+        )
+        return slice(i, j)
+
+    def cobertura(self, inicio=None, fim=None) -> tuple:
+        """
+        Quantidade de cotas válidas por ticker no período e número de pregões
+        do período, a partir da contagem acumulada gravada na ingestão: O(1)
+        por ticker, sem percorrer a janela.
+        """
+        linhas = self.intervalo(inicio, fim)
+        contagem = self.derivado("contagem_validos")
+        if linhas.stop <= linhas.start:
+            return np.zeros(len(self.tickers), dtype=np.int64), 0
+        validos = contagem[linhas.stop - 1].astype(np.int64)
+        if linhas.start > 0:
+            validos = validos - contagem[linhas.start - 1]
+        return validos, linhas.stop - linhas.start
+
+    def posicoes(self, tickers) -> np.ndarray:
+        posicoes = self.tickers.get_indexer(list(tickers))
+        if (posicoes < 0).any():
+            faltantes = [t for t, p in zip(tickers, posicoes) if p < 0]
+            raise KeyError(f"Tickers ausentes no armazém: {faltantes}")
+        return posicoes
+
+    def fatia(self, inicio=None, fim=None, tickers=None) -> np.ndarray:
+        """
+        Devolve a submatriz do período e tickers pedidos.
+
+        O recorte por datas é sempre uma view sem cópia. O recorte por tickers
+        também é, quando eles formam um bloco contíguo na ordem do armazém;
+        caso contrário apenas a janela selecionada é copiada.
+        """
+        linhas = self.intervalo(inicio, fim)
+        if tickers is None:
+            return self.valores[linhas]
+
+        posicoes = self.posicoes(tickers)
+        if len(posicoes) and (np.diff(posicoes) == 1).all():
+            return self.valores[linhas, posicoes[0] : posicoes[-1] + 1]
+        return self.valores[linhas][:, posicoes]
+
+    def para_dataframe(self, inicio=None, fim=None, tickers=None) -> pd.DataFrame:
+        """Mesma fatia de `fatia`, embrulhada em um DataFrame sem copiar os dados."""
+        linhas = self.intervalo(inicio, fim)
+        colunas = self.tickers if tickers is None else pd.Index(list(tickers))
+        return pd.DataFrame(
+            self.fatia(inicio, fim, tickers),
+            index=self.datas[linhas],
+            columns=colunas,
+            copy=False,
+        )
+
+
+def _diretorio_armazem(caminho: str) -> str:
+    return os.path.splitext(caminho)[0] + ".cache"
+
+
+def _abrir_armazem_existente(caminho: str, assinatura: tuple):
+    """Abre o armazém da base, se existir e corresponder ao CSV atual."""
+    diretorio = _diretorio_armazem(caminho)
+    try:
+        armazem = ArmazemPrecos(diretorio)
+    except (OSError, ValueError):
+        return None
+    if (
+        armazem.versao != VERSAO_ARMAZEM
+        or armazem.mtime_ns != assinatura[1]
+        or armazem.tamanho != assinatura[2]
+        or armazem.valores.dtype != np.dtype(_precisao_armazem)
+    ):
+        return None
+    return armazem
+
+
+def carregar_armazem(caminho: str):
+    """
+    Devolve o armazém memory-mapped da base, criando-o a partir do CSV na
+    primeira vez e recriando-o apenas quando o CSV mudar em disco.
+
+    Retorna None se o armazém não puder ser gravado (ex.: diretório somente
+    leitura); nesse caso `carregar_base` segue apenas com o CSV.
+    """
+    assinatura = _assinatura_arquivo(caminho)
+    with _lock_bases:
+        em_cache = _cache_armazens.get(assinatura[0])
+        if em_cache is not None and em_cache[0] == assinatura:
+            return em_cache[1]
+
+        armazem = _abrir_armazem_existente(caminho, assinatura)
+        if armazem is None:
+            df = _ler_csv(caminho)
+            try:
+                armazem = ArmazemPrecos.gravar(
+                    _diretorio_armazem(caminho),
+                    df,
+                    assinatura[1],
+                    assinatura[2],
+                    _precisao_armazem,
+                )
+            except OSError as e:
+                print(f"> Não foi possível gravar o armazém binário de {caminho}: {e}")
+                _cache_bases[assinatura[0]] = (assinatura, _somente_leitura(df))
+                return None
+
+        _cache_armazens[assinatura[0]] = (assinatura, armazem)
+        return armazem
+
+
+def _carregar_base_podada(caminho: str, tickers: tuple) -> pd.DataFrame:
+    assinatura = _assinatura_arquivo(caminho)
+    chave = (assinatura[0], tickers)
+    with _lock_bases:
+        em_cache = _cache_bases.get(chave)
+        if em_cache is not None and em_cache[0] == assinatura:
+            return em_cache[1]
+        armazem = _cache_armazens.get(assinatura[0])
+        armazem = armazem[1] if armazem is not None and armazem[0] == assinatura else None
+
+    if armazem is None:
+        armazem = _abrir_armazem_existente(caminho, assinatura)
+    if armazem is not None:
+        # Base já convertida: recorta as colunas direto do memory-map
+        pedidos = set(tickers)
+        presentes = [t for t in armazem.tickers if t in pedidos]
+        df = armazem.para_dataframe(tickers=presentes)
+    else:
+        df = _ler_csv(caminho, tickers)
+
+    df = _somente_leitura(df)
+    with _lock_bases:
+        _cache_bases[chave] = (assinatura, df)
+    return df
+
+
+def _armazem_sqlite(caminho: str) -> ArmazemSQLite:
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    banco = os.path.join(diretorio, BANCO_SQLITE)
+    with _lock_bases:
+        if banco not in _cache_sqlite:
+            _cache_sqlite[banco] = ArmazemSQLite(banco)
+        return _cache_sqlite[banco]
+
+
+def _sincronizar_sqlite(caminho: str, assinatura: tuple) -> tuple:
+    """
+    Garante a base em dia no banco SQLite, recarregando-a do CSV se mudou.
+    Mesmo lock da conversão para o armazém: só uma thread confere a
+    assinatura e recarrega; as demais esperam e a encontram em dia.
+    Devolve (banco, nome da base).
+    """
+    banco = _armazem_sqlite(caminho)
+    base = os.path.basename(caminho)
+    with _lock_bases:
+        if banco.assinatura(base) != assinatura[1:]:
+            print(f"> Carregando {caminho} no banco {BANCO_SQLITE}...")
+            banco.gravar_base(base, _ler_csv(caminho), assinatura[1], assinatura[2])
+    return banco, base
+
+
+def _carregar_base_sqlite(caminho: str, tickers, inicio, fim) -> pd.DataFrame:
+    assinatura = _assinatura_arquivo(caminho)
+    chave = (assinatura[0], "sqlite", tickers, inicio, fim)
+    with _lock_bases:
+        em_cache = _cache_bases.get(chave)
+        if em_cache is not None and em_cache[0] == assinatura:
+            return em_cache[1]
+
+    banco, base = _sincronizar_sqlite(caminho, assinatura)
+    df = _somente_leitura(banco.para_dataframe(base, inicio, fim, tickers))
+    with _lock_bases:
+        _cache_bases[chave] = (assinatura, df)
+    return df
+
+
+def definir_motor_csv(nome: str):
+    """Escolhe o leitor usado ao converter os CSVs ("pandas" ou "pyarrow")."""
+    global _motor_csv
+    if nome not in MOTORES_CSV:
+        raise ValueError(f"Motor de CSV desconhecido: {nome}. Opções: {MOTORES_CSV}")
+    _motor_csv = nome
+
+
+def definir_precisao_armazem(precisao: str):
+    """
+    Escolhe a precisão das cotas no armazém ("float64" ou "float32"). Os
+    armazéns existentes em outra precisão são regravados no próximo acesso.
+    """
+    global _precisao_armazem
+    if precisao not in PRECISOES_ARMAZEM:
+        raise ValueError(
+            f"Precisão desconhecida: {precisao}. Opções: {PRECISOES_ARMAZEM}"
+        )
+    _precisao_armazem = precisao
+    limpar_cache()
+
+
+def definir_backend(nome: str):
+    """Escolhe onde as bases são armazenadas e consultadas ("mmap" ou "sqlite")."""
+    global _backend
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: {nome}. Opções: {BACKENDS}")
+    _backend = nome
+    limpar_cache()
+
+
+def definir_bases(ajustada: str, mercado: str, inicio: str = None, fim: str = None):
+    """
+    Aponta os modelos para outro par de bases (ex.: bases sintéticas de
+    `gerador_sintetico`) e, opcionalmente, para outro período padrão.
+    """
+    global BASE_COTA_AJUSTADA, BASE_COTA_MERCADO, DATA_INICIO, DATA_FIM
+    BASE_COTA_AJUSTADA, BASE_COTA_MERCADO = ajustada, mercado
+    if inicio is not None:
+        DATA_INICIO = inicio
+    if fim is not None:
+        DATA_FIM = fim
+    limpar_cache()
+
+
+def carregar_base(caminho: str, tickers=None, inicio=None, fim=None) -> pd.DataFrame:
+    """
+    Carrega uma base de cotas (dt_pregao x tickers), lendo o CSV apenas uma vez
+    por processo enquanto o arquivo não mudar em disco.
+
+    Na primeira leitura a base é gravada em formato binário (ver
+    `ArmazemPrecos`) ao lado do CSV; nas inicializações seguintes ela vem desse
+    armazém via memory-map, evitando o parse de datas e de texto, até que o
+    CSV seja alterado.
+
+    O DataFrame retornado é compartilhado entre os chamadores e é somente
+    leitura: operações que geram novos objetos (loc, pct_change, dropna sem
+    inplace, ...) funcionam normalmente, mas atribuições diretas falham.
+
+    Com `tickers` (ex.: `tickers_universo()`), apenas essas colunas são lidas:
+    do armazém, se ele já existir, ou do CSV via `usecols`, sem converter as
+    demais. Tickers ausentes na base são ignorados. `inicio` e `fim` restringem
+    o período (inclusivo, como em .loc).
+
+    Com o backend "sqlite" (ver `definir_backend`), período e tickers são
+    filtrados dentro do banco e só as linhas pedidas são materializadas.
+    """
+    if tickers is not None:
+        tickers = tuple(tickers)
+    if _backend == "sqlite":
+        return _carregar_base_sqlite(caminho, tickers, inicio, fim)
+
+    if tickers is not None:
+        df = _carregar_base_podada(caminho, tickers)
+    else:
+        df = _carregar_base_completa(caminho)
+    if inicio is not None or fim is not None:
+        df = df.loc[inicio:fim]
+    return df
+
+
+def _carregar_base_completa(caminho: str) -> pd.DataFrame:
+    assinatura = _assinatura_arquivo(caminho)
+    with _lock_bases:
+        em_cache = _cache_bases.get(assinatura[0])
+        if em_cache is not None and em_cache[0] == assinatura:
+            return em_cache[1]
+
+    armazem = carregar_armazem(caminho)
+    with _lock_bases:
+        if armazem is None:
+            return _cache_bases[assinatura[0]][1]
+
+        df = armazem.para_dataframe()
+        _cache_bases[assinatura[0]] = (assinatura, df)
+        return df
+
+
+def carregar_cota_ajustada(tickers=None, inicio=None, fim=None) -> pd.DataFrame:
+    """Base de cotas ajustadas por rendimentos (usada para retornos)."""
+    return carregar_base(BASE_COTA_AJUSTADA, tickers, inicio, fim)
+
+
+def carregar_cota_mercado(tickers=None, inicio=None, fim=None) -> pd.DataFrame:
+    """Base de cotas de mercado (usada para covariâncias e volatilidades)."""
+    return carregar_base(BASE_COTA_MERCADO, tickers, inicio, fim)
+
+
+def retornos_alinhados(
+    caminho: str,
+    tickers,
+    inicio=None,
+    limite_ffill: int = None,
+    frequencia: str = "diaria",
+) -> pd.DataFrame:
+    """
+    Retornos só dos `tickers` pedidos, calculados sobre o painel (na
+    `frequencia` pedida) com lacunas de até `limite_ffill` períodos
+    preenchidas (`alinhar_painel`). Só são descartadas as datas em que algum
+    desses tickers segue sem cota, e não as datas com NaN em qualquer ticker
+    da base.
+    """
+    painel = carregar_reamostrada(caminho, frequencia, tickers)
+    painel = alinhar_painel(painel, limite_ffill)
+    retornos = painel.pct_change(fill_method=None).dropna()
+    return retornos.loc[inicio:]
+
+
+def iterar_blocos(
+    caminho: str,
+    tamanho_bloco: int = 250,
+    tickers=None,
+    inicio=None,
+    fim=None,
+):
+    """
+    Percorre a base em blocos consecutivos de até `tamanho_bloco` pregões,
+    sem materializar a tabela inteira: fatias do armazém memory-mapped (se já
+    existir), consultas por período no SQLite ou leitura do CSV em partes
+    (`chunksize`). Cada bloco é um DataFrame dt_pregao x tickers.
+    """
+    pedidos = None if tickers is None else set(tickers)
+
+    if _backend == "sqlite":
+        banco, base = _sincronizar_sqlite(caminho, _assinatura_arquivo(caminho))
+        datas = banco.datas(base, inicio, fim)
+        for i in range(0, len(datas), tamanho_bloco):
+            bloco = datas[i : i + tamanho_bloco]
+            yield banco.para_dataframe(base, bloco[0], bloco[-1], tickers)
+        return
+
+    armazem = _abrir_armazem_existente(caminho, _assinatura_arquivo(caminho))
+    if armazem is not None:
+        colunas = [t for t in armazem.tickers if pedidos is None or t in pedidos]
+        linhas = armazem.intervalo(inicio, fim)
+        for i in range(linhas.start, linhas.stop, tamanho_bloco):
+            j = min(i + tamanho_bloco, linhas.stop)
+            yield armazem.para_dataframe(
+                armazem.datas[i], armazem.datas[j - 1], colunas
+            )
+        return
+
+    usecols = None
+    if pedidos is not None:
+        usecols = ["dt_pregao"] + [t for t in _ler_cabecalho(caminho)[1:] if t in pedidos]
+    leitor = pd.read_csv(
+        caminho,
+        parse_dates=["dt_pregao"],
+        index_col="dt_pregao",
+        usecols=usecols,
+        chunksize=tamanho_bloco,
+    )
+    with leitor:
+        for bloco in leitor:
+            if fim is not None and bloco.index[0] > pd.Timestamp(fim):
+                break
+            bloco = bloco.loc[inicio:fim]
+            if len(bloco):
+                yield bloco
+
+
+def carregar_reamostrada(caminho: str, frequencia: str, tickers=None) -> pd.DataFrame:
+    """
+    Base inteira na frequência pedida (ver `reamostrar`), calculada uma vez por
+    versão do arquivo. Com "diaria", é a própria `carregar_base`.
+    """
+    if frequencia == "diaria":
+        return carregar_base(caminho, tickers)
+    if tickers is not None:
+        tickers = tuple(tickers)
+    # A assinatura do próprio arquivo entra na chave: `versao_dados` só
+    # acompanha as duas bases padrão
+    return memoizado(
+        ("reamostragem", None, None, _assinatura_arquivo(caminho), frequencia, tickers),
+        lambda: _somente_leitura(reamostrar(carregar_base(caminho, tickers), frequencia)),
+    )
+
+
+def carregar_retornos(
+    caminho: str, log: bool = False, tickers=None, frequencia: str = "diaria"
+) -> pd.DataFrame:
+    """
+    Retornos diários (simples ou log) de uma base inteira, entre pregões
+    consecutivos, sem preencher lacunas. A primeira data e as datas vizinhas a
+    NaN ficam NaN.
+
+    Vêm prontos do armazém (calculados na conversão e estendidos na ingestão),
+    sem recalcular `pct_change` a cada chamada. Em outra `frequencia`, são os
+    retornos entre períodos consecutivos de `carregar_reamostrada`.
+    """
+    if frequencia != "diaria":
+        if tickers is not None:
+            tickers = tuple(tickers)
+        return memoizado(
+            (
+                "retornos_base",
+                None,
+                None,
+                _assinatura_arquivo(caminho),
+                log,
+                tickers,
+                frequencia,
+            ),
+            lambda: _calcular_retornos(
+                carregar_reamostrada(caminho, frequencia, tickers), log
+            ),
+        )
+
+    nome = "retornos_log" if log else "retornos"
+    assinatura = _assinatura_arquivo(caminho)
+    chave = (assinatura[0], nome)
+    with _lock_bases:
+        em_cache = _cache_bases.get(chave)
+        em_cache = em_cache[1] if em_cache is not None and em_cache[0] == assinatura else None
+
+    if em_cache is None:
+        armazem = carregar_armazem(caminho) if _backend == "mmap" else None
+        if armazem is None:
+            df = carregar_base(caminho)
+            em_cache = pd.DataFrame(
+                DERIVADOS[nome](df.to_numpy(), None, 0),
+                index=df.index,
+                columns=df.columns,
+            )
+            em_cache = _somente_leitura(em_cache)
+        else:
+            em_cache = pd.DataFrame(
+                armazem.derivado(nome),
+                index=armazem.datas,
+                columns=armazem.tickers,
+                copy=False,
+            )
+        with _lock_bases:
+            _cache_bases[chave] = (assinatura, em_cache)
+
+    if tickers is not None:
+        return em_cache[[t for t in em_cache.columns if t in set(tickers)]]
+    return em_cache
+
+
+def _cobertura_base(caminho: str, inicio, fim) -> pd.Series:
+    # Cotas válidas por ticker no período e número de pregões (Series.attrs)
+    armazem = carregar_armazem(caminho) if _backend == "mmap" else None
+    if armazem is not None:
+        validos, n = armazem.cobertura(inicio, fim)
+        tickers = armazem.tickers
+    else:
+        df = carregar_base(caminho, inicio=inicio, fim=fim)
+        validos, n, tickers = df.notna().sum().to_numpy(), len(df), df.columns
+    return pd.Series(validos, index=tickers), n
+
+
+def tickers_elegiveis(
+    fim,
+    inicio=None,
+    janela: int = None,
+    cobertura: float = COBERTURA_MINIMA,
+) -> list:
+    """
+    Tickers presentes nas duas bases com pelo menos `cobertura` de cotas
+    válidas no período, na mesma regra (e ordem) do `dropna(thresh=...)` de
+    `preparar_bases`.
+
+    O período vai de `inicio` até `fim` ou, com `janela`, cobre os últimos
+    `janela` pregões da base ajustada até `fim`. Usa a contagem acumulada de
+    dados válidos do armazém, então cada consulta custa O(tickers),
+    independentemente do tamanho da janela — próprio para walk-forward e para
+    sortear episódios do DRL.
+    """
+    if janela is not None:
+        datas = carregar_base(BASE_COTA_AJUSTADA, fim=fim).index
+        inicio = datas[max(len(datas) - janela, 0)] if len(datas) else fim
+
+    elegiveis = None
+    for caminho in (BASE_COTA_AJUSTADA, BASE_COTA_MERCADO):
+        validos, n = _cobertura_base(caminho, inicio, fim)
+        aprovados = validos.index[validos.to_numpy() >= int(cobertura * n)]
+        elegiveis = aprovados if elegiveis is None else elegiveis.intersection(aprovados)
+    return elegiveis.tolist()
+
+
+def carregar_universo(caminho: str = BASE_FIIS) -> pd.DataFrame:
+    """
+    Cadastro dos FIIs (CNPJ, nome e, se a planilha trouxer, liquidez e
+    segmento) indexado por ticker, lido uma vez por processo enquanto o
+    arquivo não mudar.
+    """
+    assinatura = _assinatura_arquivo(caminho)
+    with _lock_bases:
+        em_cache = _cache_universo.get(assinatura[0])
+        if em_cache is not None and em_cache[0] == assinatura:
+            return em_cache[1]
+
+    df = pd.read_excel(caminho)
+    df.columns = [str(c).strip().upper() for c in df.columns]
+    df["TICKER"] = df["TICKER"].astype(str).str.strip().str.upper()
+    df = df.drop_duplicates("TICKER").set_index("TICKER").sort_index()
+
+    with _lock_bases:
+        _cache_universo[assinatura[0]] = (assinatura, df)
+    return df
+
+
+def tickers_universo(
+    liquidez_minima: float = None, segmentos=None, caminho: str = BASE_FIIS
+) -> list:
+    """
+    Tickers do cadastro, opcionalmente filtrados por liquidez mínima e
+    segmento. Os filtros exigem as colunas LIQUIDEZ / SEGMENTO na planilha.
+    """
+    df = carregar_universo(caminho)
+    if liquidez_minima is not None:
+        if "LIQUIDEZ" not in df.columns:
+            raise ValueError(f"{caminho} não possui a coluna LIQUIDEZ.")
+        df = df[df["LIQUIDEZ"] >= liquidez_minima]
+    if segmentos is not None:
+        if "SEGMENTO" not in df.columns:
+            raise ValueError(f"{caminho} não possui a coluna SEGMENTO.")
+        df = df[df["SEGMENTO"].isin(list(segmentos))]
+    return df.index.tolist()
+
+
+def hash_base(caminho: str) -> str:
+    """
+    Hash SHA-256 do conteúdo do arquivo. É estável entre processos e
+    reinicializações, e calculado uma única vez por versão do arquivo em disco.
+    """
+    assinatura = _assinatura_arquivo(caminho)
+    with _lock_bases:
+        if assinatura in _cache_hashes:
+            return _cache_hashes[assinatura]
+
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b""):
+            sha.update(bloco)
+    with _lock_bases:
+        _cache_hashes[assinatura] = sha.hexdigest()
+    return _cache_hashes[assinatura]
+
+
+def _combinar_hashes(*partes) -> str:
+    return hashlib.sha256("|".join(partes).encode()).hexdigest()[:16]
+
+
+def versao_dados() -> str:
+    """
+    Versão conjunta das duas bases de cotas, derivada do conteúdo delas.
+    É a chave comum dos caches (limpeza, estimadores, políticas treinadas e
+    backtests): o mesmo conteúdo gera a mesma versão em qualquer sessão.
+    """
+    return _combinar_hashes(hash_base(BASE_COTA_AJUSTADA), hash_base(BASE_COTA_MERCADO))
+
+
+def hash_dataframe(df: pd.DataFrame) -> str:
+    """Hash do conteúdo (datas, tickers e valores) de um DataFrame de cotas."""
+    sha = hashlib.sha256()
+    sha.update(np.ascontiguousarray(df.index.to_numpy().astype("datetime64[ns]")).tobytes())
+    sha.update("\x1f".join(map(str, df.columns)).encode())
+    sha.update(np.ascontiguousarray(df.to_numpy(dtype=np.float64)).tobytes())
+    return sha.hexdigest()[:16]
+
+
+def reamostrar(df: pd.DataFrame, frequencia: str) -> pd.DataFrame:
+    """
+    Painel em outra frequência: a última cota de cada ticker em cada período
+    ("semanal", "mensal" ou uma regra do pandas, como "30min" para barras
+    intradiárias de bases com horário). Cada período é rotulado pelo último
+    pregão dentro dele, e períodos sem pregão são descartados.
+    """
+    regra = FREQUENCIAS.get(frequencia, frequencia)
+    if regra is None:
+        return df
+    reamostrado = df.resample(regra).last()
+    ultimo_pregao = df.index.to_series().resample(regra).last()
+    reamostrado.index = pd.DatetimeIndex(ultimo_pregao.to_numpy(), name=df.index.name)
+    return reamostrado[ultimo_pregao.notna().to_numpy()]
+
+
+def periodos_por_ano(frequencia: str, indice: pd.DatetimeIndex = None) -> float:
+    """
+    Períodos por ano usados na anualização (252 pregões, 52 semanas, 12
+    meses). Para barras intradiárias, estima 252 x barras por pregão do
+    `indice` do painel.
+    """
+    if frequencia in PERIODOS_POR_ANO:
+        return PERIODOS_POR_ANO[frequencia]
+    if indice is None or not len(indice):
+        raise ValueError(f"Informe o índice do painel para a frequência {frequencia}.")
+    return 252 * len(indice) / indice.normalize().nunique()
+
+
+def alinhar_painel(df: pd.DataFrame, limite_ffill: int = None) -> pd.DataFrame:
+    """
+    Preenche lacunas de cada ticker com a última cota conhecida, por até
+    `limite_ffill` pregões seguidos (None = sem limite), de forma vetorizada.
+    """
+    if limite_ffill == 0:
+        return df
+    return df.ffill(limit=limite_ffill)
+
+
+def _preparar_bases(
+    inicio: str, fim: str, cobertura: float, tickers, limite_ffill, frequencia
+) -> tuple:
+    df_ret = carregar_cota_ajustada(tickers, inicio, fim)
+    df_vol = carregar_cota_mercado(tickers, inicio, fim)
+
+    # --- 1. Filtro de Período ---
+    df_ret = df_ret.loc[inicio:fim]
+    df_vol = df_vol.loc[inicio:fim]
+    if frequencia != "diaria":
+        df_ret = reamostrar(df_ret, frequencia)
+        df_vol = reamostrar(df_vol, frequencia)
+        print(f"> Painel reamostrado ({frequencia}): {len(df_ret)} períodos")
+
+    # --- 2. Sincronização de colunas ---
+    common_tickers = df_ret.columns.intersection(df_vol.columns)
+    df_ret = df_ret[common_tickers]
+    df_vol = df_vol[common_tickers]
+    print(f"> Tickers em comum antes da limpeza: {len(common_tickers)}")
+
+    # --- 3. Limpeza de NaNs por coluna e por linha ---
+    df_ret = df_ret.dropna(axis=1, thresh=int(cobertura * len(df_ret)))
+    df_vol = df_vol.dropna(axis=1, thresh=int(cobertura * len(df_vol)))
+    common_tickers_after_na = df_ret.columns.intersection(df_vol.columns)
+    print(f"> Após dropna por coluna: {len(common_tickers_after_na)} ativos restantes")
+
+    df_ret = df_ret[common_tickers_after_na]
+    df_vol = df_vol[common_tickers_after_na]
+
+    if limite_ffill is None:
+        df_ret = df_ret.dropna()
+        df_vol = df_vol.dropna()
+    else:
+        # Alinha as datas e preenche lacunas curtas antes de descartar dias:
+        # só saem as datas com lacunas maiores que o limite (ou antes da
+        # primeira cota de algum ticker), e não todo dia com algum NaN
+        common_index = df_ret.index.intersection(df_vol.index)
+        df_ret = alinhar_painel(df_ret.loc[common_index], limite_ffill)
+        df_vol = alinhar_painel(df_vol.loc[common_index], limite_ffill)
+        completos = df_ret.notna().all(axis=1) & df_vol.notna().all(axis=1)
+        df_ret, df_vol = df_ret[completos], df_vol[completos]
+
+    # --- 4. Alinhamento das datas ---
+    common_index = df_ret.index.intersection(df_vol.index)
+    return _somente_leitura(df_ret.loc[common_index]), _somente_leitura(
+        df_vol.loc[common_index]
+    )
+
+
+def memoizado(chave: tuple, calcular, cache: str = "limpeza"):
+    """
+    Devolve o resultado em cache para a versão atual dos dados (`versao_dados`)
+    ou o calcula com `calcular()`.
+
+    A chave segue o formato (etapa, inicio, fim, ...demais parâmetros); o `fim`
+    permite que `ingerir_pregoes` preserve resultados cujo período termina
+    antes dos novos pregões. Use fim=None para resultados que dependem de toda
+    a base.
+
+    `cache` escolhe o LRU usado (ver `_CACHES_MEMO`): os menos usados
+    recentemente são descartados ao passar do tamanho máximo de cada um.
+    """
+    resultados, maximo = _CACHES_MEMO[cache], _MAX_CACHES_MEMO[cache]
+    versao = versao_dados()
+    with _lock_bases:
+        em_cache = resultados.get(chave)
+        if em_cache is not None and em_cache[0] == versao:
+            resultados.move_to_end(chave)
+            return em_cache[1]
+
+    resultado = calcular()
+    with _lock_bases:
+        resultados[chave] = (versao, resultado)
+        resultados.move_to_end(chave)
+        while len(resultados) > maximo:
+            resultados.popitem(last=False)
+    return resultado
+
+
+def _periodo(inicio, fim) -> tuple:
+    """Período pedido, com DATA_INICIO/DATA_FIM (atuais) no lugar de None."""
+    return (
+        DATA_INICIO if inicio is None else inicio,
+        DATA_FIM if fim is None else fim,
+    )
+
+
+def preparar_bases(
+    inicio: str = None,
+    fim: str = None,
+    cobertura: float = COBERTURA_MINIMA,
+    tickers=None,
+    limite_ffill: int = None,
+    frequencia: str = "diaria",
+) -> tuple:
+    """
+    Aplica a limpeza comum aos modelos e devolve o par alinhado (df_ret, df_vol).
+
+    Filtra o período, mantém os tickers presentes nas duas bases com pelo menos
+    `cobertura` de dados no período, remove as datas com NaN e alinha os
+    índices. O resultado é memoizado pela versão dos dados e pelos parâmetros,
+    então chamadas repetidas (ex.: Markowitz e DRL com os mesmos dados) não
+    refazem a limpeza. Os DataFrames retornados são somente leitura.
+
+    `tickers` restringe o universo antes da leitura (ver `carregar_base`).
+    Sem `inicio`/`fim`, vale o período padrão (DATA_INICIO a DATA_FIM).
+
+    Com `limite_ffill`, em vez de descartar toda data em que algum ticker não
+    tem cota, as lacunas de até `limite_ffill` pregões são preenchidas com a
+    última cota (ver `alinhar_painel`), e o histórico útil não encolhe à
+    medida que o universo cresce. None mantém o descarte das datas com NaN.
+
+    `frequencia` ("diaria", "semanal", "mensal" ou regra do pandas) reamostra
+    as bases após o filtro de período (ver `reamostrar`); a limpeza e o
+    preenchimento passam a valer por período.
+    """
+    inicio, fim = _periodo(inicio, fim)
+    if tickers is not None:
+        tickers = tuple(tickers)
+    return memoizado(
+        ("limpeza", inicio, fim, cobertura, tickers, limite_ffill, frequencia),
+        lambda: _preparar_bases(
+            inicio, fim, cobertura, tickers, limite_ffill, frequencia
+        ),
+    )
+
+
+def versao_painel(
+    inicio: str = None,
+    fim: str = None,
+    cobertura: float = COBERTURA_MINIMA,
+    tickers=None,
+    limite_ffill: int = None,
+    frequencia: str = "diaria",
+) -> str:
+    """
+    Hash do conteúdo do painel limpo por `preparar_bases`. Só muda quando os
+    dados efetivamente usados mudam (ex.: pregões novos fora do período não
+    alteram a versão), então pode identificar resultados persistidos.
+    """
+    inicio, fim = _periodo(inicio, fim)
+    if tickers is not None:
+        tickers = tuple(tickers)
+
+    def calcular():
+        df_ret, df_vol = preparar_bases(
+            inicio, fim, cobertura, tickers, limite_ffill, frequencia
+        )
+        return _combinar_hashes(hash_dataframe(df_ret), hash_dataframe(df_vol))
+
+    return memoizado(
+        ("versao_painel", inicio, fim, cobertura, tickers, limite_ffill, frequencia),
+        calcular,
+    )
+
+
+def _calcular_retornos(df: pd.DataFrame, log: bool) -> pd.DataFrame:
+    # Mesmo cálculo de pypfopt.expected_returns.returns_from_prices, sempre em
+    # float64 (as cotas podem vir em float32 do armazém)
+    retornos = df.astype(np.float64).pct_change(fill_method=None)
+    if log:
+        retornos = np.log1p(retornos)
+    return _somente_leitura(retornos.dropna(how="all"))
+
+
+def preparar_retornos(
+    inicio: str = None,
+    fim: str = None,
+    cobertura: float = COBERTURA_MINIMA,
+    tickers=None,
+    log: bool = False,
+    limite_ffill: int = None,
+    frequencia: str = "diaria",
+) -> tuple:
+    """
+    Retornos diários das bases limpas por `preparar_bases`, calculados uma vez
+    por versão dos dados e parâmetros e devolvidos como par (ret_ret, ret_vol).
+
+    Os retornos são entre datas consecutivas do painel limpo (como o pypfopt
+    calcula a partir dos preços), podendo ser passados com `returns_data=True`.
+    Em outra `frequencia`, são retornos por período; anualize com
+    `periodos_por_ano`.
+    """
+    inicio, fim = _periodo(inicio, fim)
+    if tickers is not None:
+        tickers = tuple(tickers)
+
+    def calcular():
+        df_ret, df_vol = preparar_bases(
+            inicio, fim, cobertura, tickers, limite_ffill, frequencia
+        )
+        return _calcular_retornos(df_ret, log), _calcular_retornos(df_vol, log)
+
+    return memoizado(
+        ("retornos", inicio, fim, cobertura, tickers, log, limite_ffill, frequencia),
+        calcular,
+    )
+
+
+def _ler_pregoes_anexados(caminho: str, armazem: ArmazemPrecos):
+    """
+    Lê do CSV apenas os bytes acrescentados depois da última ingestão.
+
+    Retorna None se o arquivo não foi apenas estendido (cabeçalho diferente,
+    corte no meio de uma linha, datas fora de ordem), caso em que a base
+    precisa ser reprocessada por inteiro.
+    """
+    with open(caminho, "rb") as arquivo:
+        cabecalho = arquivo.readline()
+        colunas = cabecalho.decode().strip().split(",")
+        if colunas[0] != "dt_pregao" or colunas[1:] != armazem.tickers.tolist():
+            return None
+        if armazem.tamanho <= len(cabecalho):
+            return None
+        arquivo.seek(armazem.tamanho - 1)
+        if arquivo.read(1) != b"\n":
+            return None
+        cauda = arquivo.read()
+
+    df_novos = pd.read_csv(
+        io.BytesIO(cabecalho + cauda), parse_dates=["dt_pregao"], index_col="dt_pregao"
+    )
+    if len(df_novos) and (
+        not df_novos.index.is_monotonic_increasing
+        or df_novos.index[0] <= armazem.datas[-1]
+    ):
+        return None
+    return df_novos
+
+
+def _ultimo_pregao_csv(caminho: str):
+    """Data da última linha do CSV (lendo só o fim do arquivo), ou None se vazio."""
+    with open(caminho, "rb") as arquivo:
+        fim = arquivo.seek(0, os.SEEK_END)
+        inicio, linhas = fim, []
+        # Recua em blocos até ter a última linha inteira (ou o arquivo todo)
+        while inicio > 0 and len(linhas) < 2:
+            inicio = max(inicio - 4096, 0)
+            arquivo.seek(inicio)
+            linhas = arquivo.read(fim - inicio).strip().splitlines()
+    if inicio == 0 and len(linhas) < 2:
+        # Só o cabeçalho
+        return None
+    return pd.Timestamp(linhas[-1].split(b",", 1)[0].decode())
+
+
+def _anexar_ao_csv(caminho: str, df_novos: pd.DataFrame):
+    with open(caminho, "rb") as arquivo:
+        colunas = arquivo.readline().decode().strip().split(",")
+        fim = arquivo.seek(0, os.SEEK_END)
+        arquivo.seek(max(fim - 2, 0))
+        final = arquivo.read()
+        termina_em_quebra = final.endswith(b"\n")
+        if termina_em_quebra:
+            # Mantém a quebra de linha do arquivo (as bases reais usam CRLF)
+            quebra = "\r\n" if final.endswith(b"\r\n") else "\n"
+        else:
+            arquivo.seek(0)
+            quebra = "\r\n" if arquivo.readline().endswith(b"\r\n") else "\n"
+
+    with open(caminho, "a", newline="") as arquivo:
+        if not termina_em_quebra:
+            arquivo.write(quebra)
+        df_novos.index.name = "dt_pregao"
+        df_novos.reindex(columns=colunas[1:]).to_csv(
+            arquivo, header=False, date_format="%Y-%m-%d", lineterminator=quebra
+        )
+
+
+def ingerir_pregoes(caminho: str, df_novos: pd.DataFrame = None) -> int:
+    """
+    Incorpora novos pregões de uma base sem reprocessar o histórico.
+
+    Se `df_novos` for informado (datas x tickers), as linhas são primeiro
+    acrescentadas ao CSV; caso contrário, assume que o CSV já foi estendido
+    externamente. Apenas os bytes novos do CSV são lidos, as cotas e os
+    derivados (retornos, contagem de dados válidos) são estendidos no armazém,
+    assim como no banco SQLite, se existir, e só os caches que dependem das
+    novas datas são descartados: limpezas cujo
+    período termina antes do primeiro pregão novo continuam válidas.
+
+    Quando o CSV não foi apenas estendido, faz o carregamento completo.
+    Retorna a quantidade de pregões incorporados.
+    """
+    diretorio = _diretorio_armazem(caminho)
+    try:
+        armazem = ArmazemPrecos(diretorio)
+    except (OSError, ValueError):
+        armazem = None
+
+    if df_novos is not None:
+        df_novos = df_novos.sort_index()
+        # Só pregões depois do último do CSV, exista ou não o armazém (que
+        # pode estar atrás de um CSV estendido externamente)
+        ultimo = _ultimo_pregao_csv(caminho)
+        if ultimo is not None:
+            df_novos = df_novos.loc[df_novos.index > ultimo]
+        if len(df_novos):
+            _anexar_ao_csv(caminho, df_novos.copy())
+
+    assinatura = _assinatura_arquivo(caminho)
+    df_anexado = None
+    if armazem is not None and armazem.versao == VERSAO_ARMAZEM:
+        if (armazem.mtime_ns, armazem.tamanho) == assinatura[1:]:
+            return 0
+        df_anexado = _ler_pregoes_anexados(caminho, armazem)
+
+    if df_anexado is None:
+        print(f"> {caminho} não foi apenas estendido: recarregando a base inteira.")
+        with _lock_bases:
+            _cache_bases.pop(assinatura[0], None)
+            _cache_armazens.pop(assinatura[0], None)
+            for resultados in _CACHES_MEMO.values():
+                resultados.clear()
+        antes = 0 if armazem is None else len(armazem.datas)
+        novo = carregar_armazem(caminho)
+        return 0 if novo is None else max(len(novo.datas) - antes, 0)
+
+    assinatura_antiga = (assinatura[0], armazem.mtime_ns, armazem.tamanho)
+    with _lock_bases:
+        hash_antigo = _cache_hashes.get(assinatura_antiga)
+    versao_antiga = None
+    if hash_antigo is not None:
+        hashes = {
+            c: hash_antigo if os.path.abspath(c) == assinatura[0] else hash_base(c)
+            for c in (BASE_COTA_AJUSTADA, BASE_COTA_MERCADO)
+        }
+        versao_antiga = _combinar_hashes(
+            hashes[BASE_COTA_AJUSTADA], hashes[BASE_COTA_MERCADO]
+        )
+
+    novo = armazem.anexar(df_anexado, assinatura[1], assinatura[2])
+
+    banco = os.path.join(os.path.dirname(assinatura[0]), BANCO_SQLITE)
+    if os.path.exists(banco):
+        # Banco em dia com a versão anterior: recebe só os pregões novos
+        base = os.path.basename(caminho)
+        sqlite = _armazem_sqlite(caminho)
+        with _lock_bases:
+            if sqlite.assinatura(base) == assinatura_antiga[1:]:
+                sqlite.anexar_base(base, df_anexado, assinatura[1], assinatura[2])
+
+    primeira_data = df_anexado.index[0] if len(df_anexado) else None
+    versao_nova = versao_dados()
+
+    with _lock_bases:
+        _cache_armazens[assinatura[0]] = (assinatura, novo)
+        _cache_bases[assinatura[0]] = (assinatura, novo.para_dataframe())
+
+        for resultados in _CACHES_MEMO.values():
+            for chave, (versao, resultado) in list(resultados.items()):
+                fim = chave[2]
+                if versao_antiga is None or versao != versao_antiga:
+                    continue
+                if (
+                    primeira_data is not None
+                    and fim is not None
+                    and pd.Timestamp(fim) < primeira_data
+                ):
+                    # Período não alcança os novos pregões: continua válido
+                    resultados[chave] = (versao_nova, resultado)
+                else:
+                    del resultados[chave]
+
+    print(f"> {caminho}: {len(df_anexado)} pregões incorporados ao armazém.")
+    return len(df_anexado)
+
+
+def limpar_cache():
+    """Descarta todas as bases, armazéns e resultados mantidos em memória."""
+    with _lock_bases:
+        _cache_bases.clear()
+        _cache_armazens.clear()
+        _cache_universo.clear()
+        _cache_sqlite.clear()
+        _cache_hashes.clear()
+        for resultados in _CACHES_MEMO.values():
+            resultados.clear()
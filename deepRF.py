@@ -1,9 +1,19 @@
-import pandas as pd
+import hashlib
+import os
+
 import numpy as np
 import gymnasium as gym
 from gymnasium import spaces
 from stable_baselines3 import PPO
-from pypfopt import risk_models, expected_returns
+
+import dados
+import estimadores
+
+# Diretório das políticas PPO treinadas, reaproveitadas entre sessões
+MODELOS_DIR = "modelos_drl"
+# Versão do formato das políticas salvas (observação, recompensa, ações):
+# incrementar ao mudar o ambiente invalida as políticas antigas
+VERSAO_MODELO = 1
 
 
 # --- O Ambiente de Simulação (Gymnasium) ---
@@ -19,15 +29,31 @@ class PortfolioEnv(gym.Env):
         target_return=None,
         risk_free_rate=0.10,
         window_size=30,
+        returns=None,
+        periods_per_year=252,
     ):
         super(PortfolioEnv, self).__init__()
 
         self.df = df_prices
+        # Matriz de preços usada no loop: aceita DataFrame ou ndarray (inclusive
+        # fatias memory-mapped de dados.ArmazemPrecos, sem cópia). Preços em
+        # float32 são mantidos assim, para não dobrar a memória de cada env
+        self.prices = np.asarray(df_prices)
+        if self.prices.dtype not in (np.float32, np.float64):
+            self.prices = self.prices.astype(np.float64)
+        # Retornos diários alinhados aos preços (linha t = preço t / preço t-1 - 1);
+        # se não forem informados, são calculados uma única vez aqui
+        if returns is None:
+            returns = np.full_like(self.prices, np.nan)
+            returns[1:] = self.prices[1:] / self.prices[:-1] - 1
+        self.returns = np.asarray(returns, dtype=self.prices.dtype)
         self.window_size = window_size
         self.num_assets = df_prices.shape[1]
         self.max_weight = max_weight
         self.target_return = target_return
         self.risk_free_rate = risk_free_rate
+        # Passos por ano: 252 com pregões diários, 52 com painel semanal etc.
+        self.periods_per_year = periods_per_year
 
         # Espaço de Ações: um vetor contínuo com os pesos de cada ativo
         self.action_space = spaces.Box(
@@ -55,14 +81,11 @@ class PortfolioEnv(gym.Env):
         self.weights = np.exp(action) / np.sum(np.exp(action))
 
         self.current_step += 1
-        terminated = self.current_step >= len(self.df)
+        terminated = self.current_step >= len(self.prices)
 
         # Pequena correção no cálculo do retorno para evitar erro de índice
         if not terminated:
-            price_change = (
-                self.df.iloc[self.current_step] / self.df.iloc[self.current_step - 1]
-            )
-            portfolio_return = np.dot(price_change - 1, self.weights)
+            portfolio_return = np.dot(self.returns[self.current_step], self.weights)
             self.portfolio_returns.append(portfolio_return)
             reward = self._calculate_reward(portfolio_return)
         else:
@@ -77,7 +100,7 @@ class PortfolioEnv(gym.Env):
         start = end - self.window_size
 
         # Pega o histórico de preços
-        price_history = self.df.iloc[start:end].values
+        price_history = self.prices[start:end]
 
         # Normaliza os preços pelo último dia para focar na variação percentual
         normalized_prices = price_history / price_history[-1]
@@ -96,7 +119,7 @@ class PortfolioEnv(gym.Env):
             weight_penalty = -10 * excesso
 
         if self.target_return is not None:
-            daily_target = (1 + self.target_return) ** (1 / 252) - 1
+            daily_target = (1 + self.target_return) ** (1 / self.periods_per_year) - 1
             reward = -((portfolio_return - daily_target) ** 2) * 1e3
         else:
             if len(self.portfolio_returns) < 2:
@@ -105,13 +128,33 @@ class PortfolioEnv(gym.Env):
             std_return = np.std(self.portfolio_returns)
             if std_return == 0:
                 return 0
-            daily_risk_free = (1 + self.risk_free_rate) ** (1 / 252) - 1
+            daily_risk_free = (1 + self.risk_free_rate) ** (1 / self.periods_per_year) - 1
             sharpe = (mean_return - daily_risk_free) / std_return
             reward = sharpe
 
         return reward + weight_penalty
 
 
+def _caminho_modelo(
+    versao_painel, tickers, max_weight, target_return, risk_free_rate, timesteps, window_size
+):
+    """Arquivo da política treinada para estes dados, parâmetros e ambiente."""
+    chave = repr(
+        (
+            VERSAO_MODELO,
+            versao_painel,
+            tuple(tickers),
+            max_weight,
+            target_return,
+            risk_free_rate,
+            timesteps,
+            window_size,
+        )
+    )
+    nome = hashlib.sha256(chave.encode()).hexdigest()[:20]
+    return os.path.join(MODELOS_DIR, f"ppo_{nome}.zip")
+
+
 # --- Função Principal de Otimização ---
 def otimizacao_deepRF(
     num_assets: int,
@@ -119,35 +162,31 @@ def otimizacao_deepRF(
     risk_free_rate: float,
     target_return,
     training_timesteps: int = 1000,
+    universe: list = None,
+    gap_fill_limit: int = None,
+    frequency: str = "diaria",
 ) -> dict:
     try:
-        df_ret = pd.read_csv(
-            "Base Cota Ajustada.csv", parse_dates=["dt_pregao"], index_col="dt_pregao"
-        )
-        df_vol = pd.read_csv(
-            "Base Cota Mercado.csv", parse_dates=["dt_pregao"], index_col="dt_pregao"
+        df_ret, df_vol = dados.preparar_bases(
+            tickers=universe, limite_ffill=gap_fill_limit, frequencia=frequency
         )
-
-        start_date, end_date = "2020-01-01", "2024-12-31"
-        df_ret, df_vol = (
-            df_ret.loc[start_date:end_date],
-            df_vol.loc[start_date:end_date],
+        ret_ret, _ = dados.preparar_retornos(
+            tickers=universe, limite_ffill=gap_fill_limit, frequencia=frequency
         )
-        common_tickers = df_ret.columns.intersection(df_vol.columns)
-        df_ret, df_vol = df_ret[common_tickers], df_vol[common_tickers]
-        df_ret.dropna(axis=1, thresh=int(0.90 * len(df_ret)), inplace=True)
-        df_vol.dropna(axis=1, thresh=int(0.90 * len(df_vol)), inplace=True)
-        common_tickers_after_na = df_ret.columns.intersection(df_vol.columns)
-        df_ret = df_ret[common_tickers_after_na].dropna()
-        df_vol = df_vol[common_tickers_after_na].dropna()
-        common_index = df_ret.index.intersection(df_vol.index)
-        df_ret, df_vol = df_ret.loc[common_index], df_vol.loc[common_index]
+        # Com painel semanal/mensal cada passo do episódio é um período
+        periods_per_year = dados.periodos_por_ano(frequency, df_ret.index)
 
         if num_assets >= len(df_ret.columns):
             selected_tickers = df_ret.columns.tolist()
         else:
-            mu = expected_returns.mean_historical_return(df_ret)
-            S = risk_models.CovarianceShrinkage(df_vol).ledoit_wolf()
+            # Mesmas estimativas (em cache) usadas pelo Markowitz
+            filters = {
+                "tickers": universe,
+                "limite_ffill": gap_fill_limit,
+                "frequencia": frequency,
+            }
+            mu = estimadores.estimativa("media_historica", **filters)
+            S = estimadores.estimativa("ledoit_wolf", **filters)
             sharpe_individual = (mu - risk_free_rate) / np.sqrt(np.diag(S))
             selected_tickers = sharpe_individual.nlargest(num_assets).index.tolist()
 
@@ -159,10 +198,30 @@ def otimizacao_deepRF(
             max_weight=max_weight_per_asset,
             target_return=target_return,
             risk_free_rate=risk_free_rate,
+            returns=ret_ret[selected_tickers].reindex(df_final_for_env.index),
+            periods_per_year=periods_per_year,
         )
 
-        model = PPO("MlpPolicy", env, verbose=0)
-        model.learn(total_timesteps=training_timesteps)
+        # Política já treinada com o mesmo painel (hash do conteúdo) e parâmetros
+        caminho_modelo = _caminho_modelo(
+            dados.versao_painel(
+                tickers=universe, limite_ffill=gap_fill_limit, frequencia=frequency
+            ),
+            selected_tickers,
+            max_weight_per_asset,
+            target_return,
+            risk_free_rate,
+            training_timesteps,
+            env.window_size,
+        )
+        if os.path.exists(caminho_modelo):
+            print(f"Reutilizando política treinada: {caminho_modelo}")
+            model = PPO.load(caminho_modelo, env=env)
+        else:
+            model = PPO("MlpPolicy", env, verbose=0)
+            model.learn(total_timesteps=training_timesteps)
+            os.makedirs(MODELOS_DIR, exist_ok=True)
+            model.save(caminho_modelo)
 
         obs, _ = env.reset()
         action, _ = model.predict(obs, deterministic=True)
@@ -0,0 +1,366 @@
+import numpy as np
+import pandas as pd
+from pypfopt import expected_returns, risk_models
+from pypfopt.risk_models import fix_nonpositive_semidefinite
+
+import dados
+
+# Estimadores disponíveis em `estimativa`: nome -> (base usada, função).
+# A média usa os retornos da cota ajustada e as covariâncias os da cota de
+# mercado, como nos modelos; `periodos` é o fator de anualização do painel
+ESTIMADORES = {
+    "media_historica": (
+        "ajustada",
+        lambda ret, periodos, **p: expected_returns.mean_historical_return(
+            ret, returns_data=True, frequency=periodos, **p
+        ),
+    ),
+    "media_ema": (
+        "ajustada",
+        lambda ret, periodos, **p: expected_returns.ema_historical_return(
+            ret, returns_data=True, frequency=periodos, **p
+        ),
+    ),
+    "covariancia_amostral": (
+        "mercado",
+        lambda ret, periodos, **p: risk_models.sample_cov(
+            ret, returns_data=True, frequency=periodos, **p
+        ),
+    ),
+    "covariancia_exponencial": (
+        "mercado",
+        lambda ret, periodos, **p: risk_models.exp_cov(
+            ret, returns_data=True, frequency=periodos, **p
+        ),
+    ),
+    "ledoit_wolf": (
+        "mercado",
+        lambda ret, periodos, **p: _ledoit_wolf_painel(ret, periodos, **p),
+    ),
+}
+
+
+def ledoit_wolf(retornos, frequency: int = 252, dtype=np.float64) -> tuple:
+    """
+    Covariância anualizada de Ledoit-Wolf (alvo de variância constante)
+    calculada direto sobre a matriz de retornos (dias x ativos), e a
+    intensidade de encolhimento. Mesmo resultado de
+    `risk_models.CovarianceShrinkage(...).ledoit_wolf()` (fórmulas do
+    scikit-learn, NaN -> 0, linhas só com NaN descartadas), sem as conversões
+    para DataFrame nem a covariância par a par que o pypfopt calcula e não usa.
+
+    Com dtype=np.float32 os produtos de matrizes rodam em precisão simples
+    (metade da memória e do tráfego); as somas escalares continuam em float64.
+    A matriz encolhida é semidefinida positiva por construção (combinação
+    convexa da covariância empírica e de um múltiplo da identidade), então
+    dispensa a correção espectral do pypfopt.
+    """
+    X = np.asarray(retornos, dtype=dtype)
+    validos = ~np.isnan(X)
+    X = np.where(validos, X, 0)[validos.any(axis=1)]
+    n, p = X.shape
+    X -= X.mean(axis=0)
+
+    cov = X.T @ X
+    cov /= n
+    # sum((X²)' X²) = soma_t ||x_t||^4, sem formar a matriz p x p
+    norma2 = np.einsum("ij,ij->i", X, X, dtype=np.float64)
+    beta_ = (norma2**2).sum()
+    delta_ = np.einsum("ij,ij->", cov, cov, dtype=np.float64)
+    traco = norma2.sum() / n
+    mu = traco / p
+    variancias = np.einsum("ij,ij->j", X, X, dtype=np.float64) / n
+
+    beta = (beta_ / n - delta_) / (p * n)
+    delta = (delta_ - 2 * mu * variancias.sum() + p * mu**2) / p
+    beta = min(beta, delta)
+    encolhimento = 0.0 if beta == 0 else beta / delta
+
+    encolhida = cov
+    encolhida *= (1 - encolhimento) * frequency
+    encolhida.flat[:: p + 1] += encolhimento * mu * frequency
+    return encolhida, encolhimento
+
+
+def _ledoit_wolf_painel(
+    ret: pd.DataFrame,
+    periodos,
+    shrinkage_target: str = "constant_variance",
+    dtype: str = "float64",
+) -> pd.DataFrame:
+    # Alvo padrão pelo kernel NumPy; os demais alvos ficam com o pypfopt
+    if shrinkage_target != "constant_variance":
+        return risk_models.CovarianceShrinkage(
+            ret, returns_data=True, frequency=periodos
+        ).ledoit_wolf(shrinkage_target)
+    cov, _ = ledoit_wolf(ret.to_numpy(), periodos, np.dtype(dtype))
+    return pd.DataFrame(cov, index=ret.columns, columns=ret.columns)
+
+
+class MomentosRetornos:
+    """
+    Acumula, bloco a bloco, os momentos dos retornos diários necessários para
+    as estimativas usadas nos modelos, sem manter o histórico em memória:
+
+    - retorno médio anualizado composto (`expected_returns.mean_historical_return`);
+    - covariância amostral com pares completos (`risk_models.sample_cov`);
+    - covariância com encolhimento de Ledoit-Wolf
+      (`risk_models.CovarianceShrinkage(...).ledoit_wolf()`).
+
+    Os resultados coincidem com os do pypfopt aplicados ao histórico inteiro
+    (retornos entre linhas consecutivas, descartando as linhas só com NaN).
+    Todos os acumuladores são somas, então o custo por linha é O(N²) e a
+    memória O(N²), independentemente da quantidade de dias. Pelo mesmo
+    motivo, linhas podem ser retiradas (`remover_retornos`), o que desliza
+    uma janela em O(N²) por dia (ver `janela_movel`).
+    """
+
+    def __init__(self, tickers):
+        self.tickers = pd.Index(list(tickers))
+        n = len(self.tickers)
+        self._ultimo_preco = None
+        self._deslocamento = None
+        self.n_linhas = 0
+        # Média composta: soma de log(1 + r) e contagem por ticker
+        self.soma_log = np.zeros(n)
+        self.contagem = np.zeros(n)
+        # Covariância com pares completos (NaN ignorados par a par)
+        self.pares = np.zeros((n, n))
+        self.soma_par = np.zeros((n, n))
+        self.produto_par = np.zeros((n, n))
+        # Ledoit-Wolf sobre os retornos com NaN -> 0, deslocados por uma
+        # referência fixa para reduzir o cancelamento numérico nas somas
+        self.soma = np.zeros(n)
+        self.gram = np.zeros((n, n))
+        self.soma_norma2 = 0.0
+        self.soma_norma4 = 0.0
+        self.soma_norma2_x = np.zeros(n)
+
+    def adicionar_precos(self, precos):
+        """Adiciona um bloco de preços consecutivos (continuação do anterior)."""
+        precos = np.asarray(precos, dtype=np.float64)
+        if self._ultimo_preco is not None:
+            precos = np.vstack([self._ultimo_preco, precos])
+        if len(precos):
+            self._ultimo_preco = precos[-1:].copy()
+        if len(precos) > 1:
+            self.adicionar_retornos(precos[1:] / precos[:-1] - 1)
+
+    def adicionar_retornos(self, retornos):
+        """Adiciona um bloco de retornos diários (linhas = dias)."""
+        self._acumular(retornos, 1.0)
+
+    def remover_retornos(self, retornos):
+        """
+        Retira um bloco de retornos adicionado antes (os mesmos valores),
+        como a saída do dia mais antigo de uma janela móvel.
+        """
+        self._acumular(retornos, -1.0)
+
+    def _acumular(self, retornos, sinal: float):
+        """Soma (sinal=1) ou subtrai (sinal=-1) a contribuição das linhas."""
+        retornos = np.asarray(retornos, dtype=np.float64)
+        validos = ~np.isnan(retornos)
+        # Como o pypfopt, linhas só com NaN não entram nas estimativas
+        manter = validos.any(axis=1)
+        retornos, validos = retornos[manter], validos[manter]
+        if not len(retornos):
+            return
+
+        zerados = np.where(validos, retornos, 0.0)
+        mascara = validos.astype(np.float64)
+        self.n_linhas += int(sinal) * len(retornos)
+
+        self.soma_log += sinal * np.where(validos, np.log1p(zerados), 0.0).sum(axis=0)
+        self.contagem += sinal * mascara.sum(axis=0)
+
+        self.pares += sinal * (mascara.T @ mascara)
+        self.soma_par += sinal * (zerados.T @ mascara)
+        self.produto_par += sinal * (zerados.T @ zerados)
+
+        # A referência é fixada no primeiro bloco e nunca muda, para que as
+        # linhas retiradas tenham a mesma contribuição de quando entraram
+        if self._deslocamento is None:
+            self._deslocamento = zerados.mean(axis=0)
+        x = zerados - self._deslocamento
+        norma2 = np.einsum("ij,ij->i", x, x)
+        self.soma += sinal * x.sum(axis=0)
+        self.gram += sinal * (x.T @ x)
+        self.soma_norma2 += sinal * norma2.sum()
+        self.soma_norma4 += sinal * (norma2**2).sum()
+        self.soma_norma2_x += sinal * (norma2 @ x)
+
+    def media_historica(self, frequency: int = 252) -> pd.Series:
+        """Retorno anualizado composto por ticker (mean_historical_return)."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mu = np.expm1(self.soma_log * frequency / self.contagem)
+        return pd.Series(mu, index=self.tickers)
+
+    def covariancia_amostral(self, frequency: int = 252) -> pd.DataFrame:
+        """Covariância anualizada com pares completos (sample_cov)."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = (self.produto_par - self.soma_par * self.soma_par.T / self.pares) / (
+                self.pares - 1
+            )
+        cov = pd.DataFrame(cov, index=self.tickers, columns=self.tickers) * frequency
+        return fix_nonpositive_semidefinite(cov, fix_method="spectral")
+
+    def encolhimento_ledoit_wolf(self) -> tuple:
+        """
+        Covariância empírica (diária, não anualizada) e intensidade de
+        encolhimento de Ledoit-Wolf, nas mesmas fórmulas do scikit-learn.
+        """
+        n, p = self.n_linhas, len(self.tickers)
+        media = self.soma / n
+        cov = self.gram / n - np.outer(media, media)
+
+        # soma_t ||x_t - m||^4, com ||x_t - m||^2 = a_t - 2 b_t + k, onde
+        # a_t = ||x_t||^2, b_t = x_t . m e k = ||m||^2, expandida nas somas
+        # acumuladas (soma b_t^2 = m' G m, com G = soma x_t x_t')
+        k = media @ media
+        beta_ = (
+            self.soma_norma4
+            - 4 * (self.soma_norma2_x @ media)
+            + 2 * k * self.soma_norma2
+            + 4 * (media @ self.gram @ media)
+            - 4 * k * (self.soma @ media)
+            + n * k**2
+        )
+        traco = np.trace(cov)
+        mu = traco / p
+        delta_ = (cov**2).sum()
+        beta = (beta_ / n - delta_) / (p * n)
+        delta = (delta_ - 2 * mu * traco + p * mu**2) / p
+        beta = min(beta, delta)
+        encolhimento = 0.0 if beta == 0 else beta / delta
+        return cov, encolhimento
+
+    def ledoit_wolf(self, frequency: int = 252, corrigir: bool = True) -> pd.DataFrame:
+        """
+        Covariância anualizada de Ledoit-Wolf (CovarianceShrinkage.ledoit_wolf).
+        A matriz encolhida já é semidefinida positiva; corrigir=False dispensa
+        a correção espectral do pypfopt (O(N³)), que pesa na janela móvel.
+        """
+        cov, encolhimento = self.encolhimento_ledoit_wolf()
+        mu = np.trace(cov) / len(self.tickers)
+        encolhida = (1 - encolhimento) * cov
+        encolhida.flat[:: len(self.tickers) + 1] += encolhimento * mu
+        encolhida = (
+            pd.DataFrame(encolhida, index=self.tickers, columns=self.tickers) * frequency
+        )
+        if not corrigir:
+            return encolhida
+        return fix_nonpositive_semidefinite(encolhida, fix_method="spectral")
+
+
+def estimar_em_blocos(
+    caminho: str,
+    tickers=None,
+    inicio=None,
+    fim=None,
+    tamanho_bloco: int = 250,
+) -> MomentosRetornos:
+    """
+    Percorre a base uma única vez em blocos de datas (`dados.iterar_blocos`) e
+    devolve os momentos acumulados, de onde saem média, covariância amostral
+    e Ledoit-Wolf sem carregar o histórico inteiro.
+    """
+    momentos = None
+    for bloco in dados.iterar_blocos(caminho, tamanho_bloco, tickers, inicio, fim):
+        if momentos is None:
+            momentos = MomentosRetornos(bloco.columns)
+        momentos.adicionar_precos(bloco.to_numpy())
+    if momentos is None:
+        raise ValueError(f"Nenhum pregão de {caminho} no período pedido.")
+    return momentos
+
+
+def janela_movel(retornos: pd.DataFrame, janela: int, passo: int = 1, recalcular: int = 1000):
+    """
+    Percorre `retornos` (dias x tickers) com uma janela de `janela` dias que
+    avança `passo` dias por vez, rendendo (data final, momentos) a cada
+    posição. Os momentos (`MomentosRetornos`) são atualizados no lugar: a
+    cada passo entram os dias novos e saem os mais antigos, em O(N²) por dia
+    em vez de O(janela·N²) para reestimar a janela do zero.
+
+    Para não acumular erro de arredondamento das somas e subtrações, os
+    momentos são refeitos do zero a cada `recalcular` posições.
+    """
+    valores = retornos.to_numpy(dtype=np.float64)
+    datas = retornos.index
+    if janela > len(valores):
+        raise ValueError(f"Janela de {janela} dias maior que o histórico ({len(valores)}).")
+
+    momentos = MomentosRetornos(retornos.columns)
+    momentos.adicionar_retornos(valores[:janela])
+    yield datas[janela - 1], momentos
+
+    for posicao, fim in enumerate(range(janela + passo, len(valores) + 1, passo), start=1):
+        if posicao % recalcular == 0 or passo >= janela:
+            momentos = MomentosRetornos(retornos.columns)
+            momentos.adicionar_retornos(valores[fim - janela : fim])
+        else:
+            momentos.adicionar_retornos(valores[fim - passo : fim])
+            momentos.remover_retornos(valores[fim - passo - janela : fim - janela])
+        yield datas[fim - 1], momentos
+
+
+def _congelar(resultado):
+    """Series/DataFrame sobre valores não graváveis (o cache é compartilhado)."""
+    valores = resultado.to_numpy(copy=True)
+    valores.flags.writeable = False
+    if isinstance(resultado, pd.Series):
+        return pd.Series(valores, index=resultado.index, name=resultado.name, copy=False)
+    return pd.DataFrame(
+        valores, index=resultado.index, columns=resultado.columns, copy=False
+    )
+
+
+def estimativa(
+    estimador: str,
+    inicio: str = None,
+    fim: str = None,
+    cobertura: float = dados.COBERTURA_MINIMA,
+    tickers=None,
+    limite_ffill: int = None,
+    frequencia: str = "diaria",
+    **parametros,
+):
+    """
+    Retorno esperado ou covariância (ver ESTIMADORES) dos retornos limpos por
+    `dados.preparar_retornos`, anualizados conforme a `frequencia`.
+
+    Fica em um LRU próprio de `dados.memoizado`, com chave (estimador,
+    parâmetros, período e filtros do painel) dentro da versão dos dados, e é
+    compartilhado por Markowitz, DRL e varreduras: mudar só o peso máximo ou o
+    retorno alvo não refaz a estimativa. O resultado é somente leitura.
+    """
+    if estimador not in ESTIMADORES:
+        raise ValueError(
+            f"Estimador desconhecido: {estimador}. Opções: {tuple(ESTIMADORES)}"
+        )
+    inicio, fim = dados._periodo(inicio, fim)
+    if tickers is not None:
+        tickers = tuple(tickers)
+    base, funcao = ESTIMADORES[estimador]
+
+    def calcular():
+        ret_ret, ret_vol = dados.preparar_retornos(
+            inicio, fim, cobertura, tickers, False, limite_ffill, frequencia
+        )
+        retornos = ret_ret if base == "ajustada" else ret_vol
+        periodos = dados.periodos_por_ano(frequencia, retornos.index)
+        return _congelar(funcao(retornos, periodos, **parametros))
+
+    chave = (
+        "estimativa",
+        inicio,
+        fim,
+        estimador,
+        tuple(sorted(parametros.items())),
+        cobertura,
+        tickers,
+        limite_ffill,
+        frequencia,
+    )
+    return dados.memoizado(chave, calcular, cache="estimativas")
@@ -0,0 +1,178 @@
+"""
+Gera bases sintéticas de cotas de FIIs no mesmo layout dos CSVs reais.
+
+Uso:
+    python gerador_sintetico.py destino [--ativos N] [--dias N]
+        [--inicio AAAA-MM-DD | --fim AAAA-MM-DD]
+        [--correlacao R] [--segmentos N] [--correlacao-segmento R]
+        [--taxa-nan P] [--semente N]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Mesmos nomes das bases reais, para o diretório gerado poder substituí-las
+ARQUIVOS = ("Base Cota Ajustada.csv", "Base Cota Mercado.csv")
+
+# Rendimento mensal típico de um FII (fração da cota), distribuído a cada
+# ~21 pregões; é o que separa a cota de mercado da cota ajustada
+RENDIMENTO_MENSAL = 0.008
+PREGOES_POR_MES = 21
+
+
+def nomes_tickers(n_ativos: int) -> list:
+    """Tickers no padrão dos FIIs (quatro letras + "11"): AAAA11, AAAB11, ..."""
+    letras = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    nomes = []
+    for i in range(n_ativos):
+        codigo = ""
+        for _ in range(4):
+            i, resto = divmod(i, 26)
+            codigo = letras[resto] + codigo
+        nomes.append(codigo + "11")
+    return nomes
+
+
+def matriz_correlacao(
+    n_ativos: int,
+    correlacao: float = 0.3,
+    n_segmentos: int = 1,
+    correlacao_segmento: float = None,
+) -> np.ndarray:
+    """
+    Correlação em blocos: `correlacao` entre quaisquer dois ativos e
+    `correlacao_segmento` entre ativos do mesmo segmento (os ativos são
+    distribuídos entre os segmentos em sequência).
+    """
+    if correlacao_segmento is None:
+        correlacao_segmento = correlacao
+    segmento = np.arange(n_ativos) * n_segmentos // n_ativos
+    corr = np.where(segmento[:, None] == segmento[None, :], correlacao_segmento, correlacao)
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+
+def _fatores_correlacao(corr: np.ndarray) -> np.ndarray:
+    """Matriz L com L @ L.T = corr (Cholesky, ou autovalores se não for PD)."""
+    try:
+        return np.linalg.cholesky(corr)
+    except np.linalg.LinAlgError:
+        autovalores, autovetores = np.linalg.eigh(corr)
+        return autovetores * np.sqrt(np.clip(autovalores, 0, None))
+
+
+def gerar_bases(
+    destino: str,
+    n_ativos: int = 1000,
+    n_dias: int = 20 * 252,
+    inicio: str = None,
+    fim: str = "2024-12-31",
+    correlacao=0.3,
+    n_segmentos: int = 1,
+    correlacao_segmento: float = None,
+    taxa_nan: float = 0.02,
+    semente: int = 0,
+    tamanho_bloco: int = 250,
+) -> tuple:
+    """
+    Escreve em `destino` as bases "Base Cota Ajustada.csv" e "Base Cota
+    Mercado.csv" (dt_pregao,<TICKER>...) com `n_ativos` tickers e `n_dias`
+    pregões (dias úteis a partir de `inicio` ou, sem ele, terminando em `fim`,
+    para cobrir o período do backtest), e devolve os dois caminhos.
+
+    - Retornos diários log-normais com drift e volatilidade sorteados por
+      ativo e correlação dada por `correlacao` (número ou matriz N x N; com
+      número, ver `matriz_correlacao`).
+    - A cota de mercado é a cota ajustada desfeita dos rendimentos mensais.
+    - `taxa_nan` é a fração de cotas ausentes (pregões sem negociação),
+      nas mesmas posições nas duas bases.
+
+    Os dias são gerados e gravados em blocos de `tamanho_bloco`, então a
+    memória não cresce com o número de dias.
+    """
+    rng = np.random.default_rng(semente)
+    tickers = nomes_tickers(n_ativos)
+    if inicio is not None:
+        datas = pd.bdate_range(start=inicio, periods=n_dias, name="dt_pregao")
+    else:
+        datas = pd.bdate_range(end=fim, periods=n_dias, name="dt_pregao")
+
+    # --- 1. Parâmetros por ativo ---
+    if np.ndim(correlacao) == 0:
+        corr = matriz_correlacao(n_ativos, correlacao, n_segmentos, correlacao_segmento)
+    else:
+        corr = np.asarray(correlacao, dtype=np.float64)
+        if corr.shape != (n_ativos, n_ativos):
+            raise ValueError(
+                f"Matriz de correlação {corr.shape} incompatível com {n_ativos} ativos."
+            )
+    fatores = _fatores_correlacao(corr)
+    vol_diaria = rng.uniform(0.10, 0.30, n_ativos) / np.sqrt(252)
+    drift_diario = rng.uniform(0.00, 0.15, n_ativos) / 252 - vol_diaria**2 / 2
+    preco = rng.uniform(5.0, 150.0, n_ativos)
+
+    # Cota de mercado = ajustada x fator, com o fator caindo a cada rendimento
+    # pago (rendimento mensal sorteado por ativo); no último pregão as duas
+    # cotas coincidem, a menos do arredondamento em centavos
+    rendimento = RENDIMENTO_MENSAL * rng.uniform(0.8, 1.2, n_ativos)
+    pagamentos = (n_dias - 1) // PREGOES_POR_MES
+    fator = (1 + rendimento) ** pagamentos
+
+    # --- 2. Geração e gravação em blocos de datas ---
+    os.makedirs(destino, exist_ok=True)
+    caminhos = tuple(os.path.join(destino, nome) for nome in ARQUIVOS)
+    for caminho in caminhos:
+        with open(caminho, "w") as f:
+            f.write(",".join(["dt_pregao", *tickers]) + "\n")
+
+    for ini in range(0, n_dias, tamanho_bloco):
+        bloco = datas[ini : ini + tamanho_bloco]
+        choques = rng.standard_normal((len(bloco), n_ativos)) @ fatores.T
+        log_ret = drift_diario + vol_diaria * choques
+        if ini == 0:
+            log_ret[0] = 0.0
+        ajustada = preco * np.exp(np.cumsum(log_ret, axis=0))
+        preco = ajustada[-1]
+
+        dia = np.arange(ini, ini + len(bloco))
+        fator_dia = fator / (1 + rendimento) ** (dia // PREGOES_POR_MES)[:, None]
+        mercado = np.round(ajustada * fator_dia, 2)
+
+        ausentes = rng.random(ajustada.shape) < taxa_nan
+        for caminho, valores in zip(caminhos, (ajustada, mercado)):
+            valores = np.where(ausentes, np.nan, valores)
+            pd.DataFrame(valores, index=bloco, columns=tickers).to_csv(
+                caminho, mode="a", header=False, date_format="%Y-%m-%d", float_format="%.11g"
+            )
+    print(f"> Bases sintéticas: {n_dias} pregões x {n_ativos} ativos em {destino}")
+    return caminhos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("destino")
+    parser.add_argument("--ativos", type=int, default=1000)
+    parser.add_argument("--dias", type=int, default=20 * 252)
+    parser.add_argument("--inicio", default=None)
+    parser.add_argument("--fim", default="2024-12-31")
+    parser.add_argument("--correlacao", type=float, default=0.3)
+    parser.add_argument("--segmentos", type=int, default=1)
+    parser.add_argument("--correlacao-segmento", type=float, default=None)
+    parser.add_argument("--taxa-nan", type=float, default=0.02)
+    parser.add_argument("--semente", type=int, default=0)
+
+    args = parser.parse_args()
+    gerar_bases(
+        args.destino,
+        n_ativos=args.ativos,
+        n_dias=args.dias,
+        inicio=args.inicio,
+        fim=args.fim,
+        correlacao=args.correlacao,
+        n_segmentos=args.segmentos,
+        correlacao_segmento=args.correlacao_segmento,
+        taxa_nan=args.taxa_nan,
+        semente=args.semente,
+    )
@@ -1,14 +1,19 @@
+import os
 import streamlit as st
 import pandas as pd
 import markowitz
 import deepRF as drl
 import comparacao
+import dados
+import aquecimento
 
 
 # --- Inicialização de variáveis no session_state ---
 for k in (
     "carteira_markowitz",
     "carteira_drl",
+    "fig_fronteira",
+    "aviso_fronteira",
     "fig_cumulative",
     "fig_pies",
     "fig_metrics",
@@ -16,6 +21,12 @@ for k in (
 ):
     st.session_state.setdefault(k, None)
 
+# --- Aquecimento em segundo plano (uma vez por processo) ---
+# Carrega as bases e pré-calcula a carteira padrão enquanto o usuário ajusta
+# os parâmetros; os valores padrão da barra lateral devem coincidir com
+# aquecimento.PARAMETROS_PADRAO para o primeiro clique usar o cache.
+aquecimento.iniciar_aquecimento()
+
 
 # --- Função auxiliar para formatar a carteira em DataFrame ---
 def formatar_carteira_df(carteira_dict: dict) -> pd.DataFrame:
@@ -86,6 +97,73 @@ with st.sidebar:
         / 100.0
     )
 
+    somente_universo = st.checkbox(
+        "5. Restringir ao universo líquido (Base FIIs.xlsx)",
+        value=False,
+        help="Considera apenas os FIIs do cadastro, lendo somente essas colunas das bases.",
+    )
+    universo = dados.tickers_universo() if somente_universo else None
+
+    limite_ffill = (
+        st.number_input(
+            "6. Preencher lacunas de até N pregões",
+            min_value=0,
+            max_value=20,
+            value=0,
+            step=1,
+            help="Repete a última cota de um FII por até N pregões sem negociação, "
+            "em vez de descartar o dia inteiro. 0 mantém o descarte.",
+        )
+        or None
+    )
+
+    frequencia = st.selectbox(
+        "7. Frequência dos dados",
+        options=["diaria", "semanal", "mensal"],
+        format_func={"diaria": "Diária", "semanal": "Semanal", "mensal": "Mensal"}.get,
+        help="Reamostra as cotas (última cota de cada período) antes da otimização "
+        "e do backtest. Períodos mais longos encurtam os episódios do DRL.",
+    )
+
+    metodo_markowitz = st.selectbox(
+        "8. Solver do Markowitz",
+        options=list(markowitz.METODOS_OTIMIZACAO),
+        format_func={
+            "cvxpy": "cvxpy (pypfopt)",
+            "conjunto_ativo": "Conjunto ativo",
+            "cla": "Linha crítica (cantos)",
+        }.get,
+        help="O conjunto ativo resolve o mesmo problema (soma 1 e peso entre 0 e o "
+        "máximo) sem montar um modelo genérico, bem mais rápido. A linha crítica "
+        "calcula os cantos da fronteira uma vez e só interpola ao mudar o retorno alvo.",
+    )
+
+    cardinalidade_exata = st.checkbox(
+        "9. Número exato de ativos (branch-and-bound)",
+        value=False,
+        help="Escolhe exatamente a quantidade de ativos pedida (cada um com ao menos 1%) "
+        "considerando as correlações, em vez de pré-selecionar pelo Sharpe individual.",
+    )
+    tempo_limite = st.number_input(
+        "Tempo máximo do branch-and-bound (s)",
+        min_value=1.0,
+        max_value=120.0,
+        value=10.0,
+        step=1.0,
+        disabled=not cardinalidade_exata,
+        help="Ao esgotar o tempo, usa a melhor carteira encontrada até ali.",
+    )
+    n_processos = st.number_input(
+        "Processos do branch-and-bound",
+        min_value=1,
+        max_value=os.cpu_count() or 1,
+        value=1,
+        step=1,
+        disabled=not cardinalidade_exata,
+        help="Avalia os nós da busca em paralelo, em processos separados "
+        "(1 = no próprio processo do app).",
+    )
+
 
 # --- Botões de Otimização ---
 st.divider()
@@ -101,11 +179,43 @@ with col1:
                     peso_maximo=peso_maximo,
                     taxa_livre_risco=taxa_livre_risco,
                     retorno_alvo=retorno_alvo,
+                    universo=universo,
+                    limite_ffill=limite_ffill,
+                    frequencia=frequencia,
+                    metodo=metodo_markowitz,
+                    cardinalidade_exata=cardinalidade_exata,
+                    tempo_limite=tempo_limite,
+                    n_processos=n_processos,
                 )
                 st.success("Carteira Markowitz gerada com sucesso!")
             except Exception as e:
                 st.error(f"Ocorreu um erro na otimização Markowitz: {e}")
 
+        # Fronteira dos mesmos parâmetros da carteira, calculada uma vez aqui
+        # (e não a cada rerun, nem com a barra lateral já alterada)
+        st.session_state.fig_fronteira = None
+        st.session_state.aviso_fronteira = None
+        if st.session_state.carteira_markowitz:
+            with st.spinner("Calculando a fronteira eficiente..."):
+                try:
+                    filtros = dict(
+                        universo=universo, limite_ffill=limite_ffill, frequencia=frequencia
+                    )
+                    _, volatilidades, retornos = markowitz.calcular_fronteira(
+                        quantidade_ativos, peso_maximo, taxa_livre_risco, **filtros
+                    )
+                    st.session_state.fig_fronteira = comparacao.plot_efficient_frontier(
+                        volatilidades,
+                        retornos,
+                        markowitz.desempenho_carteira(
+                            st.session_state.carteira_markowitz, **filtros
+                        ),
+                    )
+                except Exception as e:
+                    st.session_state.aviso_fronteira = (
+                        f"Não foi possível calcular a fronteira eficiente: {e}"
+                    )
+
 with col2:
     st.subheader("Otimização com DRL")
     if st.button("Otimizar com DRL", use_container_width=True, type="secondary"):
@@ -117,6 +227,9 @@ with col2:
                     max_weight_per_asset=peso_maximo,
                     risk_free_rate=taxa_livre_risco,
                     target_return=retorno_alvo,
+                    universe=universo,
+                    gap_fill_limit=limite_ffill,
+                    frequency=frequencia,
                 )
                 st.success("Carteira DRL gerada com sucesso!")
             except Exception as e:
@@ -139,6 +252,12 @@ if st.session_state.carteira_markowitz or st.session_state.carteira_drl:
                 df_markowitz.style.format({"Peso": "{:.2%}"}), use_container_width=True
             )
 
+            with st.expander("Fronteira eficiente"):
+                if st.session_state.fig_fronteira is not None:
+                    st.plotly_chart(st.session_state.fig_fronteira, use_container_width=True)
+                elif st.session_state.aviso_fronteira:
+                    st.warning(st.session_state.aviso_fronteira)
+
     # --- Modelo DRL ---
     with res_col2:
         if st.session_state.carteira_drl:
@@ -169,6 +288,8 @@ if st.session_state.carteira_markowitz and st.session_state.carteira_drl:
                 st.session_state.carteira_markowitz,
                 st.session_state.carteira_drl,
                 taxa_livre_risco,
+                fill_limit=limite_ffill,
+                frequency=frequencia,
             )
 
             # Armazena os resultados no estado da sessão
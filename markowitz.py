@@ -1,18 +1,127 @@
 import pandas as pd
 import numpy as np
-from pypfopt import EfficientFrontier, risk_models, expected_returns
+from pypfopt import EfficientFrontier
 from pypfopt.exceptions import OptimizationError
+import time
 import traceback
 
+import cardinalidade
+import conjunto_ativo
+import dados
+import estimadores
+
+# "cvxpy": EfficientFrontier do pypfopt; "conjunto_ativo": solver dedicado
+# para soma 1 e 0 <= w <= peso_maximo (conjunto_ativo.py), bem mais rápido;
+# "cla": cantos da fronteira calculados uma vez (linha crítica) e interpolados
+METODOS_OTIMIZACAO = ("cvxpy", "conjunto_ativo", "cla")
+
 def _to_numeric_df(df: pd.DataFrame) -> pd.DataFrame:
     # força tudo para numérico (mantém datas no índice)
     return df.apply(pd.to_numeric, errors="coerce")
 
+def calcular_inputs(
+    universo: list = None, limite_ffill: int = None, frequencia: str = "diaria"
+) -> tuple:
+    """
+    Retorno esperado (média histórica) e covariância de Ledoit-Wolf das bases
+    limpas, anualizados conforme a `frequencia` do painel. Vêm do cache de
+    estimativas (`estimadores.estimativa`), compartilhado com o DRL.
+    """
+    filtros = {"tickers": universo, "limite_ffill": limite_ffill, "frequencia": frequencia}
+    mu = estimadores.estimativa("media_historica", **filtros)
+    S = estimadores.estimativa("ledoit_wolf", **filtros)
+    return mu, S
+
+
+def selecionar_ativos(mu, S, quantidade_ativos: int, taxa_livre_risco: float) -> list:
+    """Os `quantidade_ativos` tickers de maior Sharpe individual (ou todos)."""
+    if quantidade_ativos >= len(mu):
+        return mu.index.tolist()
+    sharpe_individual = (mu - taxa_livre_risco) / np.sqrt(np.diag(S))
+    return sharpe_individual.nlargest(quantidade_ativos).index.tolist()
+
+
 def Otimizacao_Markowitz(
     quantidade_ativos: int,
     peso_maximo: float,
     taxa_livre_risco: float,
     retorno_alvo: float = None,
+    universo: list = None,
+    limite_ffill: int = None,
+    frequencia: str = "diaria",
+    metodo: str = "cvxpy",
+    cardinalidade_exata: bool = False,
+    tempo_limite: float = 10.0,
+    n_processos: int = 1,
+) -> dict:
+    """
+    Carteira de Markowitz para os parâmetros dados. O resultado fica em cache
+    pela versão dos dados e pelos parâmetros, então repetir a otimização (ou
+    pedir a carteira já pré-calculada pelo aquecimento) não refaz o cálculo.
+
+    Com `cardinalidade_exata`, os ativos não são pré-selecionados pelo Sharpe
+    individual: o branch-and-bound de `cardinalidade` escolhe exatamente
+    `quantidade_ativos` ativos em até `tempo_limite` segundos, avaliando os
+    nós em `n_processos` processos (o `metodo` é ignorado nesse caso).
+    """
+    if metodo not in METODOS_OTIMIZACAO:
+        raise ValueError(f"Método desconhecido: {metodo}. Opções: {METODOS_OTIMIZACAO}")
+    if universo is not None:
+        universo = tuple(universo)
+    chave = (
+        "markowitz",
+        dados.DATA_INICIO,
+        dados.DATA_FIM,
+        quantidade_ativos,
+        peso_maximo,
+        taxa_livre_risco,
+        retorno_alvo,
+        universo,
+        limite_ffill,
+        frequencia,
+        metodo,
+        cardinalidade_exata,
+        tempo_limite if cardinalidade_exata else None,
+    )
+    try:
+        pesos_final = dados.memoizado(
+            chave,
+            lambda: _otimizar(
+                quantidade_ativos,
+                peso_maximo,
+                taxa_livre_risco,
+                retorno_alvo,
+                universo,
+                limite_ffill,
+                frequencia,
+                metodo,
+                cardinalidade_exata,
+                tempo_limite,
+                n_processos,
+            ),
+        )
+        return dict(pesos_final)
+
+    except Exception as e:
+        print("\n[ERRO na Otimização Markowitz]")
+        print(e)
+        traceback.print_exc()
+        print("Retornando carteira vazia.\n")
+        return {}
+
+
+def _otimizar(
+    quantidade_ativos: int,
+    peso_maximo: float,
+    taxa_livre_risco: float,
+    retorno_alvo: float,
+    universo: tuple,
+    limite_ffill: int,
+    frequencia: str,
+    metodo: str = "cvxpy",
+    cardinalidade_exata: bool = False,
+    tempo_limite: float = 10.0,
+    n_processos: int = 1,
 ) -> dict:
     print("\n===============================")
     print(">> Iniciando Otimização Markowitz")
@@ -20,100 +129,441 @@ def Otimizacao_Markowitz(
           f"taxa_rf={taxa_livre_risco}, retorno_alvo={retorno_alvo}")
     print("===============================")
 
+    # --- 1 a 4. Carregamento, filtro de período e limpeza (memoizados) ---
+    df_ret, df_vol = dados.preparar_bases(
+        tickers=universo, limite_ffill=limite_ffill, frequencia=frequencia
+    )
+    print(f"> Bases limpas: {df_ret.shape[0]} períodos válidos ({frequencia}), "
+          f"{df_ret.shape[1]} ativos")
+
+    if df_ret.empty or df_vol.empty:
+        raise ValueError("As bases ficaram vazias após limpeza — verifique NaNs ou tickers inconsistentes.")
+
+    # --- 5. Cálculo dos Inputs ---
+    # Média e covariância memoizadas para as bases limpas
+    mu, S = calcular_inputs(universo, limite_ffill, frequencia)
+    print("> Inputs calculados com sucesso (retornos e covariância)")
+
+    # --- 6 a 8. Seleção de ativos, otimização e extração dos pesos ---
+    return otimizar_carteira(
+        mu,
+        S,
+        quantidade_ativos,
+        peso_maximo,
+        taxa_livre_risco,
+        retorno_alvo,
+        metodo=metodo,
+        cardinalidade_exata=cardinalidade_exata,
+        tempo_limite=tempo_limite,
+        n_processos=n_processos,
+        cantos=lambda mu_sel, S_sel, peso: calcular_cantos(
+            mu_sel, S_sel, peso, universo, limite_ffill, frequencia
+        ),
+    )
+
+
+def otimizar_carteira(
+    mu,
+    S,
+    quantidade_ativos: int,
+    peso_maximo: float,
+    taxa_livre_risco: float,
+    retorno_alvo: float = None,
+    metodo: str = "cvxpy",
+    cardinalidade_exata: bool = False,
+    tempo_limite: float = 10.0,
+    cantos=None,
+    n_processos: int = 1,
+) -> dict:
+    """
+    Passos 6 a 8 de `Otimizacao_Markowitz` sobre `mu` e `S` já calculados
+    (sem cache): seleção dos ativos, otimização e pesos positivos.
+
+    `cantos(mu_sel, S_sel, peso_maximo)` fornece os cantos da fronteira no
+    método "cla" (padrão: `cantos_fronteira`, sem cache) e `n_processos` é
+    repassado ao branch-and-bound da cardinalidade exata (padrão: no próprio
+    processo).
+    """
+    # --- 6. Seleção de ativos ---
+    if cardinalidade_exata:
+        # A escolha dos ativos fica com o branch-and-bound do passo 7
+        selected_tickers = mu.index.tolist()
+    else:
+        selected_tickers = selecionar_ativos(mu, S, quantidade_ativos, taxa_livre_risco)
+    if quantidade_ativos >= len(mu):
+        print("> Utilizando todos os ativos disponíveis.")
+    elif not cardinalidade_exata:
+        print(f"> Ativos selecionados: {len(selected_tickers)}")
+
+    mu_sel = mu[selected_tickers]
+    S_sel = S.loc[selected_tickers, selected_tickers]
+
+    # --- 7. Otimização ---
+    if cardinalidade_exata:
+        try:
+            pesos = _otimizar_cardinalidade(
+                mu_sel, S_sel, quantidade_ativos, peso_maximo, taxa_livre_risco,
+                retorno_alvo, tempo_limite, n_processos,
+            )
+        except (ValueError, RuntimeError) as e:
+            # Nenhuma carteira com exatamente `quantidade_ativos` ativos no tempo
+            # (ou falha do branch-and-bound): volta à seleção heurística
+            print(f"> Cardinalidade exata falhou ({e}). Usando a seleção heurística...")
+            selected_tickers = selecionar_ativos(mu, S, quantidade_ativos, taxa_livre_risco)
+            pesos = _otimizar_cvxpy(
+                mu[selected_tickers],
+                S.loc[selected_tickers, selected_tickers],
+                peso_maximo,
+                taxa_livre_risco,
+                retorno_alvo,
+            )
+    elif metodo == "conjunto_ativo":
+        try:
+            pesos = _otimizar_conjunto_ativo(
+                mu_sel, S_sel, peso_maximo, taxa_livre_risco, retorno_alvo
+            )
+        except RuntimeError as e:
+            # Falha de convergência do solver dedicado: resolve pelo cvxpy
+            print(f"> Conjunto ativo falhou ({e}). Usando o cvxpy...")
+            pesos = _otimizar_cvxpy(mu_sel, S_sel, peso_maximo, taxa_livre_risco, retorno_alvo)
+    elif metodo == "cla":
+        cantos_sel = (cantos or cantos_fronteira)(mu_sel, S_sel, peso_maximo)
+        pesos = _otimizar_cla(cantos_sel, mu_sel, S_sel, taxa_livre_risco, retorno_alvo)
+    else:
+        pesos = _otimizar_cvxpy(mu_sel, S_sel, peso_maximo, taxa_livre_risco, retorno_alvo)
+
+    # --- 8. Extração de Pesos ---
+    pesos_final = {ticker: w for ticker, w in pesos.items() if w > 0}
+
+    soma_pesos = sum(pesos_final.values())
+    print(f"> Quantidade de ativos na carteira: {len(pesos_final)}")
+    print(f"> Soma dos pesos: {soma_pesos:.4f}")
+
+    if len(pesos_final) == 0:
+        raise ValueError("Nenhum ativo recebeu peso positivo — otimização inválida.")
+
+    return pesos_final
+
+
+def _otimizar_cvxpy(
+    mu_sel, S_sel, peso_maximo: float, taxa_livre_risco: float, retorno_alvo: float
+) -> dict:
+    """Passo 7 pelo EfficientFrontier do pypfopt (cvxpy)."""
+    ef = EfficientFrontier(mu_sel, S_sel, weight_bounds=(0, peso_maximo))
+
     try:
-        # --- 1. Carregamento das Bases ---
-        df_vol = pd.read_csv(
-            "Base Cota Mercado.csv", parse_dates=["dt_pregao"], index_col="dt_pregao"
-        )
-        df_ret = pd.read_csv(
-            "Base Cota Ajustada.csv", parse_dates=["dt_pregao"], index_col="dt_pregao"
-        )
+        if retorno_alvo:
+            ef.efficient_return(target_return=retorno_alvo)
+            print("> Otimização feita por retorno alvo")
+        else:
+            ef.max_sharpe(risk_free_rate=taxa_livre_risco)
+            print("> Otimização feita para máximo Sharpe")
+    except (OptimizationError, ValueError) as e:
+        print(f"> Erro ao usar retorno alvo ({e}). Tentando max_sharpe...")
+        ef.max_sharpe(risk_free_rate=taxa_livre_risco)
+
+    return ef.clean_weights(cutoff=1e-5)
+
+
+def _otimizar_conjunto_ativo(
+    mu_sel, S_sel, peso_maximo: float, taxa_livre_risco: float, retorno_alvo: float
+) -> dict:
+    """
+    Mesmo problema e mesmo fallback do passo 7 com o EfficientFrontier, mas
+    resolvido por `conjunto_ativo`. Os pesos são limpos como em
+    `clean_weights(cutoff=1e-5)`.
+    """
+    mu_arr, S_arr = mu_sel.values, S_sel.values
+    try:
+        if retorno_alvo:
+            w, _ = conjunto_ativo.minima_variancia(S_arr, peso_maximo, mu_arr, retorno_alvo)
+            print("> Otimização feita por retorno alvo (conjunto ativo)")
+        else:
+            w = conjunto_ativo.maximo_sharpe(mu_arr, S_arr, peso_maximo, taxa_livre_risco)
+            print("> Otimização feita para máximo Sharpe (conjunto ativo)")
+    except ValueError as e:
+        print(f"> Erro ao usar retorno alvo ({e}). Tentando max_sharpe...")
+        w = conjunto_ativo.maximo_sharpe(mu_arr, S_arr, peso_maximo, taxa_livre_risco)
+    return _limpar_pesos(mu_sel.index, w)
 
-        print(f"> Base Mercado: {df_vol.shape[0]} linhas x {df_vol.shape[1]} colunas")
-        print(f"> Base Ajustada: {df_ret.shape[0]} linhas x {df_ret.shape[1]} colunas")
 
-        # --- 2. Filtro de Período ---
-        start_date = "2020-01-01"
-        end_date = "2024-12-31"
-        df_vol = df_vol.loc[start_date:end_date]
-        df_ret = df_ret.loc[start_date:end_date]
-        print(f"> Após filtro: {df_vol.shape[0]} datas válidas")
+def _limpar_pesos(tickers, w) -> dict:
+    """Como `clean_weights(cutoff=1e-5)`: zera abaixo do corte e arredonda em 5 casas."""
+    w = np.round(np.where(np.abs(w) < 1e-5, 0.0, w), 5)
+    return {ticker: float(peso) for ticker, peso in zip(tickers, w)}
 
-        # --- 3. Sincronização de colunas ---
-        common_tickers = df_vol.columns.intersection(df_ret.columns)
-        print(f"> Tickers em comum antes da limpeza: {len(common_tickers)}")
 
-        df_vol = df_vol[common_tickers]
-        df_ret = df_ret[common_tickers]
+def cantos_fronteira(mu, S, peso_maximo: float) -> tuple:
+    """
+    Carteiras de canto da fronteira com soma 1 e 0 <= w <= peso_maximo,
+    em uma única passada da linha crítica (`conjunto_ativo.cantos_fronteira`).
+    Entre dois cantos vizinhos os pesos variam linearmente com o retorno,
+    então os cantos descrevem a fronteira inteira.
 
-        # --- 4. Limpeza de NaNs ---
-        thresh_vol = int(0.90 * len(df_vol))
-        thresh_ret = int(0.90 * len(df_ret))
-        df_vol.dropna(axis=1, thresh=thresh_vol, inplace=True)
-        df_ret.dropna(axis=1, thresh=thresh_ret, inplace=True)
+    Devolve (retornos, pesos): retornos crescentes (do canto de mínima
+    variância ao de retorno máximo) e pesos com um canto por linha.
+    """
+    retornos, pesos = conjunto_ativo.cantos_fronteira(mu, S, peso_maximo)
+    # Cantos que repetem o retorno do vizinho (trechos degenerados) não
+    # acrescentam nada à interpolação
+    distintos = np.concatenate([[True], np.diff(retornos) > 1e-12])
+    return retornos[distintos], pesos[distintos]
 
-        common_tickers_after_na = df_vol.columns.intersection(df_ret.columns)
-        print(f"> Após dropna por coluna: {len(common_tickers_after_na)} ativos restantes")
 
-        df_vol = df_vol[common_tickers_after_na].dropna()
-        df_ret = df_ret[common_tickers_after_na].dropna()
+def calcular_cantos(
+    mu_sel, S_sel, peso_maximo: float, universo=None, limite_ffill=None, frequencia="diaria"
+) -> tuple:
+    """`cantos_fronteira` memoizado pela versão dos dados, pelos tickers e pelo peso máximo."""
+    chave = (
+        "cantos_cla",
+        dados.DATA_INICIO,
+        dados.DATA_FIM,
+        tuple(mu_sel.index),
+        peso_maximo,
+        universo,
+        limite_ffill,
+        frequencia,
+    )
+    return dados.memoizado(
+        chave, lambda: cantos_fronteira(mu_sel, S_sel, peso_maximo), cache="estimativas"
+    )
 
-        common_index = df_vol.index.intersection(df_ret.index)
-        df_vol = df_vol.loc[common_index]
-        df_ret = df_ret.loc[common_index]
 
-        print(f"> Após dropna por linha: {df_ret.shape[0]} dias válidos, {df_ret.shape[1]} ativos")
+def interpolar_cantos(cantos: tuple, retorno_alvo: float) -> np.ndarray:
+    """
+    Carteira de mínima variância com mu'w >= retorno_alvo (como
+    `efficient_return`), interpolada entre os dois cantos que cercam o alvo.
+    """
+    retornos, pesos = cantos
+    if retorno_alvo > retornos[-1] + 1e-12:
+        raise ValueError("target_return must be lower than the maximum possible return")
+    if retorno_alvo <= retornos[0]:
+        # A restrição de retorno não está ativa na mínima variância
+        return pesos[0].copy()
+    k = min(int(np.searchsorted(retornos, retorno_alvo)), len(retornos) - 1)
+    t = (retorno_alvo - retornos[k - 1]) / (retornos[k] - retornos[k - 1])
+    return (1 - t) * pesos[k - 1] + t * pesos[k]
+
+
+def sharpe_cantos(cantos: tuple, S, taxa_livre_risco: float) -> np.ndarray:
+    """
+    Carteira de maior Sharpe sobre os cantos. Em cada trecho w(r) = w0 + r w1,
+    o Sharpe (r - rf) / sqrt(A r² + 2B r + C) tem máximo em forma fechada
+    r* = -(C + rf B) / (B + rf A); fica o melhor r* (limitado ao trecho).
+    """
+    retornos, pesos = cantos
+    S = np.asarray(S, dtype=np.float64)
+    if retornos[-1] <= taxa_livre_risco:
+        raise ValueError(
+            "at least one of the assets must have an expected return exceeding the risk-free rate"
+        )
+    if len(retornos) == 1:
+        return pesos[0].copy()
 
-        if df_ret.empty or df_vol.empty:
-            raise ValueError("As bases ficaram vazias após limpeza — verifique NaNs ou tickers inconsistentes.")
+    melhor, melhor_sharpe = None, -np.inf
+    for k in range(len(retornos) - 1):
+        r_a, r_b = retornos[k], retornos[k + 1]
+        w1 = (pesos[k + 1] - pesos[k]) / (r_b - r_a)
+        w0 = pesos[k] - r_a * w1
+        A, B, C = w1 @ S @ w1, w0 @ S @ w1, w0 @ S @ w0
+        denominador = B + taxa_livre_risco * A
+        r = r_b if denominador >= 0 else -(C + taxa_livre_risco * B) / denominador
+        r = float(np.clip(r, r_a, r_b))
+        w = w0 + r * w1
+        sharpe = (r - taxa_livre_risco) / np.sqrt(max(w @ S @ w, 0.0))
+        if sharpe > melhor_sharpe:
+            melhor, melhor_sharpe = w, sharpe
+    return melhor
 
-        # --- 5. Cálculo dos Inputs ---
-        mu = expected_returns.mean_historical_return(df_ret)
-        S = risk_models.CovarianceShrinkage(df_vol).ledoit_wolf()
-        print("> Inputs calculados com sucesso (retornos e covariância)")
 
-        # --- 6. Seleção de ativos ---
-        if quantidade_ativos >= len(mu):
-            print("> Utilizando todos os ativos disponíveis.")
-            selected_tickers = mu.index.tolist()
+def _otimizar_cardinalidade(
+    mu, S, quantidade_ativos: int, peso_maximo: float, taxa_livre_risco: float,
+    retorno_alvo: float, tempo_limite: float, n_processos: int = 1,
+) -> dict:
+    """
+    Passo 7 com exatamente `quantidade_ativos` ativos (branch-and-bound), mesmo
+    fallback. O retorno alvo e o máximo Sharpe dividem o mesmo `tempo_limite`;
+    um alvo acima do máximo com a cardinalidade falha antes da busca.
+    """
+    prazo = time.perf_counter() + tempo_limite
+    parametros = {
+        "quantidade_ativos": min(quantidade_ativos, len(mu)),
+        "peso_maximo": peso_maximo,
+        "taxa_livre_risco": taxa_livre_risco,
+        "n_processos": n_processos,
+    }
+    try:
+        if retorno_alvo:
+            resultado = cardinalidade.carteira_cardinalidade(
+                mu, S, retorno_alvo=retorno_alvo, tempo_limite=tempo_limite, **parametros
+            )
+            print("> Otimização feita por retorno alvo (cardinalidade exata)")
         else:
-            sharpe_individual = (mu - taxa_livre_risco) / np.sqrt(np.diag(S))
-            selected_tickers = sharpe_individual.nlargest(quantidade_ativos).index.tolist()
-            print(f"> Ativos selecionados: {len(selected_tickers)}")
+            resultado = cardinalidade.carteira_cardinalidade(
+                mu, S, tempo_limite=tempo_limite, **parametros
+            )
+            print("> Otimização feita para máximo Sharpe (cardinalidade exata)")
+    except ValueError as e:
+        if not retorno_alvo:
+            raise
+        print(f"> Erro ao usar retorno alvo ({e}). Tentando max_sharpe...")
+        resultado = cardinalidade.carteira_cardinalidade(
+            mu, S, tempo_limite=max(prazo - time.perf_counter(), 0.0), **parametros
+        )
+    return _limpar_pesos(mu.index, np.array(list(resultado["pesos"].values())))
 
-        mu_sel = mu[selected_tickers]
-        S_sel = S.loc[selected_tickers, selected_tickers]
 
-        # --- 7. Otimização ---
-        ef = EfficientFrontier(mu_sel, S_sel, weight_bounds=(0, peso_maximo))
+def _otimizar_cla(
+    cantos: tuple, mu_sel, S_sel, taxa_livre_risco: float, retorno_alvo: float
+) -> dict:
+    """Mesmo problema e mesmo fallback do passo 7, interpolando os cantos da fronteira."""
+    try:
+        if retorno_alvo:
+            w = interpolar_cantos(cantos, retorno_alvo)
+            print("> Otimização feita por retorno alvo (cantos da linha crítica)")
+        else:
+            w = sharpe_cantos(cantos, S_sel.values, taxa_livre_risco)
+            print("> Otimização feita para máximo Sharpe (cantos da linha crítica)")
+    except ValueError as e:
+        print(f"> Erro ao usar retorno alvo ({e}). Tentando max_sharpe...")
+        w = sharpe_cantos(cantos, S_sel.values, taxa_livre_risco)
+    return _limpar_pesos(mu_sel.index, w)
+
+
+def carteira_retorno_maximo(mu, peso_maximo: float) -> np.ndarray:
+    """
+    Pesos de maior retorno com soma 1 e 0 <= w <= peso_maximo: preenche os
+    ativos de maior retorno esperado até o limite, em ordem.
+    """
+    mu = np.asarray(mu, dtype=np.float64)
+    pesos = np.zeros(len(mu))
+    pesos[np.argsort(-mu, kind="stable")] = np.clip(
+        1 - peso_maximo * np.arange(len(mu)), 0, peso_maximo
+    )
+    return pesos
+
+
+def retorno_maximo(mu, peso_maximo: float) -> float:
+    """Maior retorno possível com soma dos pesos 1 e 0 <= w <= peso_maximo."""
+    return float(np.asarray(mu, dtype=np.float64) @ carteira_retorno_maximo(mu, peso_maximo))
 
+
+# Opções do solver nas resoluções em lote: warm start e tolerâncias apertadas,
+# para o OSQP chegar aos mesmos pesos que uma resolução isolada
+OPCOES_SOLVER_FRONTEIRA = {
+    "OSQP": {"warm_start": True, "eps_abs": 1e-9, "eps_rel": 1e-9, "max_iter": 100000},
+}
+
+
+def fronteira_eficiente(
+    mu, S, retornos_alvo, peso_maximo: float, solver: str = "OSQP"
+) -> tuple:
+    """
+    Resolve `efficient_return` para todos os `retornos_alvo` em uma única
+    instância do EfficientFrontier: o problema do cvxpy é montado e
+    canonicalizado uma vez, cada resolução só atualiza o parâmetro do
+    retorno alvo e parte da solução anterior (warm start). Os alvos são
+    percorridos em ordem crescente, para que soluções vizinhas sirvam de
+    ponto de partida.
+
+    Devolve (pesos [alvos x ativos], volatilidades, retornos), na ordem dos
+    alvos recebidos; alvos inviáveis (acima do retorno máximo) ficam NaN.
+    """
+    alvos = np.asarray(retornos_alvo, dtype=np.float64)
+    mu_arr, S_arr = np.asarray(mu, dtype=np.float64), np.asarray(S, dtype=np.float64)
+    pesos = np.full((len(alvos), len(mu_arr)), np.nan)
+    carteira_maxima = carteira_retorno_maximo(mu_arr, peso_maximo)
+    maximo = float(mu_arr @ carteira_maxima)
+
+    ef = EfficientFrontier(
+        mu,
+        S,
+        weight_bounds=(0, peso_maximo),
+        solver=solver,
+        solver_options=OPCOES_SOLVER_FRONTEIRA.get(solver, {}),
+    )
+    for i in np.argsort(alvos):
+        if not alvos[i] <= maximo:
+            continue
+        if alvos[i] >= maximo - 1e-12:
+            # No retorno máximo a região viável é um ponto: solução direta
+            pesos[i] = carteira_maxima
+            continue
         try:
-            if retorno_alvo:
-                ef.efficient_return(target_return=retorno_alvo)
-                print("> Otimização feita por retorno alvo")
-            else:
-                ef.max_sharpe(risk_free_rate=taxa_livre_risco)
-                print("> Otimização feita para máximo Sharpe")
-        except (OptimizationError, ValueError) as e:
-            print(f"> Erro ao usar retorno alvo ({e}). Tentando max_sharpe...")
-            ef.max_sharpe(risk_free_rate=taxa_livre_risco)
+            ef.efficient_return(float(alvos[i]))
+        except (OptimizationError, ValueError):
+            continue
+        pesos[i] = ef.weights
 
-        # --- 8. Extração de Pesos ---
-        pesos = ef.clean_weights(cutoff=1e-5)
-        pesos_final = {ticker: w for ticker, w in pesos.items() if w > 0}
+    retornos = pesos @ mu_arr
+    volatilidades = np.sqrt(np.einsum("ij,jk,ik->i", pesos, S_arr, pesos))
+    return pesos, volatilidades, retornos
 
-        soma_pesos = sum(pesos_final.values())
-        print(f"> Quantidade de ativos na carteira: {len(pesos_final)}")
-        print(f"> Soma dos pesos: {soma_pesos:.4f}")
 
-        if len(pesos_final) == 0:
-            raise ValueError("Nenhum ativo recebeu peso positivo — otimização inválida.")
+def calcular_fronteira(
+    quantidade_ativos: int,
+    peso_maximo: float,
+    taxa_livre_risco: float,
+    n_pontos: int = 30,
+    universo: list = None,
+    limite_ffill: int = None,
+    frequencia: str = "diaria",
+) -> tuple:
+    """
+    Fronteira eficiente dos mesmos ativos selecionados por
+    `Otimizacao_Markowitz`, com `n_pontos` retornos alvo igualmente espaçados
+    entre o da carteira de mínima variância e o máximo possível. Memoizada
+    pela versão dos dados e pelos parâmetros.
 
-        return pesos_final
+    Devolve (pesos, volatilidades, retornos): pesos é um DataFrame (retorno
+    alvo x tickers) e os demais são arrays anualizados.
+    """
+    if universo is not None:
+        universo = tuple(universo)
 
-    except Exception as e:
-        print("\n[ERRO na Otimização Markowitz]")
-        print(e)
-        traceback.print_exc()
-        print("Retornando carteira vazia.\n")
-        return {}
+    def calcular():
+        mu, S = calcular_inputs(universo, limite_ffill, frequencia)
+        tickers = selecionar_ativos(mu, S, quantidade_ativos, taxa_livre_risco)
+        mu_sel, S_sel = mu[tickers], S.loc[tickers, tickers]
+
+        ef = EfficientFrontier(mu_sel, S_sel, weight_bounds=(0, peso_maximo))
+        ef.min_volatility()
+        minimo = float(ef.weights @ mu_sel.to_numpy())
+        alvos = np.linspace(minimo, retorno_maximo(mu_sel, peso_maximo), n_pontos)
+
+        pesos, volatilidades, retornos = fronteira_eficiente(
+            mu_sel, S_sel, alvos, peso_maximo
+        )
+        pesos = pd.DataFrame(pesos, index=pd.Index(alvos, name="retorno_alvo"), columns=tickers)
+        return pesos, volatilidades, retornos
+
+    chave = (
+        "fronteira",
+        dados.DATA_INICIO,
+        dados.DATA_FIM,
+        quantidade_ativos,
+        peso_maximo,
+        taxa_livre_risco,
+        n_pontos,
+        universo,
+        limite_ffill,
+        frequencia,
+    )
+    # Junto das estimativas: a fronteira é cara e não deve ser despejada
+    # pelo giro das etapas de limpeza
+    return dados.memoizado(chave, calcular, cache="estimativas")
+
+
+def desempenho_carteira(
+    pesos: dict,
+    universo: list = None,
+    limite_ffill: int = None,
+    frequencia: str = "diaria",
+) -> tuple:
+    """(retorno esperado, volatilidade) anualizados de uma carteira {ticker: peso}."""
+    mu, S = calcular_inputs(universo, limite_ffill, frequencia)
+    tickers = list(pesos)
+    w = np.array(list(pesos.values()), dtype=np.float64)
+    retorno = float(mu[tickers].to_numpy() @ w)
+    volatilidade = float(np.sqrt(w @ S.loc[tickers, tickers].to_numpy() @ w))
+    return retorno, volatilidade
@@ -0,0 +1,78 @@
+import os
+import sys
+import warnings
+
+import numpy as np
+import pytest
+from pypfopt import EfficientFrontier
+
+# Os módulos do app ficam na raiz do repositório (layout plano)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def gerar_problema(semente: int, n_min: int = 3, n_max: int = 25) -> tuple:
+    """Markowitz aleatório viável: (mu, S, peso_maximo, taxa_livre_risco)."""
+    rng = np.random.default_rng(semente)
+    n = int(rng.integers(n_min, n_max))
+    fatores = rng.standard_normal((n, n)) * 0.1
+    S = fatores @ fatores.T / n + np.diag(rng.uniform(0.001, 0.05, n))
+    mu = rng.uniform(0.0, 0.2, n)
+    peso_maximo = float(rng.uniform(max(1.0 / n, 0.05) + 0.01, 1.0))
+    taxa_livre_risco = float(rng.uniform(0.0, 0.08))
+    return mu, S, peso_maximo, taxa_livre_risco
+
+
+def referencia_cvxpy(mu, S, limites, taxa=None, alvo=None) -> np.ndarray:
+    """
+    Pesos do EfficientFrontier com `weight_bounds=limites`: máximo Sharpe com
+    `taxa` ou, com `alvo`, `efficient_return`. Pula o teste se o cvxpy não
+    resolve ou avisa que a solução é imprecisa.
+    """
+    ef = EfficientFrontier(mu, S, weight_bounds=limites)
+    with warnings.catch_warnings(record=True) as avisos:
+        warnings.simplefilter("always")
+        try:
+            if alvo is None:
+                ef.max_sharpe(risk_free_rate=taxa)
+            else:
+                ef.efficient_return(alvo)
+        except Exception:
+            pytest.skip("cvxpy não resolveu")
+    if avisos:
+        pytest.skip("solução do cvxpy imprecisa")
+    return ef.weights
+
+
+@pytest.fixture
+def problema_aleatorio():
+    return gerar_problema
+
+
+@pytest.fixture
+def referencia():
+    return referencia_cvxpy
+
+
+@pytest.fixture
+def bases_sinteticas(tmp_path):
+    """
+    Bases sintéticas pequenas em `tmp_path` ativas em `dados` durante o
+    teste; depois volta às bases, período e backend originais.
+    """
+    import dados
+    import gerador_sintetico
+
+    originais = (
+        dados.BASE_COTA_AJUSTADA,
+        dados.BASE_COTA_MERCADO,
+        dados.DATA_INICIO,
+        dados.DATA_FIM,
+    )
+    backend = dados._backend
+    ajustada, mercado = gerador_sintetico.gerar_bases(
+        str(tmp_path), n_ativos=30, n_dias=400, semente=7
+    )
+    dados.definir_bases(ajustada, mercado)
+    yield ajustada, mercado
+    dados.definir_backend(backend)
+    dados.definir_bases(*originais)
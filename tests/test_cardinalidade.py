@@ -0,0 +1,180 @@
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from pypfopt.exceptions import OptimizationError
+
+import cardinalidade
+import conjunto_ativo
+import markowitz
+
+PESO_MINIMO = cardinalidade.PESO_MINIMO
+
+
+def _problema(problema_aleatorio, semente):
+    mu, S, _, taxa = problema_aleatorio(semente, n_min=7, n_max=10)
+    rng = np.random.default_rng(semente)
+    k = int(rng.integers(2, 5))
+    peso_maximo = float(rng.uniform(1 / k + 0.01, 1.0))
+    return mu, S, k, peso_maximo, taxa
+
+
+def _enumeracao(mu, S, k, peso_maximo, taxa, alvo=None):
+    """Melhor custo (-Sharpe ou variância) entre todas as combinações de k ativos."""
+    melhor = np.inf
+    for combinacao in itertools.combinations(range(len(mu)), k):
+        c = list(combinacao)
+        mu_c, S_c = mu[c], S[np.ix_(c, c)]
+        try:
+            if alvo is None:
+                w = conjunto_ativo.maximo_sharpe(mu_c, S_c, peso_maximo, taxa, peso_minimo=PESO_MINIMO)
+                custo = -(mu_c @ w - taxa) / np.sqrt(w @ S_c @ w)
+            else:
+                w, _ = conjunto_ativo.minima_variancia(
+                    S_c, peso_maximo, mu_c, alvo, peso_minimo=PESO_MINIMO
+                )
+                custo = w @ S_c @ w
+        except ValueError:
+            continue
+        melhor = min(melhor, custo)
+    return melhor
+
+
+def _conferir_carteira(resultado, k, peso_maximo):
+    w = np.array(list(resultado["pesos"].values()))
+    positivos = w > 1e-9
+    assert positivos.sum() == k
+    assert w.sum() == pytest.approx(1.0, abs=1e-9)
+    assert np.all(w[positivos] >= PESO_MINIMO - 1e-9)
+    assert np.all(w <= peso_maximo + 1e-9)
+
+
+@pytest.mark.parametrize("semente", range(40))
+def test_maximo_sharpe_igual_enumeracao(problema_aleatorio, semente):
+    mu, S, k, peso_maximo, taxa = _problema(problema_aleatorio, semente)
+    if (mu > taxa).sum() < 1:
+        pytest.skip("nenhum ativo acima da taxa livre de risco")
+    referencia = _enumeracao(mu, S, k, peso_maximo, taxa)
+
+    resultado = cardinalidade.carteira_cardinalidade(mu, S, k, peso_maximo, taxa)
+    assert resultado["otimo"]
+    _conferir_carteira(resultado, k, peso_maximo)
+    assert -resultado["objetivo"] == pytest.approx(referencia, rel=1e-6)
+
+
+@pytest.mark.parametrize("semente", range(40))
+def test_retorno_alvo_igual_enumeracao(problema_aleatorio, semente):
+    mu, S, k, peso_maximo, taxa = _problema(problema_aleatorio, semente)
+    # Um alvo alcançável pela melhor carteira de k ativos
+    alvo = float(np.sort(mu)[-k:].mean() * 0.9)
+    referencia = _enumeracao(mu, S, k, peso_maximo, taxa, alvo)
+    if not np.isfinite(referencia):
+        pytest.skip("alvo inviável com k ativos")
+
+    resultado = cardinalidade.carteira_cardinalidade(
+        mu, S, k, peso_maximo, taxa, retorno_alvo=alvo
+    )
+    assert resultado["otimo"]
+    _conferir_carteira(resultado, k, peso_maximo)
+    assert resultado["objetivo"] == pytest.approx(referencia, rel=1e-6)
+
+
+@pytest.mark.parametrize("semente", range(10))
+def test_falha_do_conjunto_ativo_usa_cvxpy(problema_aleatorio, semente, monkeypatch):
+    mu, S, k, peso_maximo, taxa = _problema(problema_aleatorio, semente)
+    if (mu > taxa).sum() < 1:
+        pytest.skip("nenhum ativo acima da taxa livre de risco")
+    referencia = _enumeracao(mu, S, k, peso_maximo, taxa)
+    original = conjunto_ativo.maximo_sharpe
+    chamadas = itertools.count()
+
+    def falha_as_vezes(*args, **kwargs):
+        if next(chamadas) % 3 == 0:
+            raise RuntimeError("Máximo Sharpe não convergiu.")
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(conjunto_ativo, "maximo_sharpe", falha_as_vezes)
+    resultado = cardinalidade.carteira_cardinalidade(mu, S, k, peso_maximo, taxa)
+    _conferir_carteira(resultado, k, peso_maximo)
+    # O cvxpy resolve com precisão menor que o conjunto ativo
+    assert -resultado["objetivo"] == pytest.approx(referencia, rel=1e-4)
+
+
+def test_relaxacao_sem_solucao_mantem_o_no_aberto(problema_aleatorio, monkeypatch):
+    mu, S, k, peso_maximo, taxa = _problema(problema_aleatorio, 1)
+    referencia = _enumeracao(mu, S, k, peso_maximo, taxa)
+    original = conjunto_ativo.maximo_sharpe
+
+    def falha_fora_das_folhas(mu_c, *args, **kwargs):
+        # Só os problemas com exatamente k candidatos têm solução
+        if len(mu_c) > k:
+            raise RuntimeError("Máximo Sharpe não convergiu.")
+        return original(mu_c, *args, **kwargs)
+
+    def cvxpy_falha(*args, **kwargs):
+        raise OptimizationError()
+
+    monkeypatch.setattr(conjunto_ativo, "maximo_sharpe", falha_fora_das_folhas)
+    monkeypatch.setattr(cardinalidade, "_resolver_cvxpy", cvxpy_falha)
+    resultado = cardinalidade.carteira_cardinalidade(mu, S, k, peso_maximo, taxa)
+    # Sem limites intermediários, a busca percorre as folhas e acha o ótimo
+    assert resultado["otimo"]
+    assert -resultado["objetivo"] == pytest.approx(referencia, rel=1e-6)
+
+
+def test_tempo_limite_dentro_do_lote(problema_aleatorio):
+    mu, S, _, _, taxa = _problema(problema_aleatorio, 0)
+    mu, S = np.tile(mu, 4), np.kron(np.eye(4), S) + 1e-4
+    resultado = cardinalidade.carteira_cardinalidade(mu, S, 8, 0.2, taxa, tempo_limite=0.05)
+    assert resultado["segundos"] < 0.5
+    _conferir_carteira(resultado, 8, 0.2)
+
+
+@pytest.mark.parametrize("semente", range(20))
+def test_retorno_maximo_igual_enumeracao(problema_aleatorio, semente):
+    mu, _, k, peso_maximo, _ = _problema(problema_aleatorio, semente)
+    limites = conjunto_ativo._limites(k, PESO_MINIMO, peso_maximo)
+    referencia = max(
+        mu[list(c)] @ conjunto_ativo.carteira_extrema(mu[list(c)], limites)
+        for c in itertools.combinations(range(len(mu)), k)
+    )
+    assert cardinalidade.retorno_maximo(mu, k, peso_maximo) == pytest.approx(referencia)
+
+
+def test_retorno_alvo_inviavel_falha_antes_da_busca(problema_aleatorio):
+    mu, S, k, peso_maximo, taxa = _problema(problema_aleatorio, 0)
+    alvo = cardinalidade.retorno_maximo(mu, k, peso_maximo) + 0.01
+    with pytest.raises(ValueError, match="acima do máximo"):
+        cardinalidade.carteira_cardinalidade(mu, S, k, peso_maximo, taxa, retorno_alvo=alvo)
+
+
+def test_alvo_inviavel_no_markowitz_cai_no_maximo_sharpe(problema_aleatorio):
+    mu, S, k, peso_maximo, taxa = _problema(problema_aleatorio, 2)
+    tickers = [f"A{i}" for i in range(len(mu))]
+    mu, S = pd.Series(mu, index=tickers), pd.DataFrame(S, index=tickers, columns=tickers)
+    alvo = cardinalidade.retorno_maximo(mu, k, peso_maximo) + 0.01
+
+    inicio = time.perf_counter()
+    pesos = markowitz.otimizar_carteira(
+        mu, S, k, peso_maximo, taxa, alvo, cardinalidade_exata=True, tempo_limite=2.0
+    )
+    assert time.perf_counter() - inicio < 2.5
+    sem_alvo = markowitz.otimizar_carteira(
+        mu, S, k, peso_maximo, taxa, cardinalidade_exata=True, tempo_limite=2.0
+    )
+    assert pesos == sem_alvo
+    assert len(pesos) == k
+
+
+def test_sem_carteira_no_prazo_usa_selecao_heuristica(problema_aleatorio):
+    mu, S, k, peso_maximo, taxa = _problema(problema_aleatorio, 3)
+    tickers = [f"A{i}" for i in range(len(mu))]
+    mu, S = pd.Series(mu, index=tickers), pd.DataFrame(S, index=tickers, columns=tickers)
+
+    pesos = markowitz.otimizar_carteira(
+        mu, S, k, peso_maximo, taxa, cardinalidade_exata=True, tempo_limite=0.0
+    )
+    assert set(pesos) <= set(markowitz.selecionar_ativos(mu, S, k, taxa))
+    assert sum(pesos.values()) == pytest.approx(1.0, abs=1e-4)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+import conjunto_ativo
+import markowitz
+
+SEMENTES = range(200)
+
+
+@pytest.mark.parametrize("semente", SEMENTES)
+def test_interpolacao_igual_efficient_return(problema_aleatorio, referencia, semente):
+    mu, S, peso_maximo, _ = problema_aleatorio(semente)
+    cantos = markowitz.cantos_fronteira(mu, S, peso_maximo)
+    retornos, pesos = cantos
+    assert np.all(np.diff(retornos) > 0)
+    assert np.allclose(pesos.sum(axis=1), 1.0)
+    assert np.all((pesos >= -1e-12) & (pesos <= peso_maximo + 1e-12))
+
+    rng = np.random.default_rng(semente)
+    for alvo in rng.uniform(retornos[0], retornos[-1] - 1e-4, 5):
+        w = markowitz.interpolar_cantos(cantos, alvo)
+        # Contra o conjunto ativo (exato) em todo alvo ...
+        exato, _ = conjunto_ativo.minima_variancia(S, peso_maximo, mu, alvo)
+        assert w @ S @ w <= (exato @ S @ exato) * (1 + 1e-8)
+        assert np.abs(w - exato).max() < 1e-6
+    # ... e contra o cvxpy no último
+    esperado = referencia(mu, S, (0, peso_maximo), alvo=alvo)
+    assert w @ S @ w <= esperado @ S @ esperado + 1e-9
+    assert np.abs(w - esperado).max() < 1e-4
+
+
+@pytest.mark.parametrize("semente", SEMENTES[:50])
+def test_cantos_nos_extremos(problema_aleatorio, semente):
+    mu, S, peso_maximo, _ = problema_aleatorio(semente)
+    retornos, pesos = markowitz.cantos_fronteira(mu, S, peso_maximo)
+    limites = conjunto_ativo._limites(len(mu), 0.0, peso_maximo)
+    w_min, _ = conjunto_ativo.minima_variancia(S, peso_maximo)
+    assert pesos[0] @ S @ pesos[0] == pytest.approx(w_min @ S @ w_min, rel=1e-10)
+    assert retornos[-1] == pytest.approx(mu @ conjunto_ativo.carteira_extrema(mu, limites))
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import conjunto_ativo
+
+SEMENTES = range(300)
+
+
+def _sharpe(w, mu, S, taxa):
+    return (mu @ w - taxa) / np.sqrt(w @ S @ w)
+
+
+def _conferir_viavel(w, peso_maximo, peso_minimo=0.0):
+    assert w.sum() == pytest.approx(1.0, abs=1e-9)
+    assert np.all(w >= np.asarray(peso_minimo) - 1e-9)
+    assert np.all(w <= np.asarray(peso_maximo) + 1e-9)
+
+
+@pytest.mark.parametrize("semente", SEMENTES)
+def test_maximo_sharpe_igual_efficient_frontier(problema_aleatorio, referencia, semente):
+    mu, S, peso_maximo, taxa = problema_aleatorio(semente)
+    if not (mu > taxa).any():
+        pytest.skip("nenhum ativo acima da taxa livre de risco")
+    esperado = referencia(mu, S, (0, peso_maximo), taxa)
+
+    w = conjunto_ativo.maximo_sharpe(mu, S, peso_maximo, taxa)
+    _conferir_viavel(w, peso_maximo)
+    # O cvxpy pode sair dos limites em ~1e-5; o Sharpe não pode ficar abaixo
+    assert _sharpe(w, mu, S, taxa) >= _sharpe(esperado, mu, S, taxa) - 1e-6
+    assert np.abs(w - esperado).max() < 1e-3
+
+
+@pytest.mark.parametrize("semente", SEMENTES[:100])
+def test_minima_variancia_igual_efficient_return(problema_aleatorio, referencia, semente):
+    mu, S, peso_maximo, _ = problema_aleatorio(semente)
+    limites = conjunto_ativo._limites(len(mu), 0.0, peso_maximo)
+    r_max = mu @ conjunto_ativo.carteira_extrema(mu, limites)
+    w_min, _ = conjunto_ativo.minima_variancia(S, peso_maximo)
+    rng = np.random.default_rng(semente)
+    alvo = float(rng.uniform(mu @ w_min, r_max - 1e-4))
+
+    esperado = referencia(mu, S, (0, peso_maximo), alvo=alvo)
+    w, _ = conjunto_ativo.minima_variancia(S, peso_maximo, mu, alvo)
+
+    _conferir_viavel(w, peso_maximo)
+    assert mu @ w >= alvo - 1e-9
+    assert w @ S @ w <= esperado @ S @ esperado + 1e-9
+    assert np.abs(w - esperado).max() < 1e-4
+
+
+def test_retorno_alvo_acima_do_maximo_e_value_error(problema_aleatorio):
+    mu, S, peso_maximo, _ = problema_aleatorio(0)
+    with pytest.raises(ValueError):
+        conjunto_ativo.minima_variancia(S, peso_maximo, mu, mu.max() + 1.0)
+
+
+@pytest.mark.parametrize("semente", range(30))
+def test_limites_por_ativo_igual_efficient_frontier(problema_aleatorio, referencia, semente):
+    mu, S, peso_maximo, taxa = problema_aleatorio(semente, n_min=6)
+    if not (mu > taxa).any():
+        pytest.skip("nenhum ativo acima da taxa livre de risco")
+    rng = np.random.default_rng(semente)
+    minimo = np.where(rng.random(len(mu)) < 0.3, 0.02, 0.0)
+    if minimo.sum() > 1:
+        pytest.skip("pesos mínimos somam mais de 1")
+    limites = list(zip(minimo, [peso_maximo] * len(mu)))
+    esperado = referencia(mu, S, limites, taxa)
+
+    w = conjunto_ativo.maximo_sharpe(mu, S, peso_maximo, taxa, peso_minimo=minimo)
+    _conferir_viavel(w, peso_maximo, minimo)
+    assert _sharpe(w, mu, S, taxa) >= _sharpe(esperado, mu, S, taxa) - 1e-6
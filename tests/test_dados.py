@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+import dados
+
+
+@pytest.mark.parametrize("frequencia", ["semanal", "mensal"])
+@pytest.mark.parametrize("log", [False, True])
+def test_retornos_reamostrados_com_lista_de_tickers(bases_sinteticas, frequencia, log):
+    caminho = bases_sinteticas[0]
+    todos = dados.carregar_retornos(caminho, log=log, frequencia=frequencia)
+    tickers = list(todos.columns[:3])
+
+    parciais = dados.carregar_retornos(caminho, log=log, tickers=tickers, frequencia=frequencia)
+    pd.testing.assert_frame_equal(parciais, todos[tickers])
+
+
+@pytest.mark.parametrize("frequencia", ["semanal", "mensal"])
+def test_base_fora_do_padrao_recarregada_ao_mudar(bases_sinteticas, tmp_path, frequencia):
+    # `versao_dados` só acompanha as bases padrão; a chave usa o próprio arquivo
+    caminho = str(tmp_path / "Outra Base.csv")
+    base = pd.read_csv(bases_sinteticas[0], parse_dates=["dt_pregao"], index_col="dt_pregao")
+    base.to_csv(caminho, date_format="%Y-%m-%d")
+    antes = dados.carregar_retornos(caminho, frequencia=frequencia)
+    reamostrada = dados.carregar_reamostrada(caminho, frequencia)
+
+    base.iloc[: len(base) // 2].to_csv(caminho, date_format="%Y-%m-%d")
+    assert len(dados.carregar_reamostrada(caminho, frequencia)) < len(reamostrada)
+    assert len(dados.carregar_retornos(caminho, frequencia=frequencia)) < len(antes)
@@ -0,0 +1,15 @@
+import pytest
+
+pytest.importorskip("stable_baselines3")
+
+import deepRF  # noqa: E402
+
+PARAMETROS = ("versao", ["A", "B"], 0.2, None, 0.1, 1000)
+
+
+def test_politica_depende_da_janela_e_da_versao(monkeypatch):
+    caminho = deepRF._caminho_modelo(*PARAMETROS, 30)
+    assert deepRF._caminho_modelo(*PARAMETROS, 30) == caminho
+    assert deepRF._caminho_modelo(*PARAMETROS, 60) != caminho
+    monkeypatch.setattr(deepRF, "VERSAO_MODELO", deepRF.VERSAO_MODELO + 1)
+    assert deepRF._caminho_modelo(*PARAMETROS, 30) != caminho
@@ -0,0 +1,89 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dados
+
+CORTE = 300
+
+
+@pytest.fixture(params=["\n", "\r\n"], ids=["lf", "crlf"])
+def quebra(request):
+    """Quebra de linha dos CSVs do teste (as bases reais usam CRLF)."""
+    return request.param
+
+
+def _ler(caminho):
+    return pd.read_csv(caminho, parse_dates=["dt_pregao"], index_col="dt_pregao")
+
+
+def _gravar(df, caminho, quebra):
+    df.to_csv(caminho, date_format="%Y-%m-%d", lineterminator=quebra)
+
+
+def _conferir_quebras(caminho, quebra):
+    """Todas as linhas terminam com `quebra`, inclusive as ingeridas."""
+    with open(caminho, "rb") as arquivo:
+        conteudo = arquivo.read()
+    assert conteudo.endswith(quebra.encode())
+    assert conteudo.count(b"\r\n") == (conteudo.count(b"\n") if quebra == "\r\n" else 0)
+
+
+def _reprocessado(caminho):
+    """Armazém recriado do zero a partir do CSV atual."""
+    shutil.rmtree(dados._diretorio_armazem(caminho), ignore_errors=True)
+    dados.limpar_cache()
+    return dados.carregar_armazem(caminho)
+
+
+def _conferir_igual_ao_reprocessado(caminho, armazem):
+    referencia = _reprocessado(caminho)
+    assert armazem.datas.equals(referencia.datas)
+    assert armazem.tickers.equals(referencia.tickers)
+    np.testing.assert_array_equal(armazem.valores, referencia.valores)
+    for nome in dados.DERIVADOS:
+        np.testing.assert_allclose(
+            armazem.derivado(nome), referencia.derivado(nome), rtol=1e-12, equal_nan=True
+        )
+
+
+@pytest.mark.parametrize("sobreposicao", [0, 20])
+def test_ingestao_igual_ao_reprocessamento(bases_sinteticas, quebra, sobreposicao):
+    caminho = bases_sinteticas[0]
+    completo = _ler(caminho)
+    _gravar(completo.iloc[:CORTE], caminho, quebra)
+    dados.carregar_armazem(caminho)
+
+    # Os novos pregões podem repetir datas já gravadas: só os posteriores entram
+    novos = completo.iloc[CORTE - sobreposicao :]
+    assert dados.ingerir_pregoes(caminho, novos) == len(completo) - CORTE
+
+    armazem = dados.ArmazemPrecos(dados._diretorio_armazem(caminho))
+    pd.testing.assert_frame_equal(_ler(caminho), completo)
+    _conferir_quebras(caminho, quebra)
+    _conferir_igual_ao_reprocessado(caminho, armazem)
+
+
+def test_ingestao_de_csv_estendido_externamente(bases_sinteticas, quebra):
+    caminho = bases_sinteticas[0]
+    completo = _ler(caminho)
+    _gravar(completo.iloc[:CORTE], caminho, quebra)
+    dados.carregar_armazem(caminho)
+    _gravar(completo, caminho, quebra)
+
+    assert dados.ingerir_pregoes(caminho) == len(completo) - CORTE
+    armazem = dados.ArmazemPrecos(dados._diretorio_armazem(caminho))
+    _conferir_igual_ao_reprocessado(caminho, armazem)
+
+
+def test_ingestao_sem_armazem_rejeita_pregoes_ja_no_csv(bases_sinteticas, quebra):
+    caminho = bases_sinteticas[0]
+    completo = _ler(caminho)
+    _gravar(completo.iloc[:CORTE], caminho, quebra)
+    shutil.rmtree(dados._diretorio_armazem(caminho), ignore_errors=True)
+
+    dados.ingerir_pregoes(caminho, completo.iloc[CORTE - 20 :])
+    pd.testing.assert_frame_equal(_ler(caminho), completo)
+    _conferir_quebras(caminho, quebra)
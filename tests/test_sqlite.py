@@ -0,0 +1,29 @@
+import threading
+
+import pandas as pd
+
+import dados
+
+
+def test_primeiras_cargas_concorrentes(bases_sinteticas):
+    dados.definir_backend("sqlite")
+    resultados, erros = [], []
+
+    def carregar():
+        try:
+            resultados.append(dados.carregar_cota_ajustada())
+        except Exception as e:
+            erros.append(e)
+
+    threads = [threading.Thread(target=carregar) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not erros
+    esperado = pd.read_csv(
+        bases_sinteticas[0], parse_dates=["dt_pregao"], index_col="dt_pregao"
+    )
+    for df in resultados:
+        pd.testing.assert_frame_equal(df, esperado, check_freq=False, check_names=False)
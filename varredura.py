@@ -0,0 +1,215 @@
+"""
+Varredura de parâmetros do Markowitz em paralelo: todas as combinações de
+quantidade de ativos x peso máximo x retorno alvo x taxa livre de risco,
+com mu e S calculados uma vez e compartilhados entre os processos.
+
+Uso:
+    python varredura.py saida.csv [--quantidades N ...] [--pesos P ...]
+        [--alvos R ...] [--taxas R ...] [--metodo M] [--processos N]
+
+Retorno alvo 0 significa máximo Sharpe, como na barra lateral do app.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import markowitz
+
+# Colunas que identificam uma configuração da varredura
+PARAMETROS = ("quantidade_ativos", "peso_maximo", "retorno_alvo", "taxa_livre_risco")
+COLUNAS = PARAMETROS + (
+    "ticker",
+    "peso",
+    "retorno_esperado",
+    "volatilidade",
+    "sharpe",
+    "n_ativos",
+    "segundos",
+    "erro",
+)
+
+# Dados de cada processo: mu e S (vistas da memória compartilhada) e as
+# opções comuns a todas as configurações (ver `_iniciar_processo`)
+_dados_processo = None
+
+
+def _compartilhar(mu: pd.Series, S: pd.DataFrame) -> tuple:
+    """Copia mu e S para um bloco de memória compartilhada; devolve (bloco, descrição)."""
+    n = len(mu)
+    bloco = shared_memory.SharedMemory(create=True, size=(n + n * n) * 8)
+    valores = np.ndarray((n + n * n,), dtype=np.float64, buffer=bloco.buf)
+    valores[:n] = mu.to_numpy()
+    valores[n:] = S.to_numpy().ravel()
+    return bloco, {"nome": bloco.name, "tickers": list(mu.index)}
+
+
+def _iniciar_processo(descricao: dict, opcoes: dict):
+    """Inicializador do pool: mu e S como vistas (sem cópia) do bloco compartilhado."""
+    global _dados_processo
+    bloco = shared_memory.SharedMemory(name=descricao["nome"])
+    tickers = descricao["tickers"]
+    n = len(tickers)
+    valores = np.ndarray((n + n * n,), dtype=np.float64, buffer=bloco.buf)
+    mu = pd.Series(valores[:n], index=tickers, copy=False)
+    S = pd.DataFrame(valores[n:].reshape(n, n), index=tickers, columns=tickers, copy=False)
+    # O bloco fica referenciado para as vistas continuarem válidas
+    _dados_processo = {"bloco": bloco, "mu": mu, "S": S, "opcoes": opcoes, "cantos": {}}
+
+
+def _liberar_processo():
+    """Descarta as vistas e fecha o bloco no processo (a varredura serial roda aqui)."""
+    global _dados_processo
+    if _dados_processo is not None:
+        bloco = _dados_processo["bloco"]
+        _dados_processo = None
+        bloco.close()
+
+
+def _cantos_processo(mu_sel, S_sel, peso_maximo) -> tuple:
+    """Cantos da fronteira ("cla") guardados no processo por tickers e peso máximo."""
+    cache = _dados_processo["cantos"]
+    chave = (tuple(mu_sel.index), peso_maximo)
+    if chave not in cache:
+        cache[chave] = markowitz.cantos_fronteira(mu_sel, S_sel, peso_maximo)
+    return cache[chave]
+
+
+def _avaliar(configuracao: tuple) -> list:
+    """
+    Otimiza uma configuração (quantidade, peso máximo, retorno alvo, taxa) e
+    devolve as linhas da tabela: uma por ativo com peso positivo, com as
+    métricas ex-ante da carteira repetidas em cada uma.
+    """
+    mu, S, opcoes = _dados_processo["mu"], _dados_processo["S"], _dados_processo["opcoes"]
+    parametros = dict(zip(PARAMETROS, configuracao))
+    inicio = time.perf_counter()
+    try:
+        # Os logs de cada otimização, às centenas, só poluiriam a saída
+        with contextlib.redirect_stdout(io.StringIO()):
+            pesos = markowitz.otimizar_carteira(
+                mu,
+                S,
+                **parametros,
+                cantos=_cantos_processo,
+                n_processos=1,
+                **opcoes,
+            )
+    except Exception as e:
+        return [{**parametros, "ticker": None, "peso": np.nan, "erro": str(e)}]
+    segundos = time.perf_counter() - inicio
+
+    tickers = list(pesos)
+    w = np.array([pesos[t] for t in tickers])
+    retorno = float(mu[tickers].to_numpy() @ w)
+    volatilidade = float(np.sqrt(w @ S.loc[tickers, tickers].to_numpy() @ w))
+    metricas = {
+        "retorno_esperado": retorno,
+        "volatilidade": volatilidade,
+        "sharpe": (retorno - parametros["taxa_livre_risco"]) / volatilidade,
+        "n_ativos": len(tickers),
+        "segundos": segundos,
+        "erro": None,
+    }
+    return [
+        {**parametros, "ticker": ticker, "peso": peso, **metricas}
+        for ticker, peso in pesos.items()
+    ]
+
+
+def varrer_parametros(
+    quantidades: list = (10,),
+    pesos_maximos: list = (0.20,),
+    retornos_alvo: list = (0.0,),
+    taxas_livre_risco: list = (0.105,),
+    universo: list = None,
+    limite_ffill: int = None,
+    frequencia: str = "diaria",
+    metodo: str = "conjunto_ativo",
+    cardinalidade_exata: bool = False,
+    tempo_limite: float = 10.0,
+    n_processos: int = None,
+) -> pd.DataFrame:
+    """
+    Roda a otimização de `Otimizacao_Markowitz` para cada combinação de
+    `quantidades` x `pesos_maximos` x `retornos_alvo` x `taxas_livre_risco`
+    em um pool de `n_processos` processos (padrão: núcleos da máquina; 1
+    roda no próprio processo). A média e a covariância vêm do cache de
+    estimativas e são postas uma única vez em memória compartilhada.
+
+    Devolve uma tabela longa: uma linha por configuração e ativo com peso
+    positivo (colunas `PARAMETROS`, "ticker", "peso"), com o retorno
+    esperado, a volatilidade e o Sharpe ex-ante da carteira, o número de
+    ativos e o tempo da otimização. Configurações que falham ficam com uma
+    linha sem ticker e a mensagem em "erro".
+    """
+    inicio = time.perf_counter()
+    mu, S = markowitz.calcular_inputs(universo, limite_ffill, frequencia)
+    configuracoes = list(
+        itertools.product(quantidades, pesos_maximos, retornos_alvo, taxas_livre_risco)
+    )
+    opcoes = {
+        "metodo": metodo,
+        "cardinalidade_exata": cardinalidade_exata,
+        "tempo_limite": tempo_limite,
+    }
+    n_processos = min(n_processos or os.cpu_count() or 1, len(configuracoes))
+
+    bloco, descricao = _compartilhar(mu, S)
+    try:
+        if n_processos <= 1:
+            _iniciar_processo(descricao, opcoes)
+            linhas = [_avaliar(c) for c in configuracoes]
+        else:
+            with ProcessPoolExecutor(
+                n_processos, initializer=_iniciar_processo, initargs=(descricao, opcoes)
+            ) as pool:
+                lote = max(1, len(configuracoes) // (4 * n_processos))
+                linhas = list(pool.map(_avaliar, configuracoes, chunksize=lote))
+    finally:
+        _liberar_processo()
+        bloco.close()
+        bloco.unlink()
+
+    resultado = pd.DataFrame([linha for grupo in linhas for linha in grupo], columns=COLUNAS)
+    print(
+        f"> Varredura: {len(configuracoes)} configurações em "
+        f"{time.perf_counter() - inicio:.1f} s ({n_processos} processo(s))"
+    )
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("saida", help="CSV com a tabela de resultados")
+    parser.add_argument("--quantidades", type=int, nargs="+", default=[10])
+    parser.add_argument("--pesos", type=float, nargs="+", default=[0.20])
+    parser.add_argument("--alvos", type=float, nargs="+", default=[0.0])
+    parser.add_argument("--taxas", type=float, nargs="+", default=[0.105])
+    parser.add_argument(
+        "--metodo", choices=markowitz.METODOS_OTIMIZACAO, default="conjunto_ativo"
+    )
+    parser.add_argument("--cardinalidade-exata", action="store_true")
+    parser.add_argument("--tempo-limite", type=float, default=10.0)
+    parser.add_argument("--processos", type=int, default=None)
+
+    args = parser.parse_args()
+    tabela = varrer_parametros(
+        quantidades=args.quantidades,
+        pesos_maximos=args.pesos,
+        retornos_alvo=args.alvos,
+        taxas_livre_risco=args.taxas,
+        metodo=args.metodo,
+        cardinalidade_exata=args.cardinalidade_exata,
+        tempo_limite=args.tempo_limite,
+        n_processos=args.processos,
+    )
+    tabela.to_csv(args.saida, index=False)
+    print(f"> Resultados em {args.saida}")